@@ -1,8 +1,10 @@
-from typing import Tuple
+from typing import BinaryIO, Tuple
 from flask import Flask, request, jsonify, Response, send_file, current_app
 from flask_socketio import SocketIO
 from werkzeug.utils import secure_filename
 import os
+import shutil
+import tempfile
 import PyPDF2
 from io import BytesIO
 import base64
@@ -17,17 +19,22 @@ from app.integration.blob_service import (
     delete_file_from_blob, list_indexes, delete_index, initialize_blob_service,
     get_blob_url
 )
-from app.ingestion.upload_queue import queue_file_for_processing
+from app.ingestion.upload_queue import queue_file_for_processing, queue_reenrichment
 from app.ingestion.ingestion_job import create_ingestion_job, check_job_status, delete_ingestion_index
 from app.query.research import research_with_data
 from app.query.chat_service import chat_with_data, refine_message
 from app.integration.index_manager import create_index_manager, ContainerNameTooLongError, IndexConfig
 from app.integration.identity import easyauth_enabled
 from app.query.ask import AskService 
-from app.ingestion.pdf_processing import get_pdf_page_count
+from app.ingestion.pdf_processing import get_pdf_page_count, page_image_blob_name, PAGE_IMAGE_VARIANTS
+from app.ingestion.page_manifest import stream_sha256
+from app.ingestion.batch_upload import upload_batch
 from app.query.voice_chat_service import intro_message, voice_chat_with_data
 from app.compare.compare import compare_indexes
 
+UPLOAD_SPOOL_MAX_MEMORY = 1024 * 1024
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+
 def are_operations_restricted():
     return os.getenv('RESTRICT_OPERATIONS', 'false').lower() == 'true'
 
@@ -69,9 +76,11 @@ class RouteConfigurator:
 
     def _add_file_routes(self):
         self.app.route('/indexes/<index_name>/upload', methods=['POST'])(self._upload_file)
+        self.app.route('/indexes/<index_name>/upload/batch', methods=['POST'])(self._upload_batch)
         self.app.route('/indexes/<index_name>/files', methods=['GET'])(self._list_files)
         self.app.route('/indexes/<index_name>/files/<filename>', methods=['DELETE'])(self._delete_file)
         self.app.route('/indexes/<index_name>/index', methods=['POST'])(self._index_files)
+        self.app.route('/indexes/<index_name>/reenrich', methods=['POST'])(self._reenrich_files)
         self.app.route('/indexes/<index_name>/index/status', methods=['GET'])(self._check_index_status)
 
     def _add_chat_routes(self):
@@ -151,6 +160,7 @@ class RouteConfigurator:
 
     def _add_pdf_route(self):
         self.app.route('/pdf/<index_name>/<path:filename>', methods=['GET'])(self._get_pdf)
+        self.app.route('/image/<index_name>/<path:filename>', methods=['GET'])(self._get_page_image)
 
     def _intro(self):
         return intro_message()
@@ -266,16 +276,17 @@ class RouteConfigurator:
 
         filename = secure_filename(file.filename)
         
-        file_bytes = file.read()
-        file_buffer = BytesIO(file_bytes)
-
-        num_pages = get_pdf_page_count(file_buffer)
-
-        file_buffer.seek(0)
-
-        blob_url = upload_file_to_lz(file_buffer, filename, user_id, index_name, is_restricted, self.blob_service)
+        file_stream, file_size = self._spool_upload(file)
+        try:
+            content_sha256 = stream_sha256(file_stream)
+            file_stream.seek(0)
+            num_pages = get_pdf_page_count(file_stream)
+            file_stream.seek(0)
+            blob_url = upload_file_to_lz(file_stream, filename, user_id, index_name, is_restricted, self.blob_service, length=file_size)
+        finally:
+            file_stream.close()
 
-        queue_file_for_processing(filename, user_id, index_name, is_restricted, num_pages, blob_url, is_multimodal)
+        queue_file_for_processing(filename, user_id, index_name, is_restricted, num_pages, blob_url, is_multimodal, content_sha256)
 
         return jsonify({
             "message": "File queued for processing",
@@ -283,6 +294,54 @@ class RouteConfigurator:
             "num_pages": num_pages
         }), 202
 
+    def _upload_batch(self, index_name: str):
+        if self.operations_restricted:
+            return jsonify({"error": "Operation not allowed"}), 403
+
+        user_id = get_user_id(request)
+        is_restricted = request.args.get('is_restricted', 'true').lower() == 'true'
+        is_multimodal = request.form.get('multimodal', 'false').lower() == 'true'
+
+        index_manager = self._get_index_manager(user_id, index_name, is_restricted)
+        if isinstance(index_manager, tuple):
+            return index_manager
+
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({"error": "No files part"}), 400
+
+        streams = [self._spool_upload(file)[0] for file in files]
+        try:
+            manifest = upload_batch(
+                [(file.filename, stream) for file, stream in zip(files, streams)],
+                user_id, index_name, is_restricted, is_multimodal, self.blob_service
+            )
+        finally:
+            for stream in streams:
+                stream.close()
+
+        queued = sum(1 for entry in manifest if entry["status"] == "queued")
+        return jsonify({
+            "message": f"{queued} of {len(manifest)} files queued for processing",
+            "files": manifest
+        }), 202 if queued else 400
+
+    def _spool_upload(self, file) -> Tuple[BinaryIO, int]:
+        """Return a seekable stream of an uploaded file and its size without reading it into memory.
+
+        Werkzeug already spools large request bodies to a temporary file; anything else is
+        copied in chunks into a spooled temporary file.
+        """
+        stream = file.stream
+        if not (hasattr(stream, 'seekable') and stream.seekable()):
+            spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY)
+            shutil.copyfileobj(stream, spooled, UPLOAD_COPY_CHUNK_SIZE)
+            stream = spooled
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        return stream, size
+
     def _list_files(self, index_name: str):
         user_id = get_user_id(request)
         is_restricted = request.args.get('is_restricted', 'true').lower() == 'true'
@@ -345,6 +404,24 @@ class RouteConfigurator:
             print(f"Error initiating indexing job: {str(e)}")
             return jsonify({"error": str(e)}), 500
 
+    def _reenrich_files(self, index_name: str):
+        if self.operations_restricted:
+            return jsonify({"error": "Operation not allowed"}), 403
+
+        user_id = get_user_id(request)
+        is_restricted = request.args.get('is_restricted', 'true').lower() == 'true'
+        is_multimodal = bool((request.get_json(silent=True) or {}).get('multimodal', False))
+
+        index_manager = self._get_index_manager(user_id, index_name, is_restricted)
+        if isinstance(index_manager, tuple):
+            return index_manager
+
+        try:
+            filenames = queue_reenrichment(user_id, index_name, is_restricted, is_multimodal)
+            return jsonify({"message": "Re-enrichment queued", "files": filenames}), 202
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
     def _check_index_status(self, index_name: str):
         user_id = get_user_id(request)
         is_restricted = request.args.get('is_restricted', 'true').lower() == 'true'
@@ -408,6 +485,45 @@ class RouteConfigurator:
             self.app.logger.error(f"Error retrieving PDF: {str(e)}")
             return jsonify({"error": f"Error retrieving PDF: {str(e)}"}), 500
 
+    def _get_page_image(self, index_name: str, filename: str) -> Tuple[Response, int]:
+        user_id = get_user_id(request)
+        is_restricted = request.args.get('is_restricted', 'true').lower() == 'true'
+        variant = request.args.get('variant', 'preview')
+        if variant != 'full' and variant not in PAGE_IMAGE_VARIANTS:
+            return jsonify({"error": f"Unknown image variant: {variant}"}), 400
+
+        index_manager = self._get_index_manager(user_id, index_name, is_restricted)
+        if isinstance(index_manager, tuple):
+            return index_manager
+
+        container_client = self.blob_service.get_container_client(index_manager.get_reference_container())
+
+        try:
+            base_filename, page_info = filename.rsplit('___', 1)
+            page_number = int(page_info.split('.')[0].replace('Page', ''))
+        except ValueError:
+            return jsonify({"error": f"Invalid page file name: {filename}"}), 400
+
+        # Pages ingested before variants existed only have the full PNG.
+        candidates = [variant, 'full'] if variant != 'full' else ['full']
+        try:
+            for candidate in candidates:
+                image_filename = page_image_blob_name(base_filename, page_number, candidate)
+                try:
+                    blob_data = container_client.get_blob_client(image_filename).download_blob().readall()
+                except ResourceNotFoundError:
+                    continue
+                return send_file(
+                    BytesIO(blob_data),
+                    mimetype=f"image/{PAGE_IMAGE_VARIANTS[candidate][1].lower()}" if candidate in PAGE_IMAGE_VARIANTS else 'image/png',
+                    as_attachment=False,
+                    download_name=image_filename
+                )
+            return jsonify({"error": f"Image not found: {page_image_blob_name(base_filename, page_number)}"}), 404
+        except Exception as e:
+            self.app.logger.error(f"Error retrieving page image: {str(e)}")
+            return jsonify({"error": f"Error retrieving page image: {str(e)}"}), 500
+
     def _validate_index_creation_data(self, data, user_id):
         index_name = data.get('name')
         is_restricted = data.get('is_restricted', True)
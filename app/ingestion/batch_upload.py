@@ -0,0 +1,168 @@
+import os
+import logging
+import posixpath
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple
+from werkzeug.utils import secure_filename
+
+from .page_manifest import stream_sha256
+from .pdf_processing import get_pdf_page_count
+from .upload_queue import queue_files_for_processing
+from ..integration.blob_service import get_lz_container_client, upload_stream_to_container
+
+class BatchUploadSettings:
+    BATCH_UPLOAD_MAX_FILES = int(os.getenv('BATCH_UPLOAD_MAX_FILES', '5000'))
+    BATCH_UPLOAD_CONCURRENCY = int(os.getenv('BATCH_UPLOAD_CONCURRENCY', '8'))
+    # Archive members larger than this are extracted to a temporary file instead of memory.
+    BATCH_UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv('BATCH_UPLOAD_SPOOL_MAX_MEMORY', str(1024 * 1024)))
+    # Bounds on what one ZIP archive may expand to, checked against its headers and again while extracting.
+    BATCH_UPLOAD_MAX_ARCHIVE_MEMBERS = int(os.getenv('BATCH_UPLOAD_MAX_ARCHIVE_MEMBERS', '10000'))
+    BATCH_UPLOAD_MAX_UNCOMPRESSED_BYTES = int(os.getenv('BATCH_UPLOAD_MAX_UNCOMPRESSED_BYTES', str(10 * 1024 * 1024 * 1024)))
+
+class ExtractionBudget:
+    """Bytes that may still be extracted from one archive, shared by all of its members."""
+    def __init__(self, limit: int):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> None:
+        with self._lock:
+            if amount > self.remaining:
+                raise ValueError("Archive expands beyond the allowed uncompressed size")
+            self.remaining -= amount
+
+class BatchEntry(NamedTuple):
+    filename: str
+    open: Optional[Callable[[], Tuple[BinaryIO, int]]]
+    error: Optional[str] = None
+
+def expand_uploads(uploads: List[Tuple[str, BinaryIO]]) -> List[BatchEntry]:
+    """Turn uploaded files and ZIP archives into one entry per document, flagging the ones that cannot be queued.
+
+    Every stream must be seekable. Archive members are extracted lazily when their entry is opened.
+    Archives with too many members or too large a declared uncompressed size are rejected whole.
+    """
+    entries = []
+    for name, stream in uploads:
+        if name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(stream)
+            except zipfile.BadZipFile as e:
+                entries.append(BatchEntry(name, None, f"Invalid ZIP archive: {str(e)}"))
+                continue
+            members = archive.infolist()
+            error = _archive_limit_error(members)
+            if error:
+                entries.append(BatchEntry(name, None, error))
+                continue
+            budget = ExtractionBudget(BatchUploadSettings.BATCH_UPLOAD_MAX_UNCOMPRESSED_BYTES)
+            for member in members:
+                if member.is_dir() or posixpath.basename(member.filename).startswith('.') or member.filename.startswith('__MACOSX/'):
+                    continue
+                entries.append(BatchEntry(posixpath.basename(member.filename), _member_opener(archive, member, budget)))
+        else:
+            entries.append(BatchEntry(name, _stream_opener(stream)))
+    return _validate_entries(entries)
+
+def upload_batch(uploads: List[Tuple[str, BinaryIO]], user_id: str, index_name: str, is_restricted: bool, is_multimodal: bool,
+                 blob_service_client=None) -> List[Dict[str, Any]]:
+    """Land every document of a batch concurrently, queue them together and return one status entry per document."""
+    entries = expand_uploads(uploads)
+    results = [{"filename": entry.filename, "status": "rejected", "error": entry.error} if entry.error else None for entry in entries]
+    accepted = [position for position, entry in enumerate(entries) if not entry.error]
+    if not accepted:
+        return results
+
+    # One container lookup serves the whole batch.
+    container_client = get_lz_container_client(user_id, index_name, is_restricted, blob_service_client)
+    with ThreadPoolExecutor(max_workers=max(1, BatchUploadSettings.BATCH_UPLOAD_CONCURRENCY), thread_name_prefix="batch-upload") as executor:
+        landed = dict(zip(accepted, executor.map(lambda position: _land_entry(entries[position], container_client), accepted)))
+
+    files = [file for file in landed.values() if "error" not in file]
+    errors = queue_files_for_processing(files, user_id, index_name, is_restricted, is_multimodal) if files else {}
+    for position, file in landed.items():
+        if "error" in file:
+            results[position] = {"filename": file["filename"], "status": "failed", "error": file["error"]}
+        elif file["filename"] in errors:
+            results[position] = {"filename": file["filename"], "status": "failed", "num_pages": file["num_pages"], "error": errors[file["filename"]]}
+        else:
+            results[position] = {"filename": file["filename"], "status": "queued", "num_pages": file["num_pages"]}
+    return results
+
+def _land_entry(entry: BatchEntry, container_client) -> Dict[str, Any]:
+    try:
+        stream, size = entry.open()
+    except Exception as e:
+        logging.error(f"Could not read {entry.filename} from the batch: {str(e)}")
+        return {"filename": entry.filename, "error": f"Could not read file: {str(e)}"}
+    try:
+        content_sha256 = stream_sha256(stream)
+        stream.seek(0)
+        try:
+            num_pages = get_pdf_page_count(stream)
+        except Exception as e:
+            return {"filename": entry.filename, "error": f"Not a readable PDF: {str(e)}"}
+        stream.seek(0)
+        blob_url = upload_stream_to_container(container_client, entry.filename, stream, size)
+        return {"filename": entry.filename, "num_pages": num_pages, "blob_url": blob_url, "content_sha256": content_sha256}
+    except Exception as e:
+        logging.error(f"Could not upload {entry.filename} to the landing zone: {str(e)}")
+        return {"filename": entry.filename, "error": f"Upload failed: {str(e)}"}
+    finally:
+        stream.close()
+
+def _validate_entries(entries: List[BatchEntry]) -> List[BatchEntry]:
+    validated = []
+    seen = set()
+    for entry in entries:
+        filename = secure_filename(entry.filename) if entry.filename and "___" not in entry.filename else ""
+        if entry.error:
+            validated.append(entry)
+        elif not filename:
+            validated.append(BatchEntry(entry.filename or "(unnamed)", None, "Invalid file name"))
+        elif filename in seen:
+            validated.append(BatchEntry(filename, None, "Duplicate file name in batch"))
+        elif len(seen) >= BatchUploadSettings.BATCH_UPLOAD_MAX_FILES:
+            validated.append(BatchEntry(filename, None, f"Batch exceeds {BatchUploadSettings.BATCH_UPLOAD_MAX_FILES} files"))
+        else:
+            seen.add(filename)
+            validated.append(BatchEntry(filename, entry.open))
+    return validated
+
+def _stream_opener(stream: BinaryIO) -> Callable[[], Tuple[BinaryIO, int]]:
+    def open_stream():
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        return stream, size
+    return open_stream
+
+def _archive_limit_error(members: List[zipfile.ZipInfo]) -> Optional[str]:
+    if len(members) > BatchUploadSettings.BATCH_UPLOAD_MAX_ARCHIVE_MEMBERS:
+        return f"Archive has more than {BatchUploadSettings.BATCH_UPLOAD_MAX_ARCHIVE_MEMBERS} members"
+    if sum(member.file_size for member in members) > BatchUploadSettings.BATCH_UPLOAD_MAX_UNCOMPRESSED_BYTES:
+        return f"Archive expands to more than {BatchUploadSettings.BATCH_UPLOAD_MAX_UNCOMPRESSED_BYTES} bytes"
+    return None
+
+def _member_opener(archive: zipfile.ZipFile, member: zipfile.ZipInfo, budget: ExtractionBudget) -> Callable[[], Tuple[BinaryIO, int]]:
+    def open_member():
+        spooled = tempfile.SpooledTemporaryFile(max_size=BatchUploadSettings.BATCH_UPLOAD_SPOOL_MAX_MEMORY)
+        try:
+            size = 0
+            with archive.open(member) as source:
+                # Headers can understate the size, so extraction stops at the declared size and the archive's budget.
+                for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                    size += len(chunk)
+                    if size > member.file_size:
+                        raise ValueError(f"{member.filename} is larger than its declared size")
+                    budget.consume(len(chunk))
+                    spooled.write(chunk)
+        except BaseException:
+            spooled.close()
+            raise
+        spooled.seek(0)
+        return spooled, size
+    return open_member
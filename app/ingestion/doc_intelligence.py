@@ -1,39 +1,54 @@
 import os
 import re
 import io
+import json
 import base64
-from typing import List, Tuple
-from azure.identity import DefaultAzureCredential
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import ContentFormat
+from azure.ai.documentintelligence.models import AnalyzeResult, ContentFormat, StringIndexType
 from azure.core.credentials import AzureKeyCredential
 from PIL import Image
-from app.integration.azure_openai import get_azure_openai_client, analyze_image
+from app.integration.azure_openai import get_azure_openai_client, analyze_image, IMAGE_ANALYSIS_ERROR_PREFIX
+from app.integration.client_registry import get_shared_client, get_default_credential, create_azure_transport
+from app.integration.telemetry import stage
 from .table_postprocessor import enhance_markdown
+from .enrichment_cache import EnrichmentCache, get_enrichment_cache, content_hash
+from .page_classifier import PageClassifierSettings, classify_page, text_to_markdown
 
-def refine_figures(content, png_path: str) -> str:
+FIGURE_CAPTION_CONCURRENCY = int(os.getenv('FIGURE_CAPTION_CONCURRENCY', '4'))
+FIGURE_MIN_PIXEL_AREA = int(os.getenv('FIGURE_MIN_PIXEL_AREA', '0'))
+FIGURE_PLACEHOLDER_PATTERN = re.compile(r"!\[\]\(figures/(\d+)\)")
+LAYOUT_CACHE_VERSION = "v1"
+LAYOUT_CACHE_MEMORY_ENTRIES = int(os.getenv('LAYOUT_CACHE_MEMORY_ENTRIES', '256'))
+LAYOUT_CACHE_CONTAINER = os.getenv('LAYOUT_CACHE_CONTAINER', 'layoutcache')
+# Word- and line-level geometry is not needed to rebuild markdown and makes up most of a layout.
+LAYOUT_PAGE_DETAIL_FIELDS = ("words", "lines", "selectionMarks")
+
+class LayoutNotCachedError(Exception):
+    """Raised when a page layout is needed but analyzing the page is not allowed."""
+
+def refine_figures(content, png_path: Union[str, BinaryIO]) -> str:
     """Refine figures in the content by adding captions."""
-    def process_image(polygon: List[float], pdf_width: float, pdf_height: float, img_width: int, img_height: int) -> str:
-        """Process an image and get its caption."""
-        with Image.open(png_path) as img:
-            width_scale = img_width / pdf_width
-            height_scale = img_height / pdf_height
-            
-            scaled_polygon = [
-                coord * width_scale if i % 2 == 0 else coord * height_scale
-                for i, coord in enumerate(polygon)
-            ]
-            
-            bbox = [
-                min(scaled_polygon[::2]),
-                min(scaled_polygon[1::2]),
-                max(scaled_polygon[::2]),
-                max(scaled_polygon[1::2])
-            ]
-            
-            px_bbox = [int(b) for b in bbox]
-            cropped = img.crop(px_bbox)
-            return get_caption(cropped)
+    def crop_figure(img: Image.Image, polygon: List[float], pdf_width: float, pdf_height: float) -> Image.Image:
+        """Crop the figure's polygon, given in page units, out of the rendered page."""
+        width_scale = img.width / pdf_width
+        height_scale = img.height / pdf_height
+        
+        scaled_polygon = [
+            coord * width_scale if i % 2 == 0 else coord * height_scale
+            for i, coord in enumerate(polygon)
+        ]
+        
+        bbox = [
+            min(scaled_polygon[::2]),
+            min(scaled_polygon[1::2]),
+            max(scaled_polygon[::2]),
+            max(scaled_polygon[1::2])
+        ]
+        
+        px_bbox = [int(b) for b in bbox]
+        return img.crop(px_bbox)
 
     def get_caption(img: Image.Image) -> str:
         """Get a caption for the given image using Azure OpenAI."""
@@ -44,58 +59,205 @@ def refine_figures(content, png_path: str) -> str:
         client = get_azure_openai_client()
         return analyze_image(client, b64_img)
 
-    updated_content = content.content
+    if not content.figures:
+        return content.content
+
     pdf_width, pdf_height = content.pages[0].width, content.pages[0].height
     
     with Image.open(png_path) as img:
-        img_width, img_height = img.size
+        img.load()
+        crops = [
+            crop_figure(img, figure.bounding_regions[0].polygon, pdf_width, pdf_height)
+            for figure in content.figures
+        ]
 
-    if not content.figures:
-        return updated_content
+    # Identical crops (logos, repeated diagrams) share one cache entry and at most one vision call.
+    cache = get_enrichment_cache("captions")
+    keys = [content_hash(crop.mode.encode(), str(crop.size).encode(), crop.tobytes()) for crop in crops]
+    captions_by_key = {}
+    uncached_crops = {}
+    for key, crop in zip(keys, crops):
+        if crop.width * crop.height < FIGURE_MIN_PIXEL_AREA:
+            cache.increment("skipped")
+            continue
+        if key in captions_by_key or key in uncached_crops:
+            continue
+        cached_caption = cache.get(key)
+        if cached_caption is not None:
+            captions_by_key[key] = cached_caption
+        else:
+            uncached_crops[key] = crop
 
-    for i, figure in enumerate(content.figures):
-        polygon = figure.bounding_regions[0].polygon
-        caption = process_image(polygon, pdf_width, pdf_height, img_width, img_height)
-        
-        figure_pattern = f"!\\[\\]\\(figures/{i}\\)"
-        replacement = f"![{caption}](figures/{i})"
-        
-        updated_content = re.sub(figure_pattern, replacement, updated_content)
-    
-    return updated_content
+    if uncached_crops:
+        with ThreadPoolExecutor(max_workers=max(1, min(FIGURE_CAPTION_CONCURRENCY, len(uncached_crops))), thread_name_prefix="caption") as executor:
+            for key, caption in zip(uncached_crops, executor.map(get_caption, uncached_crops.values())):
+                captions_by_key[key] = caption
+                if not caption.startswith(IMAGE_ANALYSIS_ERROR_PREFIX):
+                    cache.set(key, caption)
+
+    captions = [captions_by_key.get(key) for key in keys]
 
-def convert_pdf_page_to_md(pdf_path: str, page_num: int, output_dir: str, prefix: str, refine_markdown: bool = False) -> str:
-    """Convert a PDF page to Markdown format."""
+    def add_caption(match: re.Match) -> str:
+        index = int(match.group(1))
+        if index >= len(captions) or captions[index] is None:
+            return match.group(0)
+        return f"![{captions[index]}](figures/{index})"
+
+    return FIGURE_PLACEHOLDER_PATTERN.sub(add_caption, content.content)
+
+def get_document_intelligence_client() -> DocumentIntelligenceClient:
+    """Return the shared Document Intelligence client configured from the environment."""
     endpoint = os.getenv("DOCUMENTINTELLIGENCE_ENDPOINT")
     document_intelligence_key = os.getenv("DOCUMENTINTELLIGENCE_KEY")
+
+    def create_client() -> DocumentIntelligenceClient:
+        if document_intelligence_key:
+            credential = AzureKeyCredential(document_intelligence_key)
+        else:
+            credential = get_default_credential()
+        return DocumentIntelligenceClient(endpoint, credential, transport=create_azure_transport())
+
+    return get_shared_client(("document_intelligence", endpoint, document_intelligence_key), create_client)
+
+def analyze_layout(pdf_path: Union[str, bytes, BinaryIO], pages: Optional[str] = None) -> AnalyzeResult:
+    """Run the prebuilt layout model on a PDF path, content or stream, optionally restricted to a page range such as "1-50"."""
+    document_intelligence_client = get_document_intelligence_client()
     
-    if document_intelligence_key:
-        credential = AzureKeyCredential(document_intelligence_key)
-    else:
-        credential = DefaultAzureCredential()
-    
-    document_intelligence_client = DocumentIntelligenceClient(endpoint, credential)
-    
-    with open(pdf_path, "rb") as file:
-        poller = document_intelligence_client.begin_analyze_document(
-            "prebuilt-layout", 
-            analyze_request=file, 
-            output_content_format=ContentFormat.MARKDOWN, 
-            content_type="application/pdf"
+    with stage("document_intelligence", page_count=_page_range_length(pages), pages=pages):
+        if isinstance(pdf_path, str):
+            with open(pdf_path, "rb") as file:
+                poller = _begin_layout_analysis(document_intelligence_client, file, pages)
+        elif isinstance(pdf_path, bytes):
+            poller = _begin_layout_analysis(document_intelligence_client, pdf_path, pages)
+        else:
+            pdf_path.seek(0)
+            poller = _begin_layout_analysis(document_intelligence_client, pdf_path, pages)
+        
+        return poller.result()
+
+def _page_range_length(pages: Optional[str]) -> int:
+    """Return the number of pages in a range such as "1-50"; a request without a range analyzes a single page here."""
+    if not pages:
+        return 1
+    first, _, last = pages.partition("-")
+    return int(last or first) - int(first) + 1
+
+def _begin_layout_analysis(document_intelligence_client: DocumentIntelligenceClient, file: Union[bytes, BinaryIO], pages: Optional[str]):
+    return document_intelligence_client.begin_analyze_document(
+        "prebuilt-layout", 
+        analyze_request=file, 
+        pages=pages,
+        output_content_format=ContentFormat.MARKDOWN, 
+        content_type="application/pdf",
+        string_index_type=StringIndexType.UNICODE_CODE_POINT
+    )
+
+def split_layout_by_page(result: AnalyzeResult) -> Dict[int, AnalyzeResult]:
+    """Split a multi-page layout result into single-page results keyed by zero-based page number.
+
+    Each page keeps its own slice of the markdown and the figures and tables located on it. Figure
+    placeholders are renumbered per page, matching the output of a single-page analysis.
+    """
+    page_results = {}
+    for page in result.pages:
+        spans = page.spans or []
+        start = min((span.offset for span in spans), default=0)
+        end = max((span.offset + span.length for span in spans), default=0)
+
+        page_figures = []
+        figure_numbers = {}
+        for i, figure in enumerate(result.figures or []):
+            if figure.bounding_regions and figure.bounding_regions[0].page_number == page.page_number:
+                figure_numbers[str(i)] = str(len(page_figures))
+                page_figures.append(figure)
+        page_tables = [
+            table for table in result.tables or []
+            if table.bounding_regions and table.bounding_regions[0].page_number == page.page_number
+        ]
+
+        content = FIGURE_PLACEHOLDER_PATTERN.sub(
+            lambda match: f"![](figures/{figure_numbers.get(match.group(1), match.group(1))})",
+            result.content[start:end]
         )
-    
-    result = poller.result()
-    markdown_content = result.content
-    
-    if refine_markdown:
-        png_path = os.path.join(output_dir, f"{prefix}___Page{page_num+1}.png")
-        markdown_content = refine_figures(result, png_path)
-        markdown_content = enhance_markdown(markdown_content)
-    
-    
-    output_filename = os.path.join(output_dir, f"{prefix}___Page{page_num+1}.md")
-    with open(output_filename, "w", encoding='utf-8') as md_file:
-        md_file.write(markdown_content)
-    
-    print(f"Generated MD: {output_filename}")
-    return output_filename
+        page_results[page.page_number - 1] = AnalyzeResult(
+            api_version=result.api_version,
+            model_id=result.model_id,
+            string_index_type=result.string_index_type,
+            content_format=result.content_format,
+            content=content,
+            pages=[page],
+            figures=page_figures,
+            tables=page_tables
+        )
+    return page_results
+
+def analyze_pdf_pages(pdf_path: str, first_page: int, last_page: int) -> Dict[int, AnalyzeResult]:
+    """Analyze pages [first_page, last_page) of a PDF in one request and return per-page results."""
+    result = analyze_layout(pdf_path, pages=f"{first_page + 1}-{last_page}")
+    return split_layout_by_page(result)
+
+def get_layout_cache() -> EnrichmentCache:
+    return get_enrichment_cache("layouts", max_entries=LAYOUT_CACHE_MEMORY_ENTRIES, blob_container=LAYOUT_CACHE_CONTAINER)
+
+def serialize_layout(result: AnalyzeResult) -> str:
+    """Return a compact JSON representation of a layout without word- and line-level details."""
+    data = result.as_dict()
+    for page in data.get("pages", []):
+        for field in LAYOUT_PAGE_DETAIL_FIELDS:
+            page.pop(field, None)
+    return json.dumps(data, separators=(",", ":"))
+
+def deserialize_layout(value: str) -> AnalyzeResult:
+    return AnalyzeResult(json.loads(value))
+
+def get_page_layout(pdf_page: Union[str, BinaryIO], layout: Optional[AnalyzeResult] = None, allow_analysis: bool = True) -> AnalyzeResult:
+    """Return the layout of a single-page PDF, keyed in the "layouts" cache by the hash of the page.
+
+    A layout passed in, or analyzed on a cache miss, is stored for later re-enrichment.
+    """
+    if isinstance(pdf_page, str):
+        with open(pdf_page, "rb") as f:
+            page_bytes = f.read()
+    else:
+        pdf_page.seek(0)
+        page_bytes = pdf_page.read()
+        pdf_page.seek(0)
+
+    cache = get_layout_cache()
+    key = content_hash(LAYOUT_CACHE_VERSION.encode('utf-8'), page_bytes)
+    cached = cache.get(key)
+    if cached is not None:
+        return layout if layout is not None else deserialize_layout(cached)
+
+    if layout is None:
+        if not allow_analysis:
+            raise LayoutNotCachedError(f"No cached layout for page {key}")
+        # The page is sent as bytes: requests sizes streams through their file descriptor, which moves page buffers to disk.
+        layout = analyze_layout(page_bytes)
+    cache.set(key, serialize_layout(layout))
+    return layout
+
+def convert_pdf_page_to_markdown(pdf_page: Union[str, BinaryIO], png_page: Union[str, BinaryIO], refine_markdown: bool = False, layout: Optional[AnalyzeResult] = None, allow_analysis: bool = True) -> str:
+    """Return the Markdown of a single-page PDF given as a path or stream, without writing it to disk.
+
+    With allow_analysis=False the markdown is rebuilt from the cached layout only. When local text
+    extraction is enabled, plain text pages are converted without a layout.
+    """
+    if layout is None and PageClassifierSettings.LOCAL_TEXT_EXTRACTION_ENABLED:
+        classification = classify_page(pdf_page)
+        cache = get_layout_cache()
+        if not classification.needs_layout:
+            cache.increment("local_pages")
+            return text_to_markdown(classification.text)
+        cache.increment(f"analyzed_pages_{classification.reason.replace(' ', '_')}")
+
+    result = get_page_layout(pdf_page, layout, allow_analysis)
+    if not refine_markdown:
+        return result.content
+
+    if not isinstance(png_page, str):
+        png_page.seek(0)
+    with stage("figure_captioning", page_count=1, figures=len(result.figures or [])):
+        markdown_content = refine_figures(result, png_page)
+    with stage("table_enrichment", page_count=1, tables=len(result.tables or [])):
+        return enhance_markdown(markdown_content)
@@ -0,0 +1,137 @@
+import os
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, Optional
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+from ..integration.blob_service import initialize_blob_service
+
+class EnrichmentCacheSettings:
+    MAX_ENTRIES = int(os.getenv('ENRICHMENT_CACHE_MAX_ENTRIES', '4096'))
+    LOCAL_DIR = os.getenv('ENRICHMENT_CACHE_DIR')
+    BLOB_CONTAINER = os.getenv('ENRICHMENT_CACHE_CONTAINER')
+
+def content_hash(*parts: bytes) -> str:
+    """Return a hex SHA-256 digest over the given byte strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+class EnrichmentCache:
+    """Content-addressed cache for LLM enrichment results.
+
+    Values are kept in an in-memory LRU tier and, when configured, in a persistent tier on
+    local disk or in a blob container, so that re-ingested content does not pay for another call.
+    """
+    def __init__(self, namespace: str, max_entries: int = None, local_dir: Optional[str] = None,
+                 blob_container: Optional[str] = None, blob_service_client=None):
+        self.namespace = namespace
+        self.max_entries = max_entries if max_entries is not None else EnrichmentCacheSettings.MAX_ENTRIES
+        self.local_dir = os.path.join(local_dir, namespace) if local_dir else None
+        self.blob_container = blob_container
+        self._blob_service_client = blob_service_client
+        self._container_ready = False
+        self._entries: OrderedDict = OrderedDict()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "persistent_hits": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._entries[key]
+
+        value = self._read_persistent(key)
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._counters["persistent_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store value under key in every configured tier."""
+        with self._lock:
+            self._remember(key, value)
+        self._write_persistent(key, value)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Increase a named counter reported by stats()."""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def stats(self) -> Dict[str, int]:
+        """Return a snapshot of the cache counters and its current size."""
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+    def _remember(self, key: str, value: str) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _local_path(self, key: str) -> str:
+        return os.path.join(self.local_dir, key[:2], key)
+
+    def _blob_client(self, key: str):
+        if self._blob_service_client is None:
+            self._blob_service_client = initialize_blob_service()
+        if not self._container_ready:
+            with suppress(ResourceExistsError):
+                self._blob_service_client.create_container(self.blob_container)
+            self._container_ready = True
+        return self._blob_service_client.get_blob_client(container=self.blob_container, blob=f"{self.namespace}/{key}")
+
+    def _read_persistent(self, key: str) -> Optional[str]:
+        try:
+            if self.local_dir:
+                with suppress(FileNotFoundError), open(self._local_path(key), encoding='utf-8') as f:
+                    return f.read()
+            if self.blob_container:
+                with suppress(ResourceNotFoundError):
+                    return self._blob_client(key).download_blob().readall().decode('utf-8')
+        except Exception as e:
+            logging.warning(f"Could not read {self.namespace} cache entry {key}: {str(e)}")
+        return None
+
+    def _write_persistent(self, key: str, value: str) -> None:
+        try:
+            if self.local_dir:
+                path = self._local_path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "w", encoding='utf-8') as f:
+                    f.write(value)
+                os.replace(temp_path, path)
+            if self.blob_container:
+                self._blob_client(key).upload_blob(value.encode('utf-8'), overwrite=True)
+        except Exception as e:
+            logging.warning(f"Could not write {self.namespace} cache entry {key}: {str(e)}")
+
+_caches: Dict[str, EnrichmentCache] = {}
+_caches_lock = threading.Lock()
+
+def get_enrichment_cache(namespace: str, max_entries: int = None, blob_container: Optional[str] = None) -> EnrichmentCache:
+    """Return the process-wide cache for a namespace, configured from the environment.
+
+    max_entries and blob_container override the environment for the namespace when it is first created.
+    """
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = EnrichmentCache(
+                namespace,
+                max_entries=max_entries,
+                local_dir=EnrichmentCacheSettings.LOCAL_DIR,
+                blob_container=blob_container or EnrichmentCacheSettings.BLOB_CONTAINER
+            )
+        return _caches[namespace]
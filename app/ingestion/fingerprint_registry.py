@@ -0,0 +1,71 @@
+import os
+from contextlib import suppress
+from typing import Any, Dict, Optional
+from azure.core.exceptions import ResourceNotFoundError
+
+from .enrichment_cache import content_hash
+from .indexing_queue import AzureClientManager
+
+class FingerprintRegistrySettings:
+    DEDUPLICATION_ENABLED = os.getenv('DOCUMENT_DEDUPLICATION_ENABLED', 'true').lower() == 'true'
+    FINGERPRINT_TABLE_NAME = os.getenv('DOCUMENT_FINGERPRINT_TABLE_NAME', 'documentfingerprints')
+
+class FingerprintRegistry:
+    """Maps the SHA-256 of processed PDFs to the containers that hold their page artifacts."""
+    def __init__(self, table_client=None):
+        self.table_client = table_client or AzureClientManager.initialize_table_client(FingerprintRegistrySettings.FINGERPRINT_TABLE_NAME)
+
+    @staticmethod
+    def _row_key(reference_container: str, filename: str) -> str:
+        return content_hash(reference_container.encode('utf-8'), b'/', filename.encode('utf-8'))
+
+    def find(self, content_sha256: str, is_multimodal: bool, exclude_reference_container: str = None, exclude_filename: str = None) -> Optional[Dict[str, Any]]:
+        """Return a processed copy of the content with the same enrichment settings, if any."""
+        excluded_row_key = self._row_key(exclude_reference_container, exclude_filename) if exclude_reference_container else None
+        for entity in self.table_client.query_entities(f"PartitionKey eq '{content_sha256}'"):
+            if entity['is_multimodal'] == is_multimodal and entity['RowKey'] != excluded_row_key:
+                return dict(entity)
+        return None
+
+    @staticmethod
+    def _location_partition_key(row_key: str) -> str:
+        # Content entities are partitioned by hex digests, so this prefix cannot collide with them.
+        return f"location-{row_key}"
+
+    def register(self, content_sha256: str, filename: str, reference_container: str, ingestion_container: str, num_pages: int, is_multimodal: bool) -> None:
+        row_key = self._row_key(reference_container, filename)
+        self.forget_replaced(reference_container, filename, content_sha256)
+        self.table_client.upsert_entity({
+            "PartitionKey": content_sha256,
+            "RowKey": row_key,
+            "filename": filename,
+            "reference_container": reference_container,
+            "ingestion_container": ingestion_container,
+            "num_pages": num_pages,
+            "is_multimodal": is_multimodal
+        })
+        # A reverse lookup finds the content entity again when the file is replaced.
+        self.table_client.upsert_entity({
+            "PartitionKey": self._location_partition_key(row_key),
+            "RowKey": "current",
+            "content_sha256": content_sha256
+        })
+
+    def forget_replaced(self, reference_container: str, filename: str, content_sha256: str = None) -> None:
+        """Forget the content registered for a file unless it is content_sha256, as its artifacts are being overwritten."""
+        row_key = self._row_key(reference_container, filename)
+        location_partition_key = self._location_partition_key(row_key)
+        try:
+            location = self.table_client.get_entity(location_partition_key, "current")
+        except ResourceNotFoundError:
+            return
+        if location['content_sha256'] == content_sha256:
+            return
+        with suppress(ResourceNotFoundError):
+            self.table_client.delete_entity(location['content_sha256'], row_key)
+        with suppress(ResourceNotFoundError):
+            self.table_client.delete_entity(location_partition_key, "current")
+
+    def remove(self, entity: Dict[str, Any]) -> None:
+        """Forget a copy whose artifacts are no longer available."""
+        self.table_client.delete_entity(entity['PartitionKey'], entity['RowKey'])
@@ -5,8 +5,9 @@ import logging
 from typing import Dict, Any
 from azure.storage.queue import QueueClient
 from azure.data.tables import TableServiceClient
-from azure.identity import DefaultAzureCredential
 from azure.core.exceptions import ResourceExistsError
+from app.integration.client_registry import get_default_credential
+from app.ingestion.queue_polling import PollingBackoff
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -21,7 +22,8 @@ class IndexingQueueSettings:
     INDEXING_TABLE_NAME = "indexing"
     MAX_MESSAGES = 32
     VISIBILITY_TIMEOUT = 600
-    SLEEP_TIME = 10
+    MIN_POLL_INTERVAL = float(os.getenv('INDEXING_QUEUE_MIN_POLL_INTERVAL', '1'))
+    MAX_POLL_INTERVAL = float(os.getenv('INDEXING_QUEUE_MAX_POLL_INTERVAL', '60'))
 
 def get_env_variable(name: str) -> str:
     value = getattr(IndexingQueueSettings, name, None)
@@ -34,7 +36,7 @@ class AzureClientManager:
     def initialize_queue_client(queue_name: str) -> QueueClient:
         account_name = get_env_variable('STORAGE_ACCOUNT_NAME')
         storage_key = IndexingQueueSettings.STORAGE_ACCOUNT_KEY
-        credential = storage_key if storage_key else DefaultAzureCredential()
+        credential = storage_key if storage_key else get_default_credential()
         queue_client = QueueClient(
             account_url=f"https://{account_name}.queue.core.windows.net",
             queue_name=queue_name,
@@ -89,14 +91,17 @@ class IndexingJobManager:
 
     async def process_indexing_queue(self, process_job_func):
         logger.info("Indexing queue processor started. Waiting for messages...")
+        backoff = PollingBackoff(IndexingQueueSettings.MIN_POLL_INTERVAL, IndexingQueueSettings.MAX_POLL_INTERVAL)
         while True:
-            messages = self.queue_client.receive_messages(
+            messages = list(self.queue_client.receive_messages(
                 max_messages=IndexingQueueSettings.MAX_MESSAGES,
                 visibility_timeout=IndexingQueueSettings.VISIBILITY_TIMEOUT
-            )
+            ))
             for message in messages:
                 await self._process_message(message, process_job_func)
-            await asyncio.sleep(IndexingQueueSettings.SLEEP_TIME)
+            delay = backoff.next_delay(len(messages), IndexingQueueSettings.MAX_MESSAGES)
+            if delay:
+                await asyncio.sleep(delay)
 
     async def _process_message(self, message, process_job_func):
         try:
@@ -1,9 +1,11 @@
+import time
 import asyncio
 import logging
 from typing import Dict, Any
 from app.ingestion.graphrag_ingestion import GraphRagIngestion
 from app.integration.graphrag_config import GraphRagConfig
 from app.integration.ingestion_job_api import IngestionJobApi
+from app.integration.telemetry import stage
 from .indexing_queue import AzureClientManager
 
 logging.basicConfig(level=logging.INFO)
@@ -57,20 +59,25 @@ class IndexingJobManager:
 
         try:
             self.update_job_status(job_id, "ingestion_started")
-            self.create_ingestion_job(container_name)
+            ingestion_started = time.perf_counter()
+            with stage("ingestion_job_submit", index_name=index_name):
+                self.create_ingestion_job(container_name)
             self.update_job_status(job_id, "graphrag_started")
             
             config = GraphRagConfig(index_name, user_id, is_restricted)
             ingestion = GraphRagIngestion(config)
-            await ingestion.process()
+            with stage("graphrag", index_name=index_name):
+                await ingestion.process()
             
             self.update_job_status(job_id, "graphrag_completed")
             
-            while True:
-                status = self.check_ingestion_job_status(job_id)
-                if status['status'] in [IndexingJobSettings.COMPLETED_STATUS, IndexingJobSettings.FAILED_STATUS]:
-                    break
-                await asyncio.sleep(IndexingJobSettings.SLEEP_TIME)
+            with stage("ingestion_job_wait", index_name=index_name):
+                while True:
+                    status = self.check_ingestion_job_status(job_id)
+                    if status['status'] in [IndexingJobSettings.COMPLETED_STATUS, IndexingJobSettings.FAILED_STATUS]:
+                        break
+                    await asyncio.sleep(IndexingJobSettings.SLEEP_TIME)
+            logger.info(f"Azure ingestion job for {container_name} finished {time.perf_counter() - ingestion_started:.0f}s after it was submitted")
             
             self.update_job_status(job_id, status['status'])
             logger.info(f"{'Completed' if status['status'] == IndexingJobSettings.COMPLETED_STATUS else 'Failed'} indexing job for container: {container_name}")
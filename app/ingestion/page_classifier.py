@@ -0,0 +1,72 @@
+import os
+import re
+import logging
+from typing import BinaryIO, NamedTuple, Union
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ContentStream
+
+class PageClassifierSettings:
+    LOCAL_TEXT_EXTRACTION_ENABLED = os.getenv('LOCAL_TEXT_EXTRACTION_ENABLED', 'false').lower() == 'true'
+    MIN_TEXT_CHARS = int(os.getenv('LOCAL_TEXT_MIN_CHARS', '200'))
+    MIN_PRINTABLE_RATIO = float(os.getenv('LOCAL_TEXT_MIN_PRINTABLE_RATIO', '0.97'))
+    MAX_RULING_OPERATORS = int(os.getenv('LOCAL_TEXT_MAX_RULING_OPERATORS', '4'))
+    MAX_COLUMNAR_LINE_RATIO = float(os.getenv('LOCAL_TEXT_MAX_COLUMNAR_LINE_RATIO', '0.2'))
+
+# Path construction operators that draw ruling lines and cell borders.
+RULING_OPERATORS = {b"re", b"l"}
+COLUMN_GAP_PATTERN = re.compile(r"\S {3,}\S|\S\t+\S")
+
+class PageClassification(NamedTuple):
+    needs_layout: bool
+    reason: str
+    text: str = ""
+
+def classify_page(pdf_page: Union[str, BinaryIO]) -> PageClassification:
+    """Decide whether a single-page PDF needs Document Intelligence or is plain born-digital text."""
+    if not isinstance(pdf_page, str):
+        pdf_page.seek(0)
+    try:
+        page = PdfReader(pdf_page).pages[0]
+        if _has_xobjects(page):
+            return PageClassification(True, "images")
+        text = page.extract_text() or ""
+        ruling_operators = sum(1 for _, operator in _content_operations(page) if operator in RULING_OPERATORS)
+    except Exception as e:
+        logging.debug(f"Could not classify page, falling back to layout analysis: {str(e)}")
+        return PageClassification(True, "unreadable")
+    finally:
+        if not isinstance(pdf_page, str):
+            pdf_page.seek(0)
+
+    visible = [char for char in text if not char.isspace()]
+    if len(visible) < PageClassifierSettings.MIN_TEXT_CHARS:
+        return PageClassification(True, "sparse text")
+    if sum(char.isprintable() for char in visible) / len(visible) < PageClassifierSettings.MIN_PRINTABLE_RATIO:
+        return PageClassification(True, "unmapped glyphs")
+    if ruling_operators > PageClassifierSettings.MAX_RULING_OPERATORS:
+        return PageClassification(True, "ruling lines")
+
+    lines = [line for line in text.splitlines() if line.strip()]
+    columnar_lines = sum(1 for line in lines if COLUMN_GAP_PATTERN.search(line.strip()))
+    if columnar_lines / len(lines) > PageClassifierSettings.MAX_COLUMNAR_LINE_RATIO:
+        return PageClassification(True, "columnar text")
+    return PageClassification(False, "text", text)
+
+def text_to_markdown(text: str) -> str:
+    """Turn extracted page text into markdown, normalizing whitespace and keeping at most one blank line."""
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines).strip() + "\n"
+
+def _has_xobjects(page) -> bool:
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else {}
+    xobjects = resources.get("/XObject")
+    return bool(xobjects is not None and xobjects.get_object())
+
+def _content_operations(page):
+    contents = page.get_contents()
+    return ContentStream(contents, page.pdf).operations if contents is not None else []
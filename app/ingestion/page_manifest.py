@@ -0,0 +1,88 @@
+import os
+import hashlib
+from typing import BinaryIO, Dict, Iterable, List, Tuple, Union
+
+from .enrichment_cache import content_hash
+from .indexing_queue import AzureClientManager
+
+class PageManifestSettings:
+    PAGE_MANIFEST_TABLE_NAME = os.getenv('PAGE_MANIFEST_TABLE_NAME', 'ingestionpages')
+
+def stream_sha256(stream: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 digest of a binary stream, read in chunks from its current position."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 digest of a file without reading it into memory at once."""
+    with open(path, 'rb') as f:
+        return stream_sha256(f, chunk_size)
+
+def artifact_sha256(artifact: Union[str, BinaryIO]) -> str:
+    """Return the hex SHA-256 digest of a page artifact given as a path or a seekable stream."""
+    if isinstance(artifact, str):
+        return file_sha256(artifact)
+    artifact.seek(0)
+    digest = stream_sha256(artifact)
+    artifact.seek(0)
+    return digest
+
+def document_key(container: str, filename: str, pdf_sha256: str, is_multimodal: bool, upload_id: str) -> str:
+    """Identify one upload of a document in one index, processed with the given enrichment.
+
+    upload_id changes whenever the file is uploaded again (the landing zone blob's ETag), so a
+    re-upload never resumes from pages checkpointed by an earlier upload that ran out of retries.
+    """
+    return content_hash(
+        container.encode('utf-8'), b'/', filename.encode('utf-8'), b'/', pdf_sha256.encode('utf-8'),
+        b'/', b'multimodal' if is_multimodal else b'text', b'/', upload_id.encode('utf-8')
+    )
+
+def missing_page_ranges(first_page: int, last_page: int, completed_pages: Iterable[int]) -> List[Tuple[int, int]]:
+    """Return the contiguous [start, end) ranges of pages in [first_page, last_page) that are not completed."""
+    completed = set(completed_pages)
+    ranges = []
+    start = None
+    for page_number in range(first_page, last_page):
+        if page_number in completed:
+            if start is not None:
+                ranges.append((start, page_number))
+                start = None
+        elif start is None:
+            start = page_number
+    if start is not None:
+        ranges.append((start, last_page))
+    return ranges
+
+class PageManifest:
+    """Records the uploaded artifacts of every page of a document, one table entity per page."""
+    def __init__(self, key: str, table_client=None):
+        self.key = key
+        self.table_client = table_client or AzureClientManager.initialize_table_client(PageManifestSettings.PAGE_MANIFEST_TABLE_NAME)
+
+    @staticmethod
+    def _row_key(page_number: int) -> str:
+        return f"{page_number:06d}"
+
+    def completed_pages(self) -> Dict[int, Dict[str, str]]:
+        """Return the recorded artifact hashes of every completed page, keyed by 0-based page number."""
+        entities = self.table_client.query_entities(f"PartitionKey eq '{self.key}'")
+        return {
+            int(entity['RowKey']): {name: value for name, value in entity.items() if name.endswith('_sha256')}
+            for entity in entities
+        }
+
+    def record_page(self, page_number: int, artifact_hashes: Dict[str, str]) -> None:
+        self.table_client.upsert_entity({"PartitionKey": self.key, "RowKey": self._row_key(page_number), **artifact_hashes})
+
+    def forget(self, page_numbers: Iterable[int]) -> None:
+        """Delete the entries of pages whose processing no longer needs to be resumed."""
+        pages = set(page_numbers)
+        row_keys = [self._row_key(page_number) for page_number in self.completed_pages() if page_number in pages]
+        # A table transaction holds at most 100 operations on one partition.
+        for start in range(0, len(row_keys), 100):
+            self.table_client.submit_transaction([
+                ("delete", {"PartitionKey": self.key, "RowKey": row_key}) for row_key in row_keys[start:start + 100]
+            ])
@@ -1,25 +1,168 @@
 import os
 from io import BytesIO
 import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
 from pdf2image import convert_from_path
-from PyPDF2 import PdfReader
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from app.integration.telemetry import stage
 
-def convert_pdf_page_to_png(pdf_path, page_num, output_dir, prefix):
-    logging.debug(f"Converting PDF page {page_num + 1} to PNG: {pdf_path}")
+RENDER_BATCH_PAGES = int(os.getenv('RENDER_BATCH_PAGES', '16'))
+RENDER_THREAD_COUNT = int(os.getenv('RENDER_THREAD_COUNT', str(os.cpu_count() or 1)))
+PNG_ENCODE_WORKERS = int(os.getenv('PNG_ENCODE_WORKERS', str(os.cpu_count() or 1)))
+RENDER_DPI = int(os.getenv('RENDER_DPI', '200'))
+THUMBNAIL_DPI = int(os.getenv('THUMBNAIL_DPI', '36'))
+PREVIEW_DPI = int(os.getenv('PREVIEW_DPI', '100'))
+# Smaller page images derived from the full render: variant -> (blob suffix, format, DPI, encoder options).
+PAGE_IMAGE_VARIANTS = {
+    "thumb": (".thumb.webp", "WEBP", THUMBNAIL_DPI, {"quality": 70}),
+    "preview": (".preview.jpg", "JPEG", PREVIEW_DPI, {"quality": 80, "optimize": True}),
+}
+# In-memory page buffers larger than this spill over to a temporary file.
+PAGE_BUFFER_MAX_MEMORY = int(os.getenv('PAGE_BUFFER_MAX_MEMORY', str(32 * 1024 * 1024)))
+
+_encode_pool = None
+_encode_pool_lock = threading.Lock()
+
+def _get_encode_pool() -> Executor:
+    """Return the process pool shared by all documents for PNG encoding."""
+    global _encode_pool
+    with _encode_pool_lock:
+        if _encode_pool is None:
+            # Spawn instead of fork: the upload worker is multi-threaded when it renders.
+            _encode_pool = ProcessPoolExecutor(max_workers=PNG_ENCODE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _encode_pool
+
+def _discard_encode_pool(pool: Executor) -> None:
+    """Drop a broken encode pool so the next _get_encode_pool call starts a new one."""
+    global _encode_pool
+    with _encode_pool_lock:
+        if _encode_pool is pool:
+            _encode_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _encode_png(raster_path: str, png_path: Optional[str] = None) -> Tuple[Union[str, bytes], Dict[str, bytes]]:
+    """Encode a raw poppler raster as PNG and as its smaller image variants, then remove the raster.
+
+    Returns png_path, or the encoded bytes when no path is given, together with the variants.
+    """
+    output = png_path or BytesIO()
+    with Image.open(raster_path) as image:
+        image.save(output, "PNG")
+        variants = create_page_image_variants(image)
+    os.remove(raster_path)
+    return png_path or output.getvalue(), variants
+
+def new_page_buffer(data: bytes = b"") -> BinaryIO:
+    """Return a seekable buffer for a page artifact that stays in memory up to PAGE_BUFFER_MAX_MEMORY bytes."""
+    buffer = tempfile.SpooledTemporaryFile(max_size=PAGE_BUFFER_MAX_MEMORY)
+    buffer.write(data)
+    buffer.seek(0)
+    return buffer
+
+def render_pdf_pages_to_png(pdf_path: str, output_dir: str, prefix: str, first_page: int, last_page: int, batch_size: int = None, in_memory: bool = False) -> Iterator[Tuple[int, Union[str, BinaryIO], Dict[str, bytes]]]:
+    """Render a page range to PNGs and yield (zero-based page number, path, image variants) in page order.
+
+    Each batch of pages is rasterized by a single poppler invocation using RENDER_THREAD_COUNT
+    threads; the PNG and variant encoding runs in a process pool while later pages are being
+    consumed. With in_memory, page buffers from new_page_buffer are yielded instead of paths.
+    """
     if not os.path.exists(pdf_path):
         raise ValueError(f"The file {pdf_path} does not exist.")
-    
-    images = convert_from_path(pdf_path, first_page=1, last_page=1)
-    if images:
-        output_filename = os.path.join(output_dir, f"{prefix}___Page{page_num+1}.png")
-        for image in images:
-            image.save(output_filename, "PNG")
-        logging.debug(f"Generated PNG: {output_filename}")
-        return output_filename
-    else:
-        raise ValueError(f"No images were generated for page {page_num + 1} of {pdf_path}")
-
-def get_pdf_page_count(pdf_bytes: BytesIO) -> int:
+
+    batch_size = max(1, batch_size or RENDER_BATCH_PAGES)
+    with tempfile.TemporaryDirectory(dir=output_dir) as raster_dir:
+        for batch_start in range(first_page, last_page, batch_size):
+            batch_end = min(batch_start + batch_size, last_page)
+            next_page = batch_start
+            try:
+                for page_num, page, variants in _render_batch(pdf_path, raster_dir, output_dir, prefix, batch_start, batch_end, in_memory):
+                    next_page = page_num + 1
+                    yield page_num, page, variants
+            except BrokenProcessPool:
+                # An encoder process died, e.g. killed for memory; the rest of the batch gets one more try in a new pool.
+                logging.warning(f"PNG encoding of pages {next_page + 1}-{batch_end} of {pdf_path} failed in a broken process pool, retrying with a new pool")
+                yield from _render_batch(pdf_path, raster_dir, output_dir, prefix, next_page, batch_end, in_memory)
+
+def _render_batch(pdf_path: str, raster_dir: str, output_dir: str, prefix: str, batch_start: int, batch_end: int, in_memory: bool) -> Iterator[Tuple[int, Union[str, BinaryIO], Dict[str, bytes]]]:
+    """Rasterize pages [batch_start, batch_end) with one poppler call and yield them as they are encoded."""
+    logging.debug(f"Rendering pages {batch_start + 1}-{batch_end} of {pdf_path}")
+    with stage("render", page_count=batch_end - batch_start):
+        raster_paths = convert_from_path(
+            pdf_path,
+            first_page=batch_start + 1,
+            last_page=batch_end,
+            dpi=RENDER_DPI,
+            thread_count=RENDER_THREAD_COUNT,
+            output_folder=raster_dir,
+            fmt="ppm",
+            paths_only=True
+        )
+    if len(raster_paths) != batch_end - batch_start:
+        raise ValueError(f"Expected {batch_end - batch_start} images for pages {batch_start + 1}-{batch_end} of {pdf_path}, got {len(raster_paths)}")
+
+    pool = _get_encode_pool()
+    try:
+        futures = [
+            (page_num, pool.submit(_encode_png, raster_path, None if in_memory else os.path.join(output_dir, f"{prefix}___Page{page_num+1}.png")))
+            for page_num, raster_path in zip(range(batch_start, batch_end), raster_paths)
+        ]
+        for page_num, future in futures:
+            png, variants = future.result()
+            yield page_num, new_page_buffer(png) if in_memory else png, variants
+    except BrokenProcessPool:
+        _discard_encode_pool(pool)
+        raise
+
+def page_image_blob_name(filename: str, page_number: int, variant: str = "full") -> str:
+    """Return the reference blob name of a page image; page_number is one-based."""
+    suffix = PAGE_IMAGE_VARIANTS[variant][0] if variant in PAGE_IMAGE_VARIANTS else ".png"
+    return f"{filename}___Page{page_number}{suffix}"
+
+def create_page_image_variants(image: Image.Image) -> Dict[str, bytes]:
+    """Downscale a page image rendered at RENDER_DPI into every PAGE_IMAGE_VARIANTS entry."""
+    image = image.convert("RGB")
+    variants = {}
+    for variant, (_, image_format, dpi, options) in PAGE_IMAGE_VARIANTS.items():
+        scale = min(1.0, dpi / RENDER_DPI)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        output = BytesIO()
+        image.resize(size, Image.LANCZOS).save(output, image_format, **options)
+        variants[variant] = output.getvalue()
+    return variants
+
+def split_pdf_pages(pdf_path: str, output_dir: str, prefix: str, first_page: int = 0, last_page: Optional[int] = None, in_memory: bool = False) -> Iterator[Tuple[int, Union[str, BinaryIO]]]:
+    """Split a PDF into single-page PDFs, parsing the source document only once.
+
+    Pages are written lazily, one per iteration, and yielded as (zero-based page number, path).
+    With in_memory, page buffers from new_page_buffer are yielded instead of paths.
+    """
+    logging.debug(f"Splitting PDF into pages: {pdf_path}")
+    with open(pdf_path, 'rb') as file:
+        reader = PdfReader(file)
+        page_count = len(reader.pages)
+        last_page = page_count if last_page is None else min(last_page, page_count)
+        for page_num in range(first_page, last_page):
+            # The stage ends before the page is yielded so it does not include the consumer's time.
+            with stage("split", page_count=1):
+                writer = PdfWriter()
+                writer.add_page(reader.pages[page_num])
+                if in_memory:
+                    page = new_page_buffer()
+                    writer.write(page)
+                    page.seek(0)
+                else:
+                    page = os.path.join(output_dir, f"{prefix}___Page{page_num+1}.pdf")
+                    with open(page, 'wb') as output_file:
+                        writer.write(output_file)
+            yield page_num, page
+
+def get_pdf_page_count(pdf_bytes: BinaryIO) -> int:
     try:
         reader = PdfReader(pdf_bytes)
         return len(reader.pages)
@@ -0,0 +1,77 @@
+import os
+import threading
+from typing import Dict, List
+
+class QueueLaneSettings:
+    SMALL_LANE_MAX_PAGES = int(os.getenv('SMALL_LANE_MAX_PAGES', '10'))
+    MEDIUM_LANE_MAX_PAGES = int(os.getenv('MEDIUM_LANE_MAX_PAGES', '100'))
+    SMALL_LANE_WEIGHT = int(os.getenv('SMALL_LANE_WEIGHT', '6'))
+    MEDIUM_LANE_WEIGHT = int(os.getenv('MEDIUM_LANE_WEIGHT', '3'))
+    LARGE_LANE_WEIGHT = int(os.getenv('LARGE_LANE_WEIGHT', '1'))
+
+LANES = ("small", "medium", "large")
+
+def lane_queue_name(base_queue_name: str, lane: str) -> str:
+    """Return the queue of a lane; the large lane keeps the base name so messages queued before lanes existed are drained."""
+    return base_queue_name if lane == "large" else f"{base_queue_name}-{lane}"
+
+def lane_for_pages(num_pages: int) -> str:
+    """Route a document to a lane by its total page count; unknown sizes go to the large lane."""
+    if not num_pages:
+        return "large"
+    if num_pages <= QueueLaneSettings.SMALL_LANE_MAX_PAGES:
+        return "small"
+    if num_pages <= QueueLaneSettings.MEDIUM_LANE_MAX_PAGES:
+        return "medium"
+    return "large"
+
+def lane_weights() -> Dict[str, int]:
+    return {
+        "small": QueueLaneSettings.SMALL_LANE_WEIGHT,
+        "medium": QueueLaneSettings.MEDIUM_LANE_WEIGHT,
+        "large": QueueLaneSettings.LARGE_LANE_WEIGHT
+    }
+
+class LaneScheduler:
+    """Chooses which lane a worker receives from next, using smooth weighted round robin.
+
+    Over any window of sum(weights) picks every lane is chosen in proportion to its weight, so
+    small documents are preferred without ever starving the large lane. The remaining lanes are
+    returned after the pick so a worker can fall through to them when the chosen lane is empty.
+    """
+    def __init__(self, weights: Dict[str, int] = None):
+        self.weights = weights or lane_weights()
+        # Lanes with a weight of 0 are never picked first but are still drained when the others are empty.
+        self._current = {lane: 0 for lane, weight in self.weights.items() if weight > 0}
+        self._wait_stats = {lane: {"messages": 0, "total_wait": 0.0, "max_wait": 0.0} for lane in self.weights}
+        self._lock = threading.Lock()
+
+    def order(self) -> List[str]:
+        """Return the lanes to try for the next receive, starting with the weighted pick."""
+        by_weight = sorted(self.weights, key=self.weights.get, reverse=True)
+        if not self._current:
+            return by_weight
+        for lane in self._current:
+            self._current[lane] += self.weights[lane]
+        chosen = max(self._current, key=self._current.get)
+        self._current[chosen] -= sum(self.weights.values())
+        return [chosen] + [lane for lane in by_weight if lane != chosen]
+
+    def record_wait(self, lane: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._wait_stats[lane]
+            stats["messages"] += 1
+            stats["total_wait"] += seconds
+            stats["max_wait"] = max(stats["max_wait"], seconds)
+
+    def wait_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return the number of received messages and their average and maximum queue wait per lane."""
+        with self._lock:
+            return {
+                lane: {
+                    "messages": stats["messages"],
+                    "average_wait": stats["total_wait"] / stats["messages"] if stats["messages"] else 0.0,
+                    "max_wait": stats["max_wait"]
+                }
+                for lane, stats in self._wait_stats.items()
+            }
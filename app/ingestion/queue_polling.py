@@ -0,0 +1,26 @@
+import random
+
+class PollingBackoff:
+    """Decides how long a queue processor waits before its next receive.
+
+    Full batches are followed by an immediate receive, partial batches by the minimum
+    interval, and consecutive empty receives back off exponentially with full jitter.
+    """
+    def __init__(self, min_interval: float, max_interval: float, multiplier: float = 2.0):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.multiplier = multiplier
+        self.empty_polls = 0
+
+    def next_delay(self, received: int, requested: int) -> float:
+        """Return the delay in seconds after a receive that returned received of requested messages."""
+        if received >= requested:
+            self.empty_polls = 0
+            return 0.0
+        if received:
+            self.empty_polls = 0
+            return self.min_interval
+        self.empty_polls += 1
+        ceiling = min(self.max_interval, self.min_interval * self.multiplier ** self.empty_polls)
+        # Jitter keeps idle workers from polling the queue in lockstep.
+        return random.uniform(self.min_interval, ceiling)
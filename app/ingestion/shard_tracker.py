@@ -0,0 +1,46 @@
+import os
+import logging
+from typing import List, Tuple
+from azure.core.exceptions import ResourceNotFoundError
+
+from .indexing_queue import AzureClientManager
+
+class ShardTrackerSettings:
+    SHARD_PAGES = int(os.getenv('SHARD_PAGES', '50'))
+    SHARD_TABLE_NAME = os.getenv('SHARD_TABLE_NAME', 'ingestionshards')
+
+def plan_shards(num_pages: int, shard_pages: int = None) -> List[Tuple[int, int]]:
+    """Split a document into [first_page, last_page) ranges of at most shard_pages pages."""
+    shard_pages = max(1, shard_pages or ShardTrackerSettings.SHARD_PAGES)
+    return [(first_page, min(first_page + shard_pages, num_pages)) for first_page in range(0, num_pages, shard_pages)]
+
+class ShardTracker:
+    """Tracks the page-range shards of a document in Table storage, one entity per shard."""
+    def __init__(self, table_client=None):
+        self.table_client = table_client or AzureClientManager.initialize_table_client(ShardTrackerSettings.SHARD_TABLE_NAME)
+
+    def register(self, document_id: str, filename: str, shards: List[Tuple[int, int]]) -> None:
+        for shard_index, (first_page, last_page) in enumerate(shards):
+            self.table_client.upsert_entity({
+                "PartitionKey": document_id,
+                "RowKey": str(shard_index),
+                "filename": filename,
+                "first_page": first_page,
+                "last_page": last_page,
+                "status": "pending"
+            })
+
+    def complete(self, document_id: str, shard_index: int) -> bool:
+        """Mark a shard as completed and return True if every shard of the document is completed."""
+        self.table_client.upsert_entity({"PartitionKey": document_id, "RowKey": str(shard_index), "status": "completed"})
+        # Each worker records its own shard before reading the others, so the last one to finish always sees them all.
+        shards = self.table_client.query_entities(f"PartitionKey eq '{document_id}'", select=["status"])
+        return all(shard["status"] == "completed" for shard in shards)
+
+    def forget(self, document_id: str) -> None:
+        """Delete the tracking entities of a document once it is fully processed."""
+        for shard in self.table_client.query_entities(f"PartitionKey eq '{document_id}'", select=["RowKey"]):
+            try:
+                self.table_client.delete_entity(document_id, shard["RowKey"])
+            except ResourceNotFoundError:
+                logging.debug(f"Shard {shard['RowKey']} of {document_id} was already deleted")
@@ -1,20 +1,48 @@
 import os
-from typing import List
+import re
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Tuple
+from openai import APIError
 from app.integration.azure_openai import get_azure_openai_client, generate_completion
+from .enrichment_cache import get_enrichment_cache, content_hash
 
 ENABLE_TABLE_SUMMARY = True
 ENABLE_ROW_DESCRIPTIONS = False
 ENABLE_QA_PAIRS = True
+TABLE_ENRICHMENT_CACHE_VERSION = "v1"
+ROW_DESCRIPTION_BATCH_TOKENS = int(os.getenv('ROW_DESCRIPTION_BATCH_TOKENS', '2000'))
+ROW_DESCRIPTION_TOKENS_PER_ROW = 80
+# Completion tokens a single row batch may request; must stay within the deployment's completion limit.
+ROW_DESCRIPTION_MAX_OUTPUT_TOKENS = int(os.getenv('ROW_DESCRIPTION_MAX_OUTPUT_TOKENS', '4000'))
+ROW_DESCRIPTION_RESPONSE_OVERHEAD_TOKENS = 50
+TABLE_ENRICHMENT_CONCURRENCY = int(os.getenv('TABLE_ENRICHMENT_CONCURRENCY', '4'))
+
+class TableSpan(NamedTuple):
+    """A markdown table and the [start, end) character range it occupies, including its trailing blank line."""
+    start: int
+    end: int
+    table: str
 
 def enhance_markdown(markdown_content: str) -> str:
     """Enhance markdown content with additional information."""
-    tables = extract_tables(markdown_content)
-    enhanced_tables = [enhance_table(table) for table in tables]
-    
-    for original, enhanced in zip(tables, enhanced_tables):
-        markdown_content = markdown_content.replace(original, enhanced)
-    
-    return markdown_content
+    spans = locate_tables(markdown_content)
+    if not spans:
+        return markdown_content
+
+    unique_tables = list(dict.fromkeys(span.table for span in spans))
+    with ThreadPoolExecutor(max_workers=max(1, min(TABLE_ENRICHMENT_CONCURRENCY, len(unique_tables))), thread_name_prefix="table") as executor:
+        enhanced_tables = dict(zip(unique_tables, executor.map(enhance_table, unique_tables)))
+
+    parts = []
+    cursor = 0
+    for span in spans:
+        parts.append(markdown_content[cursor:span.start])
+        parts.append(enhanced_tables[span.table])
+        cursor = span.end
+    parts.append(markdown_content[cursor:])
+    return ''.join(parts)
 
 def extract_tables(markdown_content: str) -> List[str]:
     """
@@ -26,6 +54,19 @@ def extract_tables(markdown_content: str) -> List[str]:
     Returns:
     list of str: A list of extracted tables, each formatted as a string including trailing newlines.
     """
+    return [span.table for span in locate_tables(markdown_content)]
+
+def locate_tables(markdown_content: str) -> List[TableSpan]:
+    """
+    Locate markdown tables in the provided markdown content.
+
+    Args:
+    markdown_content (str): The full markdown text containing zero or more markdown tables.
+
+    Returns:
+    list of TableSpan: The position of every table in the content, in order, together with the
+    table text formatted as returned by extract_tables.
+    """
     def is_table_line(line: str) -> bool:
         """Check if a line is part of a markdown table."""
         return '|' in line and line.strip().startswith('|') and line.strip().endswith('|')
@@ -36,39 +77,51 @@ def extract_tables(markdown_content: str) -> List[str]:
             return current_table.strip() + '\n\n'
         return current_table
 
-    lines = markdown_content.split('\n')
-    tables = []
+    def close_table(table_lines: List[str], start: int, end: int) -> TableSpan:
+        """Build the span of a table, absorbing up to two newlines that follow it."""
+        for _ in range(2):
+            if markdown_content.startswith('\n', end):
+                end += 1
+        return TableSpan(start, end, finalize_table('\n'.join(table_lines)))
+
+    spans = []
     current_table = []
+    table_start = table_end = 0
+    offset = 0
 
-    for line in lines:
+    for line in markdown_content.split('\n'):
         if is_table_line(line):
+            if not current_table:
+                table_start = offset
             current_table.append(line)
-        else:
-            if current_table:
-                tables.append(finalize_table('\n'.join(current_table)))
-                current_table = []
+            table_end = offset + len(line)
+        elif current_table:
+            spans.append(close_table(current_table, table_start, table_end))
+            current_table = []
+        offset += len(line) + 1
 
     if current_table:
-        tables.append(finalize_table('\n'.join(current_table)))
+        spans.append(close_table(current_table, table_start, table_end))
 
-    return tables
+    return spans
 
 def enhance_table(table_content: str) -> str:
     """Apply all enabled enhancements to a single table."""
     enhanced_content = table_content
     
-    if ENABLE_TABLE_SUMMARY:
-        enhanced_content += generate_table_summary(table_content)
-    
     if ENABLE_ROW_DESCRIPTIONS:
         enhanced_content = generate_row_descriptions(enhanced_content)
     
-    if ENABLE_QA_PAIRS:
-        enhanced_content += generate_qa_pairs(enhanced_content)
+    if ENABLE_TABLE_SUMMARY or ENABLE_QA_PAIRS:
+        enrichment = get_table_enrichment(table_content)
+        if ENABLE_TABLE_SUMMARY:
+            enhanced_content += format_table_summary(enrichment["summary"])
+        if ENABLE_QA_PAIRS:
+            enhanced_content += format_qa_pairs(enrichment["qa_pairs"])
     
     return enhanced_content
 
-def llm(prompt: str) -> str:
+def llm(prompt: str, max_tokens: int = 150) -> str:
     """Make a call to GPT-4 model."""
     client = get_azure_openai_client()
     return generate_completion(
@@ -77,12 +130,98 @@ def llm(prompt: str) -> str:
             {"role": "system", "content": "You are a helpful assistant skilled in analyzing and describing tabular data."},
             {"role": "user", "content": prompt}
         ],
-        os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"]
+        os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"],
+        max_tokens=max_tokens
     )
 
+def normalize_table(table_content: str) -> str:
+    """Normalize cell whitespace and separator rows so equivalent tables hash identically."""
+    normalized_rows = []
+    for line in table_content.strip().split('\n'):
+        cells = [re.sub(r'\s+', ' ', cell.strip()) for cell in line.strip().strip('|').split('|')]
+        if all(re.fullmatch(r':?-+:?', cell) for cell in cells if cell):
+            cells = ['---' for _ in cells]
+        normalized_rows.append('|'.join(cells))
+    return '\n'.join(normalized_rows)
+
+def get_table_enrichment_stats() -> Dict[str, int]:
+    """Return cache and call counters of the table enrichment."""
+    return get_enrichment_cache("tables").stats()
+
+def get_table_enrichment(table_content: str) -> Dict[str, Any]:
+    """Return the summary and Q&A pairs of a table, from cache or from a single LLM call."""
+    cache = get_enrichment_cache("tables")
+    key = content_hash(TABLE_ENRICHMENT_CACHE_VERSION.encode(), normalize_table(table_content).encode('utf-8'))
+
+    cached = cache.get(key)
+    if cached is not None:
+        cache.increment("calls_saved", 2)
+        return json.loads(cached)
+
+    try:
+        enrichment = generate_table_enrichment(table_content)
+        cache.increment("llm_calls")
+        cache.increment("calls_saved")
+    except ValueError as e:
+        logging.warning(f"Falling back to separate summary and Q&A calls: {str(e)}")
+        enrichment = {
+            "summary": llm(_table_summary_prompt(table_content)),
+            "qa_pairs": llm(_qa_pairs_prompt(table_content))
+        }
+        cache.increment("llm_calls", 2)
+
+    cache.set(key, json.dumps(enrichment))
+    return enrichment
+
+def generate_table_enrichment(table_content: str) -> Dict[str, Any]:
+    """Generate the summary and Q&A pairs of a table with one structured LLM call."""
+    prompt = f"""
+Given the following table:
+
+{table_content}
+
+Please analyze the table and respond with a JSON object with exactly two keys:
+
+"summary": a concise summary (no longer than 3-4 sentences) that identifies the main topic or purpose of the table, highlights the most important data points or trends, and mentions any significant patterns or relationships between columns.
+
+"qa_pairs": a list of 3-5 objects with "question" and "answer" keys. The questions should cover key information and insights from the table, vary in complexity, and be answerable solely from the table. Keep them clear and concise.
+
+Respond with the JSON object only.
+    """
+    response = llm(prompt, max_tokens=800)
+    try:
+        parsed = json.loads(_strip_code_fence(response))
+        summary = str(parsed["summary"]).strip()
+        qa_pairs = [{"question": str(pair["question"]).strip(), "answer": str(pair["answer"]).strip()} for pair in parsed["qa_pairs"]]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid table enrichment response: {str(e)}") from e
+    return {"summary": summary, "qa_pairs": qa_pairs}
+
+def _strip_code_fence(response: str) -> str:
+    """Remove a surrounding markdown code fence from an LLM response."""
+    match = re.fullmatch(r'\s*```(?:json)?\s*(.*?)\s*```\s*', response, re.DOTALL)
+    return match.group(1) if match else response
+
+def format_table_summary(summary: str) -> str:
+    """Format a table summary as a markdown comment."""
+    return f"\n\n<!-- Table Summary: {summary} -->\n"
+
+def format_qa_pairs(qa_pairs) -> str:
+    """Format Q&A pairs, given as text or as question/answer dicts, as a markdown comment."""
+    if not isinstance(qa_pairs, str):
+        qa_pairs = "\n\n".join(
+            f"Q{i}: {pair['question']}\nA{i}: {pair['answer']}"
+            for i, pair in enumerate(qa_pairs, start=1)
+        )
+    return f"\n\n<!-- Q&A Pairs:\n{qa_pairs}\n-->\n"
+
 def generate_table_summary(table_content: str) -> str:
     """Generate a summary of the table content."""
-    prompt = f"""
+    summary = llm(_table_summary_prompt(table_content))
+    return format_table_summary(summary)
+
+def _table_summary_prompt(table_content: str) -> str:
+    return f"""
 Given the following table:
 
 {table_content}
@@ -96,21 +235,96 @@ Please provide a concise summary that captures the key information presented in
 
 Aim to give a reader a quick understanding of what this table is about and its most crucial insights.
     """
-    summary = llm(prompt)
-    return f"\n\n<!-- Table Summary: {summary} -->\n"
 
 def generate_row_descriptions(table_content: str) -> str:
-    """Generate natural language descriptions for each row."""
+    """Generate natural language descriptions for each row, several rows per LLM call."""
     rows = table_content.split('\n')
     header = rows[0]
     separator = rows[1]
     data_rows = rows[2:]
-    
+
+    described_rows = [(i, row) for i, row in enumerate(data_rows) if row.strip()]
+    batches = batch_rows(header, described_rows)
+    descriptions = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(TABLE_ENRICHMENT_CONCURRENCY, len(batches) or 1)), thread_name_prefix="rows") as executor:
+        try:
+            for batch_descriptions in executor.map(lambda batch: describe_row_batch(header, batch), batches):
+                descriptions.update(batch_descriptions)
+        except APIError as e:
+            logging.warning(f"Could not describe table rows, keeping the table without descriptions: {str(e)}")
+            return table_content
+
     new_rows = [header, separator]
-    for row in data_rows:
+    for i, row in enumerate(data_rows):
         new_rows.append(row)
-        if row.strip(): 
-            prompt = f"""
+        if i in descriptions:
+            new_rows.append(f"<!-- Row Description: {descriptions[i]} -->")
+    
+    return '\n'.join(new_rows)
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def max_rows_per_batch() -> int:
+    """Return how many rows fit in one batch without requesting more than ROW_DESCRIPTION_MAX_OUTPUT_TOKENS."""
+    return max(1, (ROW_DESCRIPTION_MAX_OUTPUT_TOKENS - ROW_DESCRIPTION_RESPONSE_OVERHEAD_TOKENS) // ROW_DESCRIPTION_TOKENS_PER_ROW)
+
+def batch_rows(header: str, rows: List[Tuple[int, str]], max_tokens: int = None, max_rows: int = None) -> List[List[Tuple[int, str]]]:
+    """Split numbered rows into consecutive batches whose prompt, header included, stays within max_tokens.
+
+    Batches also hold at most max_rows rows, so that the descriptions they request fit in one completion.
+    """
+    max_tokens = max_tokens or ROW_DESCRIPTION_BATCH_TOKENS
+    max_rows = max_rows or max_rows_per_batch()
+    batches = []
+    current_batch = []
+    current_tokens = estimate_tokens(header)
+    for index, row in rows:
+        row_tokens = estimate_tokens(row)
+        if current_batch and (current_tokens + row_tokens > max_tokens or len(current_batch) >= max_rows):
+            batches.append(current_batch)
+            current_batch = []
+            current_tokens = estimate_tokens(header)
+        current_batch.append((index, row))
+        current_tokens += row_tokens
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+def describe_row_batch(header: str, batch: List[Tuple[int, str]]) -> Dict[int, str]:
+    """Describe a batch of rows with one structured LLM call, falling back to one call per row."""
+    numbered_rows = '\n'.join(f"{index}: {row}" for index, row in batch)
+    prompt = f"""
+Given the following table header and numbered rows of data:
+
+Header: {header}
+Rows:
+{numbered_rows}
+
+Please provide a concise, natural language description of each row. Each description should:
+
+1. Capture the key information presented in the row.
+2. Relate the data to the column headers for context.
+3. Highlight any notable or unusual values.
+4. Be a single, coherent sentence.
+
+Respond with a JSON object only, in the form {{"descriptions": [{{"row": <row number>, "description": "<description>"}}]}}, with one entry per row.
+    """
+    response = llm(prompt, max_tokens=ROW_DESCRIPTION_TOKENS_PER_ROW * len(batch) + ROW_DESCRIPTION_RESPONSE_OVERHEAD_TOKENS)
+    try:
+        parsed = json.loads(_strip_code_fence(response))
+        descriptions = {int(item["row"]): str(item["description"]).strip() for item in parsed["descriptions"]}
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        logging.warning(f"Falling back to one call per row: {str(e)}")
+        return {index: describe_row(header, row) for index, row in batch}
+
+    batch_indices = {index for index, _ in batch}
+    return {index: description for index, description in descriptions.items() if index in batch_indices}
+
+def describe_row(header: str, row: str) -> str:
+    """Describe a single row with its own LLM call."""
+    prompt = f"""
 Given the following table header and a specific row of data:
 
 Header: {header}
@@ -125,14 +339,15 @@ Please provide a concise, natural language description of this row. Your descrip
 
 Aim to give a clear and informative summary of what this row represents in the context of the table.
             """
-            description = llm(prompt)
-            new_rows.append(f"<!-- Row Description: {description} -->")
-    
-    return '\n'.join(new_rows)
+    return llm(prompt)
 
 def generate_qa_pairs(table_content: str) -> str:
     """Generate question-answer pairs based on the table content."""
-    prompt = f"""
+    qa_pairs = llm(_qa_pairs_prompt(table_content))
+    return format_qa_pairs(qa_pairs)
+
+def _qa_pairs_prompt(table_content: str) -> str:
+    return f"""
 Given the following table:
 
 {table_content}
@@ -153,6 +368,4 @@ Q2: [Question 2]
 A2: [Answer 2]
 
 ... and so on.
-    """
-    qa_pairs = llm(prompt)
-    return f"\n\n<!-- Q&A Pairs:\n{qa_pairs}\n-->\n"
\ No newline at end of file
+    """
\ No newline at end of file
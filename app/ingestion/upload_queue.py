@@ -1,19 +1,34 @@
 import os
 import json
-import time
+import signal
 import logging
 import tempfile
-from typing import Dict, Any
+import threading
+import uuid
+from datetime import datetime, timezone
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from io import BytesIO
+from typing import Dict, Any, List
 from azure.storage.queue import QueueClient
-from azure.identity import DefaultAzureCredential
-import PyPDF2
 from contextlib import suppress
-from azure.core.exceptions import ResourceExistsError
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 
-from .doc_intelligence import convert_pdf_page_to_md
-from .pdf_processing import convert_pdf_page_to_png, get_pdf_page_count
-from ..integration.blob_service import initialize_blob_service, download_blob_to_file, upload_file_to_blob
+from .doc_intelligence import convert_pdf_page_to_markdown, analyze_pdf_pages, get_layout_cache, LayoutNotCachedError
+from .pdf_processing import (
+    render_pdf_pages_to_png, split_pdf_pages, get_pdf_page_count, new_page_buffer,
+    page_image_blob_name, PAGE_IMAGE_VARIANTS
+)
+from .enrichment_cache import get_enrichment_cache
+from .queue_polling import PollingBackoff
+from .queue_lanes import LANES, LaneScheduler, lane_for_pages, lane_queue_name
+from .shard_tracker import ShardTracker, plan_shards
+from .page_manifest import PageManifest, artifact_sha256, document_key, file_sha256, missing_page_ranges
+from .fingerprint_registry import FingerprintRegistry, FingerprintRegistrySettings
+from .table_postprocessor import get_table_enrichment_stats
+from ..integration.blob_service import initialize_blob_service, download_blob_to_file, upload_file_to_blob, upload_stream_to_blob, copy_blob, list_files_in_container
 from ..integration.index_manager import create_index_manager
+from ..integration.client_registry import get_shared_client, get_default_credential, create_azure_transport
+from ..integration.telemetry import bind_context, stage
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -28,7 +43,19 @@ class UploadQueueSettings:
     MAX_MESSAGES = 32
     VISIBILITY_TIMEOUT = 300
     MAX_DEQUEUE_COUNT = 2
-    SLEEP_TIME = 5
+    MIN_POLL_INTERVAL = float(os.getenv('UPLOAD_QUEUE_MIN_POLL_INTERVAL', '1'))
+    MAX_POLL_INTERVAL = float(os.getenv('UPLOAD_QUEUE_MAX_POLL_INTERVAL', '30'))
+    MESSAGE_CONCURRENCY = int(os.getenv('MESSAGE_CONCURRENCY', '2'))
+    LEASE_RENEWAL_INTERVAL = int(os.getenv('LEASE_RENEWAL_INTERVAL', str(VISIBILITY_TIMEOUT // 3)))
+    PAGE_CONCURRENCY = int(os.getenv('PAGE_CONCURRENCY', '4'))
+    # Page artifacts are kept in memory buffers unless this is enabled; oversized buffers spill to disk either way.
+    PAGE_ARTIFACTS_ON_DISK = os.getenv('PAGE_ARTIFACTS_ON_DISK', 'false').lower() == 'true'
+    ARTIFACT_UPLOAD_CONCURRENCY = int(os.getenv('ARTIFACT_UPLOAD_CONCURRENCY', '8'))
+    QUEUE_SEND_CONCURRENCY = int(os.getenv('QUEUE_SEND_CONCURRENCY', '8'))
+    # "page" analyzes every page separately, "document" analyzes page ranges of the original PDF.
+    DOCUMENT_ANALYSIS_MODE = os.getenv('DOCUMENT_ANALYSIS_MODE', 'page')
+    DOCUMENT_ANALYSIS_BATCH_PAGES = int(os.getenv('DOCUMENT_ANALYSIS_BATCH_PAGES', '100'))
+    DOCUMENT_ANALYSIS_CONCURRENCY = int(os.getenv('DOCUMENT_ANALYSIS_CONCURRENCY', '2'))
 
 def get_env_variable(name: str) -> str:
     value = getattr(UploadQueueSettings, name, None)
@@ -36,119 +63,621 @@ def get_env_variable(name: str) -> str:
         raise ValueError(f"{name} environment variable is not set")
     return value
 
+_upload_pool = None
+_upload_pool_lock = threading.Lock()
+
+def _get_upload_pool() -> ThreadPoolExecutor:
+    """Return the thread pool shared by all pages for uploading their artifacts."""
+    global _upload_pool
+    with _upload_pool_lock:
+        if _upload_pool is None:
+            _upload_pool = ThreadPoolExecutor(max_workers=max(1, UploadQueueSettings.ARTIFACT_UPLOAD_CONCURRENCY), thread_name_prefix="upload")
+        return _upload_pool
+
+class PageProcessingError(Exception):
+    """Raised after a document was processed but some of its pages failed."""
+    def __init__(self, filename: str, failed_pages: Dict[int, str]):
+        self.filename = filename
+        self.failed_pages = failed_pages
+        pages = ", ".join(str(page_number + 1) for page_number in sorted(failed_pages))
+        super().__init__(f"{len(failed_pages)} page(s) of {filename} failed: {pages}")
+
+class MessageLease:
+    """Keeps a received message invisible to other workers while it is being processed."""
+    def __init__(self, queue_client: QueueClient, message, lane: str = "large"):
+        self.queue_client = queue_client
+        self.message = message
+        self.lane = lane
+        self.wait_seconds = None
+        self._lock = threading.Lock()
+
+    def renew(self):
+        with self._lock:
+            updated = self.queue_client.update_message(
+                self.message.id,
+                pop_receipt=self.message.pop_receipt,
+                visibility_timeout=UploadQueueSettings.VISIBILITY_TIMEOUT
+            )
+            # Every update invalidates the previous pop receipt.
+            self.message.pop_receipt = updated.pop_receipt
+            self.message.next_visible_on = updated.next_visible_on
+
+    def delete(self):
+        with self._lock:
+            self.queue_client.delete_message(self.message)
+
 class QueueManager:
     def __init__(self):
-        self.queue_client = self._initialize_queue_client()
+        # Documents are routed into small, medium and large lanes, each backed by its own queue.
+        self.lane_clients = {
+            lane: self._initialize_queue_client(lane_queue_name(UploadQueueSettings.QUEUE_NAME, lane)) for lane in LANES
+        }
+        self.scheduler = LaneScheduler()
+        self.stop_event = threading.Event()
+        self._leases: Dict[str, MessageLease] = {}
+        self._leases_changed = threading.Condition()
+        self._created_lanes = set()
+        self._idle_polls = 0
+        self._fingerprint_registry = None
+        self._registry_lock = threading.Lock()
 
-    def _initialize_queue_client(self) -> QueueClient:
+    def _initialize_queue_client(self, queue_name: str) -> QueueClient:
+        """Return the process-wide client of a queue, so its connection pool outlives this manager."""
         account_name = get_env_variable('STORAGE_ACCOUNT_NAME')
         storage_key = UploadQueueSettings.STORAGE_ACCOUNT_KEY
-        credential = storage_key if storage_key else DefaultAzureCredential()
-        return QueueClient(
-            account_url=f"https://{account_name}.queue.core.windows.net",
-            queue_name=UploadQueueSettings.QUEUE_NAME,
-            credential=credential
-        )
 
-    def process_queue_messages(self):
-        logging.info("Queue processor started. Waiting for messages...")
-        while True:
-            messages = self.queue_client.receive_messages(
-                max_messages=UploadQueueSettings.MAX_MESSAGES,
-                visibility_timeout=UploadQueueSettings.VISIBILITY_TIMEOUT
+        def create_client() -> QueueClient:
+            credential = storage_key if storage_key else get_default_credential()
+            return QueueClient(
+                account_url=f"https://{account_name}.queue.core.windows.net",
+                queue_name=queue_name,
+                credential=credential,
+                transport=create_azure_transport()
             )
-            for message in messages:
-                self._process_message(message)
-            time.sleep(UploadQueueSettings.SLEEP_TIME)
 
-    def _process_message(self, message):
+        return get_shared_client(("queue", account_name, storage_key, queue_name), create_client)
+
+    def process_queue_messages(self, max_messages: int = 0):
+        """Process messages until stopped, or until max_messages messages were received when it is set."""
+        logging.info("Queue processor started. Waiting for messages...")
+        self._install_signal_handlers()
+        received = 0
+        concurrency = max(1, UploadQueueSettings.MESSAGE_CONCURRENCY)
+        backoff = PollingBackoff(UploadQueueSettings.MIN_POLL_INTERVAL, UploadQueueSettings.MAX_POLL_INTERVAL)
+        renewal_stopped = threading.Event()
+        renewer = threading.Thread(target=self._renew_leases, args=(renewal_stopped,), name="lease-renewal", daemon=True)
+        renewer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="message") as executor:
+                while not self.stop_event.is_set():
+                    capacity = self._wait_for_capacity(concurrency)
+                    if not capacity:
+                        continue
+                    requested = min(capacity, UploadQueueSettings.MAX_MESSAGES)
+                    if max_messages:
+                        requested = min(requested, max_messages - received)
+                    lane, messages = self._receive_messages(requested)
+                    for message in messages:
+                        lease = MessageLease(self.lane_clients[lane], message, lane)
+                        self._record_wait(lease)
+                        with self._leases_changed:
+                            self._leases[message.id] = lease
+                        executor.submit(self._process_message, lease)
+                    received += len(messages)
+                    if max_messages and received >= max_messages:
+                        logging.info(f"Received {received} message(s), stopping so the worker can be recycled")
+                        self.stop()
+                        break
+                    delay = backoff.next_delay(len(messages), requested)
+                    if delay:
+                        self.stop_event.wait(delay)
+                logging.info(f"Stopping queue processor after {len(self._leases)} in-flight message(s) finish...")
+        finally:
+            # Leases are renewed until the executor has drained every in-flight message.
+            renewal_stopped.set()
+            renewer.join()
+        for lane, stats in self.scheduler.wait_stats().items():
+            if stats["messages"]:
+                logging.info(f"Lane {lane}: {stats['messages']} message(s), average wait {stats['average_wait']:.1f}s, max wait {stats['max_wait']:.1f}s")
+        logging.info("Queue processor stopped.")
+
+    def stop(self):
+        """Stop receiving new messages; in-flight messages are processed to completion."""
+        self.stop_event.set()
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda received, frame: self.stop())
+
+    def _receive_messages(self, requested: int):
+        """Receive from the lane chosen by the scheduler, falling through to the other lanes when it is empty.
+
+        Once every lane came back empty, each receive polls a single lane in turn until messages
+        arrive again, so an idle worker makes one receive per poll rather than one per lane.
+        """
+        if self._idle_polls:
+            lanes = [LANES[self._idle_polls % len(LANES)]]
+        else:
+            lanes = self.scheduler.order()
+        for lane in lanes:
+            try:
+                messages = list(self.lane_clients[lane].receive_messages(
+                    max_messages=requested,
+                    visibility_timeout=UploadQueueSettings.VISIBILITY_TIMEOUT
+                ))
+            except ResourceNotFoundError:
+                # A lane's queue is created when the first document is routed to it.
+                continue
+            if messages:
+                self._idle_polls = 0
+                return lane, messages
+        self._idle_polls += 1
+        return None, []
+
+    def _record_wait(self, lease: MessageLease):
+        inserted_on = getattr(lease.message, 'inserted_on', None)
+        if inserted_on is None:
+            return
+        lease.wait_seconds = max(0.0, (datetime.now(timezone.utc) - inserted_on).total_seconds())
+        self.scheduler.record_wait(lease.lane, lease.wait_seconds)
+
+    def _send_message(self, lane: str, content: Dict[str, Any]):
+        queue_client = self.lane_clients[lane]
+        if lane not in self._created_lanes:
+            with suppress(ResourceExistsError):
+                queue_client.create_queue()
+            self._created_lanes.add(lane)
+        queue_client.send_message(json.dumps(content))
+
+    def _wait_for_capacity(self, concurrency: int) -> int:
+        """Block until a worker is free and return how many messages can be started."""
+        with self._leases_changed:
+            # Wake up periodically so a stop request is noticed while all workers are busy.
+            while len(self._leases) >= concurrency and not self.stop_event.is_set():
+                self._leases_changed.wait(timeout=1)
+            if self.stop_event.is_set():
+                return 0
+            return concurrency - len(self._leases)
+
+    def _renew_leases(self, renewal_stopped: threading.Event):
+        while not renewal_stopped.wait(UploadQueueSettings.LEASE_RENEWAL_INTERVAL):
+            with self._leases_changed:
+                leases = list(self._leases.values())
+            for lease in leases:
+                try:
+                    lease.renew()
+                except Exception as e:
+                    logging.error(f"Could not renew visibility of message {lease.message.id}: {str(e)}")
+
+    def _process_message(self, lease: MessageLease):
+        message = lease.message
         try:
             if message.dequeue_count > UploadQueueSettings.MAX_DEQUEUE_COUNT:
                 logging.error(f"Message exceeded retry limit. Deleting message. Content: {message.content}")
-                self.queue_client.delete_message(message)
+                lease.delete()
                 return
 
             file_info = json.loads(message.content)
-            logging.info(f"Processing file: {file_info['filename']} (Attempt {message.dequeue_count})")
-            BlobManager.process_pdf_pages(file_info)
-            self.queue_client.delete_message(message)
+            waited = f", waited {lease.wait_seconds:.1f}s" if lease.wait_seconds is not None else ""
+            logging.info(f"Processing file: {file_info['filename']} (Attempt {message.dequeue_count}, lane {lease.lane}{waited})")
+            if file_info.get('action') == 'reenrich':
+                BlobManager.reenrich_pdf_pages(file_info)
+            else:
+                BlobManager.process_pdf_pages(file_info)
+            lease.delete()
             logging.info(f"Processed and deleted message for file: {file_info['filename']}")
         except KeyError as e:
             logging.error(f"Missing key in message content: {str(e)}")
         except Exception as e:
             logging.error(f"Error processing message: {str(e)}")
+        finally:
+            with self._leases_changed:
+                self._leases.pop(message.id, None)
+                self._leases_changed.notify_all()
 
-    def queue_file_for_processing(self, **kwargs):
-        with suppress(ResourceExistsError):
-            self.queue_client.create_queue()
-
-        index_manager = create_index_manager(kwargs['user_id'], kwargs['index_name'], kwargs['is_restricted'])
-        message_content = json.dumps({
+    def queue_file_for_processing(self, index_manager=None, **kwargs):
+        index_manager = index_manager or create_index_manager(kwargs['user_id'], kwargs['index_name'], kwargs['is_restricted'])
+        file_info = {
             **kwargs,
             "ingestion_container": index_manager.get_ingestion_container(),
             "reference_container": index_manager.get_reference_container(),
             "lz_container": index_manager.get_lz_container()
-        })
-        self.queue_client.send_message(message_content)
+        }
+        duplicate_of = self._find_processed_copy(file_info)
+        if duplicate_of:
+            # The worker copies the artifacts of the processed copy instead of running the pipeline.
+            logging.info(f"{kwargs['filename']} has the same content as {duplicate_of['reference_container']}/{duplicate_of['filename']}")
+            # Copying is cheap whatever the size of the document.
+            self._send_message("small", {**file_info, "duplicate_of": duplicate_of})
+            return
+        self.queue_for_processing(file_info)
+
+    def queue_for_processing(self, file_info: Dict[str, Any]):
+        """Queue a landed file for the full pipeline in the lane of its size, in shards when it is large."""
+        # Shards stay in the lane of the whole document so a large upload cannot crowd out medium ones.
+        lane = lane_for_pages(file_info.get('num_pages'))
+        shards = plan_shards(file_info['num_pages']) if file_info.get('num_pages') else []
+        if len(shards) <= 1:
+            self._send_message(lane, file_info)
+            return
+
+        # Large documents are fanned out into page ranges that any upload worker can pick up.
+        document_id = uuid.uuid4().hex
+        ShardTracker().register(document_id, file_info['filename'], shards)
+        for shard_index, (first_page, last_page) in enumerate(shards):
+            self._send_message(lane, {
+                **file_info,
+                "document_id": document_id,
+                "shard_index": shard_index,
+                "shard_count": len(shards),
+                "first_page": first_page,
+                "last_page": last_page
+            })
+        logging.info(f"Queued {file_info['filename']} as {len(shards)} shards (document {document_id})")
+
+    def queue_files_for_processing(self, files: List[Dict[str, Any]], user_id: str, index_name: str, is_restricted: bool, is_multimodal: bool) -> Dict[str, str]:
+        """Queue many landed files of one index concurrently and return the error of every file that could not be queued."""
+        index_manager = create_index_manager(user_id, index_name, is_restricted)
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, UploadQueueSettings.QUEUE_SEND_CONCURRENCY), thread_name_prefix="enqueue") as executor:
+            futures = {
+                executor.submit(
+                    self.queue_file_for_processing, index_manager=index_manager, user_id=user_id, index_name=index_name,
+                    is_restricted=is_restricted, is_multimodal=is_multimodal, **file
+                ): file['filename']
+                for file in files
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Could not queue {futures[future]}: {str(e)}")
+                    errors[futures[future]] = str(e)
+        return errors
+
+    def queue_reenrichment(self, user_id: str, index_name: str, is_restricted: bool, is_multimodal: bool) -> List[str]:
+        """Queue the markdown of every processed document of an index to be rebuilt from its cached layouts."""
+        index_manager = create_index_manager(user_id, index_name, is_restricted)
+        reference_container = index_manager.get_reference_container()
+        files = list_files_in_container(reference_container, initialize_blob_service())
+        for file in files:
+            self._send_message(lane_for_pages(file['total_pages']), {
+                "action": "reenrich",
+                "filename": file['filename'],
+                "num_pages": file['total_pages'],
+                "is_multimodal": is_multimodal,
+                "reference_container": reference_container,
+                "ingestion_container": index_manager.get_ingestion_container()
+            })
+        logging.info(f"Queued re-enrichment of {len(files)} documents in {reference_container}")
+        return [file['filename'] for file in files]
+
+    def _registry(self) -> FingerprintRegistry:
+        """Return the fingerprint registry of this manager, so its table is only created once."""
+        with self._registry_lock:
+            if self._fingerprint_registry is None:
+                self._fingerprint_registry = FingerprintRegistry()
+            return self._fingerprint_registry
+
+    def _find_processed_copy(self, file_info: Dict[str, Any]):
+        content_sha256 = file_info.get('content_sha256')
+        if not (FingerprintRegistrySettings.DEDUPLICATION_ENABLED and content_sha256):
+            return None
+        try:
+            return self._registry().find(
+                content_sha256, file_info.get('is_multimodal', False),
+                exclude_reference_container=file_info['reference_container'], exclude_filename=file_info['filename']
+            )
+        except Exception as e:
+            logging.warning(f"Could not look up processed copies of {file_info['filename']}: {str(e)}")
+            return None
 
 class BlobManager:
     @staticmethod
     def process_pdf_pages(file_info: Dict[str, Any]):
         blob_service = initialize_blob_service()
         filename = file_info['filename']
-        num_pages = file_info['num_pages']
+        num_pages = file_info.get('num_pages')
         is_multimodal = file_info.get('is_multimodal', False)
         blob_url = file_info['blob_url']
         reference_container = file_info['reference_container']
         ingestion_container = file_info['ingestion_container']
         lz_container = file_info['lz_container']
+        document_id = file_info.get('document_id')
+        duplicate_of = file_info.get('duplicate_of')
 
-        with tempfile.TemporaryDirectory() as temp_dir:
+        if duplicate_of:
+            BlobManager._forget_replaced_fingerprint(reference_container, filename, duplicate_of['PartitionKey'])
+            try:
+                BlobManager._copy_processed_document(duplicate_of, filename, blob_service, reference_container, ingestion_container)
+            except Exception as e:
+                logging.warning(f"Could not copy the artifacts of {duplicate_of['filename']}, queueing {filename} for processing instead: {str(e)}")
+                with suppress(Exception):
+                    FingerprintRegistry().remove(duplicate_of)
+                # Copies are queued in the small lane; the pipeline run needs the lane and shards of the document's size.
+                QueueManager().queue_for_processing({key: value for key, value in file_info.items() if key != 'duplicate_of'})
+                return
+            else:
+                with suppress(ResourceNotFoundError):
+                    blob_service.get_blob_client(container=lz_container, blob=filename).delete_blob()
+                BlobManager._register_fingerprint(duplicate_of['PartitionKey'], filename, reference_container, ingestion_container, duplicate_of['num_pages'], is_multimodal)
+                logging.info(f"Copied {duplicate_of['num_pages']} processed pages of {duplicate_of['filename']} for file: {filename}")
+                return
+
+        page_count = file_info.get('last_page', num_pages) - file_info.get('first_page', 0) if num_pages else None
+        with tempfile.TemporaryDirectory() as temp_dir, stage("document", index_name=file_info.get('index_name'), page_count=page_count):
             pdf_path = os.path.join(temp_dir, filename)
-            download_blob_to_file(blob_url, pdf_path, blob_service)
+            with stage("download"):
+                upload_etag = download_blob_to_file(blob_url, pdf_path, blob_service)
+            if not num_pages:
+                with open(pdf_path, 'rb') as pdf_file:
+                    num_pages = get_pdf_page_count(pdf_file)
+            first_page = file_info.get('first_page', 0)
+            last_page = file_info.get('last_page', num_pages)
+            pdf_sha256 = file_sha256(pdf_path)
+            # Copies of other content must not be made from artifacts that are about to be overwritten.
+            BlobManager._forget_replaced_fingerprint(reference_container, filename, pdf_sha256)
 
-            for page_number in range(num_pages):
-                BlobManager._process_pdf_page(
-                    pdf_path, page_number, temp_dir, filename,
-                    blob_service, reference_container, ingestion_container, is_multimodal
-                )
+            # Pages completed by an earlier, failed attempt at this upload are not processed again.
+            manifest = PageManifest(document_key(reference_container, filename, pdf_sha256, is_multimodal, upload_etag))
+            completed_pages = manifest.completed_pages()
+            missing_ranges = missing_page_ranges(first_page, last_page, completed_pages)
+            if any(first_page <= page_number < last_page for page_number in completed_pages):
+                logging.info(f"Resuming {filename}: {sum(end - start for start, end in missing_ranges)} of {last_page - first_page} pages left")
 
+            failed_pages = {}
+            for range_start, range_end in missing_ranges:
+                failed_pages.update(BlobManager._process_pages_concurrently(
+                    pdf_path, range_start, range_end, temp_dir, filename,
+                    blob_service, reference_container, ingestion_container, is_multimodal, manifest
+                ))
+            if failed_pages:
+                raise PageProcessingError(filename, failed_pages)
+            manifest.forget(range(first_page, last_page))
+
+        if document_id:
+            logging.info(f"Completed pages {first_page + 1}-{last_page} of file: {filename} (shard {file_info['shard_index'] + 1}/{file_info['shard_count']})")
+            tracker = ShardTracker()
+            if not tracker.complete(document_id, file_info['shard_index']):
+                return
+            tracker.forget(document_id)
+
+        # Two shards finishing at the same time may both see the document as complete.
+        with suppress(ResourceNotFoundError):
             blob_service.get_blob_client(container=lz_container, blob=filename).delete_blob()
+        BlobManager._register_fingerprint(pdf_sha256, filename, reference_container, ingestion_container, num_pages, is_multimodal)
         logging.info(f"Completed processing all pages for file: {filename}")
+        logging.info(f"Layout cache stats: {get_layout_cache().stats()}")
+        if is_multimodal:
+            logging.info(f"Caption cache stats: {get_enrichment_cache('captions').stats()}")
+            logging.info(f"Table enrichment stats: {get_table_enrichment_stats()}")
+
+    @staticmethod
+    def reenrich_pdf_pages(file_info: Dict[str, Any]):
+        """Rebuild the markdown of a processed document from its cached page layouts without calling Document Intelligence."""
+        blob_service = initialize_blob_service()
+        filename = file_info['filename']
+        failed_pages = {}
+        missing_layouts = []
+
+        with ThreadPoolExecutor(max_workers=max(1, UploadQueueSettings.PAGE_CONCURRENCY), thread_name_prefix="reenrich") as executor:
+            futures = {
+                executor.submit(
+                    BlobManager._reenrich_pdf_page, page_number, filename, blob_service,
+                    file_info['reference_container'], file_info['ingestion_container'], file_info.get('is_multimodal', False)
+                ): page_number
+                for page_number in range(file_info['num_pages'])
+            }
+            for future in as_completed(futures):
+                page_number = futures[future]
+                try:
+                    future.result()
+                except LayoutNotCachedError:
+                    missing_layouts.append(page_number)
+                except Exception as e:
+                    logging.error(f"Error re-enriching page {page_number + 1} of {filename}: {str(e)}")
+                    failed_pages[page_number] = str(e)
+
+        if missing_layouts:
+            # Retrying cannot help here; such pages only get a layout when the document is uploaded again.
+            logging.warning(f"{len(missing_layouts)} page(s) of {filename} have no cached layout and were left unchanged")
+        if failed_pages:
+            raise PageProcessingError(filename, failed_pages)
+        logging.info(f"Re-enriched {file_info['num_pages'] - len(missing_layouts)} pages of file: {filename}")
+
+    @staticmethod
+    def _reenrich_pdf_page(page_number, filename, blob_service, reference_container, ingestion_container, is_multimodal):
+        page_suffix = f"{filename}___Page{page_number + 1}"
+        pdf_page = BlobManager._download_artifact(blob_service, reference_container, f"{page_suffix}.pdf")
+        png_page = BlobManager._download_artifact(blob_service, reference_container, f"{page_suffix}.png") if is_multimodal else None
+        try:
+            markdown = convert_pdf_page_to_markdown(pdf_page, png_page, is_multimodal, allow_analysis=False)
+            upload_stream_to_blob(ingestion_container, f"{page_suffix}.md", BytesIO(markdown.encode('utf-8')), blob_service)
+        finally:
+            for artifact in (pdf_page, png_page):
+                if artifact is not None:
+                    artifact.close()
+
+    @staticmethod
+    def _download_artifact(blob_service, container_name, blob_name):
+        buffer = new_page_buffer()
+        blob_service.get_blob_client(container=container_name, blob=blob_name).download_blob().readinto(buffer)
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def _copy_processed_document(source: Dict[str, Any], filename, blob_service, reference_container, ingestion_container):
+        """Server-side copy the page artifacts of an identical, already processed document under a new filename."""
+        copies = []
+        for page_number in range(source['num_pages']):
+            source_suffix = f"{source['filename']}___Page{page_number + 1}"
+            target_suffix = f"{filename}___Page{page_number + 1}"
+            copies.append((source['reference_container'], f"{source_suffix}.pdf", reference_container, f"{target_suffix}.pdf"))
+            copies.append((source['reference_container'], f"{source_suffix}.png", reference_container, f"{target_suffix}.png"))
+            copies.append((source['ingestion_container'], f"{source_suffix}.md", ingestion_container, f"{target_suffix}.md"))
+        # Documents ingested before image variants existed do not have them.
+        optional_copies = [
+            (source['reference_container'], page_image_blob_name(source['filename'], page_number + 1, variant),
+             reference_container, page_image_blob_name(filename, page_number + 1, variant))
+            for page_number in range(source['num_pages'])
+            for variant in PAGE_IMAGE_VARIANTS
+        ]
+
+        with ThreadPoolExecutor(max_workers=max(1, UploadQueueSettings.PAGE_CONCURRENCY), thread_name_prefix="copy") as executor:
+            futures = [executor.submit(copy_blob, *copy, blob_service) for copy in copies]
+            futures += [executor.submit(BlobManager._copy_optional_blob, *copy, blob_service) for copy in optional_copies]
+            for future in as_completed(futures):
+                future.result()
+
+    @staticmethod
+    def _copy_optional_blob(source_container, source_blob, target_container, target_blob, blob_service):
+        with suppress(ResourceNotFoundError):
+            copy_blob(source_container, source_blob, target_container, target_blob, blob_service)
+
+    @staticmethod
+    def _register_fingerprint(content_sha256, filename, reference_container, ingestion_container, num_pages, is_multimodal):
+        if not FingerprintRegistrySettings.DEDUPLICATION_ENABLED:
+            return
+        try:
+            FingerprintRegistry().register(content_sha256, filename, reference_container, ingestion_container, num_pages, is_multimodal)
+        except Exception as e:
+            logging.warning(f"Could not register the fingerprint of {filename}: {str(e)}")
+
+    @staticmethod
+    def _forget_replaced_fingerprint(reference_container, filename, content_sha256):
+        if not FingerprintRegistrySettings.DEDUPLICATION_ENABLED:
+            return
+        try:
+            FingerprintRegistry().forget_replaced(reference_container, filename, content_sha256)
+        except Exception as e:
+            logging.warning(f"Could not forget the previous fingerprint of {filename}: {str(e)}")
 
     @staticmethod
-    def _process_pdf_page(pdf_path, page_number, temp_dir, filename, blob_service, reference_container, ingestion_container, is_multimodal):
-        output_pdf = os.path.join(temp_dir, f"{filename}___Page{page_number + 1}.pdf")
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            pdf_writer = PyPDF2.PdfWriter()
-            pdf_writer.add_page(pdf_reader.pages[page_number])
-            with open(output_pdf, 'wb') as output_file:
-                pdf_writer.write(output_file)
-
-        png_path = convert_pdf_page_to_png(output_pdf, page_number, temp_dir, filename)
-        md_path = convert_pdf_page_to_md(output_pdf, page_number, temp_dir, filename, is_multimodal)
-        BlobManager._upload_pdf_page_files(blob_service, reference_container, ingestion_container, output_pdf, png_path, md_path, filename, page_number)
+    def _process_pages_concurrently(pdf_path, first_page, last_page, temp_dir, filename, blob_service, reference_container, ingestion_container, is_multimodal, manifest=None) -> Dict[int, str]:
+        """Process pages in parallel and return the error message of every page that failed."""
+        concurrency = max(1, UploadQueueSettings.PAGE_CONCURRENCY)
+        # Bound the number of prepared-but-unprocessed pages so splitting and rendering do not run ahead of the workers.
+        pending_slots = threading.BoundedSemaphore(concurrency * 2)
+        futures = {}
+        failed_pages = {}
+
+        in_memory = not UploadQueueSettings.PAGE_ARTIFACTS_ON_DISK
+        pages = zip(
+            split_pdf_pages(pdf_path, temp_dir, filename, first_page, last_page, in_memory=in_memory),
+            render_pdf_pages_to_png(pdf_path, temp_dir, filename, first_page, last_page, in_memory=in_memory)
+        )
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="page") as executor, \
+                ThreadPoolExecutor(max_workers=max(1, UploadQueueSettings.DOCUMENT_ANALYSIS_CONCURRENCY), thread_name_prefix="analysis") as analysis_executor:
+            layout_batches = BlobManager._submit_layout_analysis(analysis_executor, pdf_path, first_page, last_page)
+            for (page_number, output_pdf), (_, png_path, image_variants) in pages:
+                layout_batch = layout_batches[(page_number - first_page) // UploadQueueSettings.DOCUMENT_ANALYSIS_BATCH_PAGES] if layout_batches else None
+                pending_slots.acquire()
+                future = executor.submit(
+                    bind_context(BlobManager._process_pdf_page),
+                    output_pdf, png_path, page_number, filename,
+                    blob_service, reference_container, ingestion_container, is_multimodal, layout_batch, manifest, image_variants
+                )
+                future.add_done_callback(lambda _: pending_slots.release())
+                futures[future] = page_number
+
+            for future in as_completed(futures):
+                page_number = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error processing page {page_number + 1} of {filename}: {str(e)}")
+                    failed_pages[page_number] = str(e)
+
+        return failed_pages
 
     @staticmethod
-    def _upload_pdf_page_files(blob_service, reference_container, ingestion_container, output_pdf, png_path, md_path, filename, page_number):
+    def _submit_layout_analysis(analysis_executor, pdf_path, first_page, last_page) -> List[Future]:
+        """In document mode, start one Document Intelligence analysis per batch of pages."""
+        if UploadQueueSettings.DOCUMENT_ANALYSIS_MODE != 'document':
+            return []
+        batch_pages = UploadQueueSettings.DOCUMENT_ANALYSIS_BATCH_PAGES
+        return [
+            analysis_executor.submit(bind_context(analyze_pdf_pages), pdf_path, batch_start, min(batch_start + batch_pages, last_page))
+            for batch_start in range(first_page, last_page, batch_pages)
+        ]
+
+    @staticmethod
+    def _process_pdf_page(output_pdf, png_path, page_number, filename, blob_service, reference_container, ingestion_container, is_multimodal, layout_batch=None, manifest=None, image_variants=None):
+        """Convert one page to Markdown and upload its artifacts; output_pdf and png_path are paths or page buffers.
+
+        image_variants maps PAGE_IMAGE_VARIANTS names to the encoded images made alongside the PNG.
+        """
+        try:
+            layout = layout_batch.result()[page_number] if layout_batch else None
+            markdown = convert_pdf_page_to_markdown(output_pdf, png_path, is_multimodal, layout).encode('utf-8')
+            artifact_hashes = {
+                "pdf_sha256": artifact_sha256(output_pdf),
+                "png_sha256": artifact_sha256(png_path),
+                "md_sha256": artifact_sha256(BytesIO(markdown))
+            } if manifest else None
+            BlobManager._upload_pdf_page_files(blob_service, reference_container, ingestion_container, output_pdf, png_path, markdown, filename, page_number, image_variants or {})
+        finally:
+            for artifact in (output_pdf, png_path):
+                if not isinstance(artifact, str):
+                    artifact.close()
+
+        if manifest:
+            try:
+                manifest.record_page(page_number, artifact_hashes)
+            except Exception as e:
+                # The page is uploaded; without a checkpoint it is only redone if the document is retried.
+                logging.warning(f"Could not checkpoint page {page_number + 1} of {filename}: {str(e)}")
+
+    @staticmethod
+    def _upload_pdf_page_files(blob_service, reference_container, ingestion_container, output_pdf, png_path, markdown: bytes, filename, page_number, image_variants: Dict[str, bytes]):
+        """Upload the artifacts of a page, including its smaller image variants, concurrently."""
         page_suffix = f"{filename}___Page{page_number + 1}"
-        upload_file_to_blob(reference_container, f"{page_suffix}.pdf", output_pdf, blob_service)
-        upload_file_to_blob(reference_container, f"{page_suffix}.png", png_path, blob_service)
-        upload_file_to_blob(ingestion_container, f"{page_suffix}.md", md_path, blob_service)
+        uploads = [
+            (reference_container, f"{page_suffix}.pdf", output_pdf),
+            (reference_container, f"{page_suffix}.png", png_path),
+            (ingestion_container, f"{page_suffix}.md", BytesIO(markdown))
+        ]
+        for variant, image in image_variants.items():
+            uploads.append((reference_container, page_image_blob_name(filename, page_number + 1, variant), BytesIO(image)))
+        with stage("blob_upload", page_count=1, artifacts=len(uploads)):
+            futures = [_get_upload_pool().submit(BlobManager._upload_artifact, *upload, blob_service) for upload in uploads]
+            # Wait for every upload before raising, the page buffers are closed afterwards.
+            wait(futures)
+            for future in futures:
+                future.result()
 
-def process_queue_messages():
-    queue_manager = QueueManager()
-    queue_manager.process_queue_messages()
+    @staticmethod
+    def _upload_artifact(container_name, blob_name, artifact, blob_service):
+        if isinstance(artifact, str):
+            return upload_file_to_blob(container_name, blob_name, artifact, blob_service)
+        artifact.seek(0)
+        return upload_stream_to_blob(container_name, blob_name, artifact, blob_service)
 
-def queue_file_for_processing(filename: str, user_id: str, index_name: str, is_restricted: bool, num_pages: int, blob_url: str, is_multimodal: bool):
+def process_queue_messages(max_messages: int = 0):
     queue_manager = QueueManager()
-    queue_manager.queue_file_for_processing(
+    queue_manager.process_queue_messages(max_messages)
+
+def get_enqueue_manager() -> QueueManager:
+    """Return the QueueManager shared by the web app's requests for queueing work."""
+    return get_shared_client("upload_queue_manager", QueueManager)
+
+def queue_files_for_processing(files: List[Dict[str, Any]], user_id: str, index_name: str, is_restricted: bool, is_multimodal: bool) -> Dict[str, str]:
+    return get_enqueue_manager().queue_files_for_processing(files, user_id, index_name, is_restricted, is_multimodal)
+
+def queue_reenrichment(user_id: str, index_name: str, is_restricted: bool, is_multimodal: bool) -> List[str]:
+    return get_enqueue_manager().queue_reenrichment(user_id, index_name, is_restricted, is_multimodal)
+
+def queue_file_for_processing(filename: str, user_id: str, index_name: str, is_restricted: bool, num_pages: int, blob_url: str, is_multimodal: bool, content_sha256: str = None):
+    get_enqueue_manager().queue_file_for_processing(
         filename=filename,
         user_id=user_id,
         index_name=index_name,
         is_restricted=is_restricted,
         num_pages=num_pages,
         blob_url=blob_url,
-        is_multimodal=is_multimodal
+        is_multimodal=is_multimodal,
+        content_sha256=content_sha256
     )
\ No newline at end of file
@@ -0,0 +1,244 @@
+import os
+import math
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# Share of the container's memory the upload workers may use; the web app and indexing processor need the rest.
+WORKER_MEMORY_SHARE = 0.75
+# Memory limit per worker where the container's memory is unknown.
+DEFAULT_WORKER_MAX_RSS_MB = 3072
+# cgroup v1 reports "no limit" as a number close to the largest 64-bit value.
+UNLIMITED_MEMORY_BYTES = 1 << 60
+
+def _read_cgroup_file(*paths: str) -> Optional[str]:
+    """Return the content of the first readable cgroup v2 or v1 file, or None outside a cgroup."""
+    for path in paths:
+        try:
+            with open(os.path.join(CGROUP_ROOT, path)) as cgroup_file:
+                return cgroup_file.read().strip()
+        except OSError:
+            continue
+    return None
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """Return the container's CPU quota in CPUs, or None when it is not limited."""
+    cpu_max = _read_cgroup_file("cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota, period = _read_cgroup_file("cpu/cpu.cfs_quota_us"), _read_cgroup_file("cpu/cpu.cfs_period_us")
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        # "max" in cgroup v2.
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+def available_cpus() -> int:
+    """Return the CPUs this process may use: its CPU affinity, bounded by the container's CPU quota.
+
+    os.cpu_count and nproc report the host's CPUs, which are far more than a container is given.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+def container_memory_bytes() -> Optional[int]:
+    """Return the container's memory limit, or None when it is not limited."""
+    limit = _read_cgroup_file("memory.max", "memory/memory.limit_in_bytes")
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return None
+    return limit if 0 < limit < UNLIMITED_MEMORY_BYTES else None
+
+def default_max_rss_mb(workers: int) -> int:
+    """Split WORKER_MEMORY_SHARE of the container's memory between the workers."""
+    memory = container_memory_bytes()
+    if memory is None:
+        return DEFAULT_WORKER_MAX_RSS_MB
+    return max(1, int(memory * WORKER_MEMORY_SHARE) // max(1, workers) // (1024 * 1024))
+
+class UploadSupervisorSettings:
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '1'))
+    # A worker is recycled after this many messages or above this resident memory; 0 disables the limit.
+    UPLOAD_WORKER_MAX_MESSAGES = int(os.getenv('UPLOAD_WORKER_MAX_MESSAGES', '0'))
+    UPLOAD_WORKER_MAX_RSS_MB = int(os.getenv('UPLOAD_WORKER_MAX_RSS_MB', str(default_max_rss_mb(UPLOAD_WORKERS))))
+    UPLOAD_WORKER_CHECK_INTERVAL = float(os.getenv('UPLOAD_WORKER_CHECK_INTERVAL', '5'))
+    UPLOAD_WORKER_MAX_RESTART_DELAY = float(os.getenv('UPLOAD_WORKER_MAX_RESTART_DELAY', '60'))
+    # Workers drain their in-flight messages on SIGTERM; this bounds how long shutdown waits for them.
+    UPLOAD_WORKER_SHUTDOWN_TIMEOUT = float(os.getenv('UPLOAD_WORKER_SHUTDOWN_TIMEOUT', '600'))
+
+def process_rss_bytes(pid: int) -> Optional[int]:
+    """Return the resident memory of a process, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def child_pids(pid: int) -> List[int]:
+    """Return the pids of all descendants of a process, or none where /proc is not available."""
+    parents = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces, the fields after it are fixed.
+                parents[int(entry)] = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    descendants = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        children = [child for child, child_parent in parents.items() if child_parent == parent]
+        descendants += children
+        pending += children
+    return descendants
+
+def process_tree_rss_bytes(pid: int) -> Optional[int]:
+    """Return the resident memory of a process and its descendants, such as its PNG encoder pool."""
+    rss = process_rss_bytes(pid)
+    if rss is None:
+        return None
+    return rss + sum(process_rss_bytes(child) or 0 for child in child_pids(pid))
+
+def worker_environment(workers: int) -> Dict[str, str]:
+    """Split the CPU-sized render and encode defaults between the worker processes.
+
+    Without this every worker would start one poppler thread and one encoder process per host
+    core. Values set explicitly in the environment are left alone.
+    """
+    share = str(max(1, available_cpus() // max(1, workers)))
+    return {name: share for name in ("RENDER_THREAD_COUNT", "PNG_ENCODE_WORKERS") if not os.getenv(name)}
+
+def run_upload_worker(max_messages: int = 0, environment: Optional[Dict[str, str]] = None):
+    """Entry point of a worker process: one QueueManager loop on the ingestion queue."""
+    # Settings are read when the pipeline modules are imported, so the environment is updated first.
+    os.environ.update(environment or {})
+    from .upload_queue import process_queue_messages
+    from ..integration.telemetry import configure_telemetry
+    # Exporters run background threads, so every worker process installs its own.
+    configure_telemetry("upload-worker")
+    process_queue_messages(max_messages)
+
+class UploadWorkerSupervisor:
+    """Runs a fixed number of upload worker processes and replaces the ones that exit.
+
+    Workers that crash are restarted with an increasing delay, workers that reach their message
+    or memory limit are stopped gracefully and replaced, and SIGTERM drains every worker. The
+    memory limit covers a worker together with its PNG encoder processes.
+    """
+    def __init__(self, workers: int = None, max_messages: int = None, max_rss_mb: int = None, context=None):
+        self.workers = max(1, workers or UploadSupervisorSettings.UPLOAD_WORKERS)
+        self.max_messages = UploadSupervisorSettings.UPLOAD_WORKER_MAX_MESSAGES if max_messages is None else max_messages
+        max_rss_mb = UploadSupervisorSettings.UPLOAD_WORKER_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        # Workers are spawned rather than forked so they never inherit locks or clients from this process.
+        self.context = context or multiprocessing.get_context("spawn")
+        self.stop_event = threading.Event()
+        self._processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        self._recycling = set()
+        self._restart_delays: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._started_at: Dict[int, float] = {}
+
+    def run(self):
+        logging.info(f"Starting {self.workers} upload worker process(es)")
+        self._install_signal_handlers()
+        try:
+            while not self.stop_event.is_set():
+                for slot in range(self.workers):
+                    self._check_worker(slot)
+                self.stop_event.wait(UploadSupervisorSettings.UPLOAD_WORKER_CHECK_INTERVAL)
+        finally:
+            self._shutdown()
+        logging.info("Upload worker supervisor stopped.")
+
+    def stop(self):
+        """Stop every worker after its in-flight messages are processed."""
+        self.stop_event.set()
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda received, frame: self.stop())
+
+    def _check_worker(self, slot: int):
+        process = self._processes.get(slot)
+        if process is None:
+            self._start_worker(slot)
+        elif not process.is_alive():
+            self._handle_exit(slot, process)
+        elif self.max_rss_bytes and process.pid not in self._recycling:
+            rss = process_tree_rss_bytes(process.pid)
+            if rss is not None and rss > self.max_rss_bytes:
+                logging.info(f"Upload worker {process.pid} uses {rss // (1024 * 1024)} MB, recycling it")
+                self._recycling.add(process.pid)
+                process.terminate()
+
+    def _handle_exit(self, slot: int, process):
+        recycled = process.exitcode == 0 or process.pid in self._recycling
+        self._recycling.discard(process.pid)
+        del self._processes[slot]
+        if recycled:
+            logging.info(f"Upload worker {process.pid} was recycled")
+            self._restart_delays.pop(slot, None)
+            self._start_worker(slot)
+            return
+        # Back off so a worker that crashes on startup does not restart in a tight loop.
+        max_delay = UploadSupervisorSettings.UPLOAD_WORKER_MAX_RESTART_DELAY
+        if time.monotonic() - self._started_at.get(slot, 0) > max_delay:
+            self._restart_delays.pop(slot, None)
+        delay = min(max_delay, self._restart_delays.get(slot, 0.5) * 2)
+        self._restart_delays[slot] = delay
+        self._restart_at[slot] = time.monotonic() + delay
+        logging.error(f"Upload worker {process.pid} exited with code {process.exitcode}, restarting in {delay:.0f}s")
+
+    def _start_worker(self, slot: int):
+        if time.monotonic() < self._restart_at.get(slot, 0):
+            return
+        process = self.context.Process(
+            target=run_upload_worker, args=(self.max_messages, worker_environment(self.workers)), name=f"upload-worker-{slot}", daemon=False
+        )
+        process.start()
+        self._processes[slot] = process
+        self._started_at[slot] = time.monotonic()
+        logging.info(f"Started upload worker {process.pid} in slot {slot}")
+
+    def _shutdown(self):
+        processes = list(self._processes.values())
+        logging.info(f"Stopping {len(processes)} upload worker process(es)...")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + UploadSupervisorSettings.UPLOAD_WORKER_SHUTDOWN_TIMEOUT
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.error(f"Upload worker {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.join()
+        self._processes.clear()
+
+def run_upload_workers():
+    UploadWorkerSupervisor().run()
@@ -1,35 +1,53 @@
 import os
+import threading
 from typing import Dict, Any, List, Generator
 import requests
 from flask import Response
-from openai import AzureOpenAI
+import httpx
+from openai import AzureOpenAI, DefaultHttpxClient
 import numpy as np
 import io
 from werkzeug.datastructures import FileStorage
 
+from .client_registry import CLIENT_POOL_SIZE, get_shared_client
+
 from dotenv import load_dotenv
 load_dotenv()
 
+IMAGE_ANALYSIS_ERROR_PREFIX = "Error analyzing image:"
+# Chat completions in flight across every thread of the process; the enrichment pools nest, so each one
+# bounding itself is not enough to keep the completions within the client's connection pool.
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', str(CLIENT_POOL_SIZE)))
+_completion_slots = threading.BoundedSemaphore(max(1, LLM_CONCURRENCY))
+
 def get_azure_openai_client(api_key: str = None, api_version: str = None, azure_endpoint: str = None) -> AzureOpenAI:
-    """Create and return an AzureOpenAI client."""
-    return AzureOpenAI(
-        api_key=api_key or os.environ["AOAI_API_KEY"],
-        api_version=api_version or "2024-02-15-preview",
-        azure_endpoint=azure_endpoint or os.environ["OPENAI_ENDPOINT"]
+    """Return the shared AzureOpenAI client for the given settings, creating it on first use."""
+    api_key = api_key or os.environ["AOAI_API_KEY"]
+    api_version = api_version or "2024-02-15-preview"
+    azure_endpoint = azure_endpoint or os.environ["OPENAI_ENDPOINT"]
+    return get_shared_client(
+        ("azure_openai", api_key, api_version, azure_endpoint),
+        lambda: AzureOpenAI(
+            api_key=api_key,
+            api_version=api_version,
+            azure_endpoint=azure_endpoint,
+            http_client=DefaultHttpxClient(limits=httpx.Limits(max_connections=CLIENT_POOL_SIZE, max_keepalive_connections=CLIENT_POOL_SIZE))
+        )
     )
 
 def analyze_image(client: AzureOpenAI, b64_img: str, model: str = None) -> str:
     """Analyze an image using Azure OpenAI."""
     prompt = _get_image_analysis_prompt()
     try:
-        response = client.chat.completions.create(
-            model=model or os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"],
-            messages=_create_image_analysis_messages(prompt, b64_img),
-            max_tokens=1000
-        )
+        with _completion_slots:
+            response = client.chat.completions.create(
+                model=model or os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"],
+                messages=_create_image_analysis_messages(prompt, b64_img),
+                max_tokens=1000
+            )
         return response.choices[0].message.content.strip()
     except Exception as e:
-        return f"Error analyzing image: {str(e)}"
+        return f"{IMAGE_ANALYSIS_ERROR_PREFIX} {str(e)}"
 
 def create_payload(messages: List[Dict[str, Any]], context: Dict[str, Any] = None, 
                    session_state: Dict[str, Any] = None, data_sources: List[Dict[str, Any]] = None, 
@@ -145,12 +163,13 @@ def text_to_speech(client: AzureOpenAI, input_text: str, config: Dict[str, str])
 def generate_completion(client: AzureOpenAI, messages: List[Dict[str, Any]], model: str, 
                         temperature: float = 0.7, max_tokens: int = 150) -> str:
     """Generate a completion using the specified model and parameters."""
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens
-    )
+    with _completion_slots:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
     return response.choices[0].message.content
 
 def _get_image_analysis_prompt() -> str:
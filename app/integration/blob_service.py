@@ -1,18 +1,30 @@
 import os
-from typing import List, Tuple
-from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobServiceClient, BlobClient
+import time
+from typing import BinaryIO, List, Optional, Tuple
+from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 from .index_manager import IndexManager, create_index_manager
+from .client_registry import get_shared_client, get_default_credential, create_azure_transport
 from io import BytesIO
 import logging
 
+BLOB_TRANSFER_CONCURRENCY = int(os.getenv('BLOB_TRANSFER_CONCURRENCY', '4'))
+BLOB_COPY_POLL_INTERVAL = float(os.getenv('BLOB_COPY_POLL_INTERVAL', '0.5'))
+
 def initialize_blob_service() -> BlobServiceClient:
-    """Initialize and return a BlobServiceClient."""
+    """Return the shared BlobServiceClient for the configured storage account."""
     account_name = os.getenv('STORAGE_ACCOUNT_NAME')
     storage_key = os.getenv('STORAGE_ACCOUNT_KEY')
-    credential = storage_key if storage_key else DefaultAzureCredential()
-    return BlobServiceClient(account_url=f"https://{account_name}.blob.core.windows.net", credential=credential)
+
+    def create_client() -> BlobServiceClient:
+        credential = storage_key if storage_key else get_default_credential()
+        return BlobServiceClient(
+            account_url=f"https://{account_name}.blob.core.windows.net",
+            credential=credential,
+            transport=create_azure_transport()
+        )
+
+    return get_shared_client(("blob_service", account_name, storage_key), create_client)
 
 def create_container(blob_service_client: BlobServiceClient, container_name: str) -> None:
     """Create a container if it doesn't exist."""
@@ -51,15 +63,30 @@ def upload_file_to_blob(container_name: str, blob_name: str, local_file_path: st
         blob_client.upload_blob(data, overwrite=True)
     return blob_client.url
 
-def download_blob_to_file(blob_url: str, local_file_path: str, blob_service_client: BlobServiceClient = None) -> None:
-    """Download a blob to a local file."""
+def copy_blob(source_container: str, source_blob: str, target_container: str, target_blob: str, blob_service_client: BlobServiceClient = None) -> str:
+    """Copy a blob server-side within the storage account, wait for the copy to finish and return the target URL."""
+    if blob_service_client is None:
+        blob_service_client = initialize_blob_service()
+    source_url = blob_service_client.get_blob_client(container=source_container, blob=source_blob).url
+    target_client = blob_service_client.get_blob_client(container=target_container, blob=target_blob)
+    status = target_client.start_copy_from_url(source_url)['copy_status']
+    while status == 'pending':
+        time.sleep(BLOB_COPY_POLL_INTERVAL)
+        status = target_client.get_blob_properties().copy.status
+    if status != 'success':
+        raise RuntimeError(f"Copy of {source_container}/{source_blob} to {target_container}/{target_blob} ended with status {status}")
+    return target_client.url
+
+def download_blob_to_file(blob_url: str, local_file_path: str, blob_service_client: BlobServiceClient = None) -> str:
+    """Download a blob to a local file and return the ETag of the downloaded version."""
     if blob_service_client is None:
         blob_service_client = initialize_blob_service()
     
     blob_client = BlobClient.from_blob_url(blob_url, credential=blob_service_client.credential)
     with open(local_file_path, "wb") as file:
-        blob_data = blob_client.download_blob()
-        file.write(blob_data.readall())
+        downloader = blob_client.download_blob(max_concurrency=BLOB_TRANSFER_CONCURRENCY)
+        downloader.readinto(file)
+    return downloader.properties.etag
 
 def list_files_in_container(container_name: str, blob_service_client: BlobServiceClient = None) -> List[dict]:
     """List all files in the specified container and return their total pages."""
@@ -131,8 +158,16 @@ def get_blob_url(container_name: str, blob_name: str, blob_service_client: BlobS
     blob_client = container_client.get_blob_client(blob_name)
     return blob_client.url
 
-def upload_file_to_lz(file_data: BytesIO, filename: str, user_id: str, index_name: str, is_restricted: bool, blob_service_client: BlobServiceClient = None) -> str:
-    """Upload a file to the landing zone container and return its blob URL."""
+def upload_file_to_lz(file_data: BinaryIO, filename: str, user_id: str, index_name: str, is_restricted: bool, blob_service_client: BlobServiceClient = None, length: Optional[int] = None) -> str:
+    """Upload a file to the landing zone container and return its blob URL.
+
+    Seekable streams of known length are uploaded as blocks staged in parallel, without being read into memory.
+    """
+    container_client = get_lz_container_client(user_id, index_name, is_restricted, blob_service_client)
+    return upload_stream_to_container(container_client, filename, file_data, length)
+
+def get_lz_container_client(user_id: str, index_name: str, is_restricted: bool, blob_service_client: BlobServiceClient = None) -> ContainerClient:
+    """Return the landing zone container of an index, creating it if it does not exist yet."""
     if blob_service_client is None:
         blob_service_client = initialize_blob_service()
     
@@ -144,10 +179,13 @@ def upload_file_to_lz(file_data: BytesIO, filename: str, user_id: str, index_nam
         container_client.create_container()
     except ResourceExistsError:
         pass 
+    return container_client
 
-    blob_client = container_client.get_blob_client(blob=filename)
+def upload_stream_to_container(container_client: ContainerClient, blob_name: str, file_data: BinaryIO, length: Optional[int] = None) -> str:
+    """Upload a stream to an existing container as blocks staged in parallel and return the blob URL."""
+    blob_client = container_client.get_blob_client(blob=blob_name)
     
-    blob_client.upload_blob(file_data, overwrite=True)
+    blob_client.upload_blob(file_data, length=length, overwrite=True, max_concurrency=BLOB_TRANSFER_CONCURRENCY)
     
     return blob_client.url
 
@@ -162,10 +200,17 @@ def download_blob_to_stream(blob_url: str, blob_service_client: BlobServiceClien
     stream.seek(0)
     return stream
 
-def upload_stream_to_blob(container_name: str, blob_name: str, data: BytesIO, blob_service_client: BlobServiceClient = None) -> str:
-    """Upload a stream to a blob and return its URL."""
+def upload_stream_to_blob(container_name: str, blob_name: str, data: BinaryIO, blob_service_client: BlobServiceClient = None) -> str:
+    """Upload a seekable stream from its current position to a blob and return its URL.
+
+    The length is passed along: without it the SDK asks the stream for a file descriptor,
+    which moves a SpooledTemporaryFile held in memory to disk.
+    """
     if blob_service_client is None:
         blob_service_client = initialize_blob_service()
     blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-    blob_client.upload_blob(data, overwrite=True)
+    position = data.tell()
+    length = data.seek(0, os.SEEK_END) - position
+    data.seek(position)
+    blob_client.upload_blob(data, length=length, overwrite=True)
     return blob_client.url
\ No newline at end of file
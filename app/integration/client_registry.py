@@ -0,0 +1,45 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import DefaultAzureCredential
+
+CLIENT_POOL_SIZE = int(os.getenv('CLIENT_POOL_SIZE', '32'))
+
+_clients: Dict[Hashable, Any] = {}
+_clients_pid = os.getpid()
+_lock = threading.Lock()
+
+def get_shared_client(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """Return the process-wide client registered under key, creating it on first use."""
+    global _clients_pid
+    client = _clients.get(key) if _clients_pid == os.getpid() else None
+    if client is None:
+        with _lock:
+            if _clients_pid != os.getpid():
+                # Connections must not be shared with a parent process after a fork.
+                _clients.clear()
+                _clients_pid = os.getpid()
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+    return client
+
+def clear_shared_clients() -> None:
+    """Forget all shared clients so they are recreated on next use."""
+    with _lock:
+        _clients.clear()
+
+def get_default_credential() -> DefaultAzureCredential:
+    """Return the shared credential; tokens are cached and only refreshed shortly before they expire."""
+    return get_shared_client("default_credential", DefaultAzureCredential)
+
+def create_azure_transport() -> RequestsTransport:
+    """Create an Azure SDK transport with a keep-alive pool sized for CLIENT_POOL_SIZE concurrent requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=CLIENT_POOL_SIZE, pool_maxsize=CLIENT_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=False)
@@ -0,0 +1,120 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from opentelemetry import metrics, trace
+
+INSTRUMENTATION_NAME = "app.ingestion"
+
+# Labels of the enclosing stage, inherited by the stages nested in it.
+_stage_labels: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("stage_labels", default={})
+_stage_totals: Dict[str, Dict[str, float]] = {}
+_stage_totals_lock = threading.Lock()
+_configured = False
+_configure_lock = threading.Lock()
+
+# Instruments created before configure_telemetry are bound to the exporting provider once it is installed.
+_meter = metrics.get_meter(INSTRUMENTATION_NAME)
+_stage_duration = _meter.create_histogram("ingestion.stage.duration", unit="s", description="Duration of an ingestion pipeline stage")
+_stage_pages = _meter.create_counter("ingestion.stage.pages", unit="{page}", description="Pages that completed an ingestion pipeline stage")
+
+def configure_telemetry(service_name: str) -> bool:
+    """Export spans and metrics over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set; they are no-ops otherwise."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return True
+        if not os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+            return False
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.sdk.metrics import MeterProvider
+            from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        except ImportError as e:
+            logging.warning(f"OTEL_EXPORTER_OTLP_ENDPOINT is set but the OpenTelemetry SDK is not installed: {str(e)}")
+            return False
+
+        resource = Resource.create({"service.name": os.getenv('OTEL_SERVICE_NAME', service_name)})
+        tracer_provider = TracerProvider(resource=resource)
+        tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(tracer_provider)
+        metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[PeriodicExportingMetricReader(OTLPMetricExporter())]))
+        _configured = True
+        logging.info(f"Exporting telemetry of {service_name} to {os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')}")
+        return True
+
+def page_count_bucket(page_count: Optional[int]) -> Optional[str]:
+    """Bucket a page count by order of magnitude so it can label metrics without unbounded cardinality."""
+    if page_count is None:
+        return None
+    if page_count <= 1:
+        return str(page_count)
+    upper = 10
+    while page_count > upper:
+        upper *= 10
+    return f"{upper // 10 + 1}-{upper}"
+
+@contextmanager
+def stage(name: str, index_name: Optional[str] = None, page_count: Optional[int] = None, **attributes) -> Iterator[Any]:
+    """Time one pipeline stage as a span and as duration and page metrics labelled by stage, index and page count.
+
+    Stages nested in another stage inherit its index name when none is given.
+    """
+    inherited = _stage_labels.get()
+    index_name = index_name or inherited.get("index_name")
+    labels = {"stage": name, "index": index_name, "page_count": page_count_bucket(page_count)}
+    labels = {key: value for key, value in labels.items() if value is not None}
+    token = _stage_labels.set({**inherited, "index_name": index_name})
+    start = time.perf_counter()
+    status = "ok"
+    span_attributes = {"ingestion.stage": name, **{f"ingestion.{key}": value for key, value in attributes.items() if value is not None}}
+    if index_name:
+        span_attributes["ingestion.index"] = index_name
+    if page_count is not None:
+        span_attributes["ingestion.page_count"] = page_count
+    try:
+        # The span records the exception and sets an error status itself.
+        with trace.get_tracer(INSTRUMENTATION_NAME).start_as_current_span(f"ingestion.{name}", attributes=span_attributes) as span:
+            yield span
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _stage_labels.reset(token)
+        elapsed = time.perf_counter() - start
+        _record_stage(name, elapsed, page_count if status == "ok" else 0)
+        _stage_duration.record(elapsed, {**labels, "status": status})
+        if page_count and status == "ok":
+            _stage_pages.add(page_count, labels)
+
+def bind_context(function: Callable) -> Callable:
+    """Wrap a function so that, when run on another thread, its stages nest under the caller's current stage."""
+    context = contextvars.copy_context()
+    def run_in_context(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so every call runs in its own copy.
+        return context.copy().run(function, *args, **kwargs)
+    return run_in_context
+
+def _record_stage(name: str, elapsed: float, pages: int):
+    with _stage_totals_lock:
+        totals = _stage_totals.setdefault(name, {"calls": 0, "seconds": 0.0, "pages": 0})
+        totals["calls"] += 1
+        totals["seconds"] += elapsed
+        totals["pages"] += pages or 0
+
+def get_stage_stats() -> Dict[str, Dict[str, float]]:
+    """Return the number of calls, total seconds and pages of every stage timed in this process."""
+    with _stage_totals_lock:
+        return {name: dict(totals) for name, totals in _stage_totals.items()}
+
+def reset_stage_stats() -> None:
+    with _stage_totals_lock:
+        _stage_totals.clear()
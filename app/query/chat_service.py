@@ -1,4 +1,5 @@
 import base64
+import os
 from io import BytesIO
 from typing import Dict, Any, List, Tuple
 from flask import jsonify, Response
@@ -6,8 +7,13 @@ from app.integration.blob_service import initialize_blob_service
 from app.integration.azure_openai import create_payload, stream_response, get_openai_config
 from app.integration.index_manager import create_index_manager, ContainerNameTooLongError
 from app.integration.azure_aisearch import create_data_source
+from app.ingestion.pdf_processing import page_image_blob_name, PAGE_IMAGE_VARIANTS
+from azure.core.exceptions import ResourceNotFoundError
 import requests
 
+# Page image sent to the model when refining; "full" sends the original render.
+REFINE_IMAGE_VARIANT = os.getenv('REFINE_IMAGE_VARIANT', 'preview')
+
 def chat_with_data(data: Dict[str, Any], user_id: str, config: Dict[str, str] = None) -> Response:
     """
     Process a chat request with the given data and user ID.
@@ -121,11 +127,18 @@ def process_citation(citation: Dict[str, Any], container_client: Any) -> Dict[st
     base_filename = parts[0]
     page_number = parts[1].split('.')[0].replace('Page', '') if len(parts) > 1 else '1'
 
-    png_filename = f"{base_filename}___Page{page_number}.png"
+    image_filename = page_image_blob_name(base_filename, page_number, REFINE_IMAGE_VARIANT)
+    mime_type = "image/png"
 
     try:
-        blob_client = container_client.get_blob_client(png_filename)
-        image_data = blob_client.download_blob().readall()
+        try:
+            image_data = container_client.get_blob_client(image_filename).download_blob().readall()
+            if REFINE_IMAGE_VARIANT in PAGE_IMAGE_VARIANTS:
+                mime_type = f"image/{PAGE_IMAGE_VARIANTS[REFINE_IMAGE_VARIANT][1].lower()}"
+        except ResourceNotFoundError:
+            # Pages ingested before variants existed only have the full PNG.
+            image_filename = page_image_blob_name(base_filename, page_number)
+            image_data = container_client.get_blob_client(image_filename).download_blob().readall()
         base64_image = base64.b64encode(image_data).decode('utf-8')
 
         return {
@@ -138,11 +151,11 @@ def process_citation(citation: Dict[str, Any], container_client: Any) -> Dict[st
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{base64_image}"
+                        "url": f"data:{mime_type};base64,{base64_image}"
                     }
                 }
             ]
         }
     except Exception as e:
-        print(f"Error processing image {png_filename}: {str(e)}")
+        print(f"Error processing image {image_filename}: {str(e)}")
         return None
\ No newline at end of file
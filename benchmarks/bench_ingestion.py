@@ -0,0 +1,190 @@
+"""Measure upload worker throughput end to end against local stand-ins for the Azure services.
+
+Synthetic PDFs with text, tables and figures are landed in a fake blob container and queued
+like an upload; a QueueManager then drains the queue and runs BlobManager.process_pdf_pages
+on every message. Splitting, rendering and image encoding run for real and need poppler.
+Settings such as PAGE_CONCURRENCY or DOCUMENT_ANALYSIS_MODE are read from the environment.
+
+Usage: python -m benchmarks.bench_ingestion [--documents 4] [--pages 20] [--output run.json]
+                                            [--baseline previous.json] [--max-regression 10]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict
+
+from app.ingestion.upload_queue import QueueManager, UploadQueueSettings
+from app.integration.telemetry import get_stage_stats, reset_stage_stats
+from benchmarks.fakes import FakeAzureServices, FakeLatency, fake_azure_services, openai_error
+from benchmarks.synthetic_pdf import generate_synthetic_pdf
+
+SERVICES = ("blob", "queue", "table", "document_intelligence", "openai")
+BENCHMARK_INDEX = "benchmark"
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=20, help="Pages per document")
+    parser.add_argument('--lines', type=int, default=20, help="Lines of text per page")
+    parser.add_argument('--tables', type=int, default=1, help="Tables per page")
+    parser.add_argument('--figures', type=int, default=1, help="Figures per page")
+    parser.add_argument('--text-only', action='store_true', help="Process without figure captioning and table enrichment")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--blob-latency', type=float, default=0.02, help="Seconds per blob call")
+    parser.add_argument('--queue-latency', type=float, default=0.01, help="Seconds per queue call")
+    parser.add_argument('--table-latency', type=float, default=0.01, help="Seconds per table call")
+    parser.add_argument('--di-latency', type=float, default=1.0, help="Seconds per Document Intelligence analysis")
+    parser.add_argument('--di-page-latency', type=float, default=0.2, help="Additional Document Intelligence seconds per analyzed page")
+    parser.add_argument('--openai-latency', type=float, default=0.5, help="Seconds per OpenAI completion")
+    for service in SERVICES:
+        parser.add_argument(f"--{service.replace('_', '-')}-error-rate", type=float, default=0.0, help=f"Share of failing {service} calls")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against the results of an earlier run")
+    parser.add_argument('--max-regression', type=float, help="Exit with status 1 when pages/s drops by more than this percentage")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own logging")
+    return parser.parse_args(argv)
+
+def create_services(args: argparse.Namespace) -> FakeAzureServices:
+    latency = {
+        "blob": (args.blob_latency, 0.0),
+        "queue": (args.queue_latency, 0.0),
+        "table": (args.table_latency, 0.0),
+        "document_intelligence": (args.di_latency, args.di_page_latency),
+        "openai": (args.openai_latency, 0.0)
+    }
+    latencies = {}
+    for offset, service in enumerate(SERVICES):
+        seconds, per_unit = latency[service]
+        error_rate = getattr(args, f"{service}_error_rate")
+        # The OpenAI fake raises the errors of the OpenAI SDK rather than Azure ones.
+        error_factory = openai_error if service == "openai" else None
+        latencies[service] = FakeLatency(service, seconds, per_unit, error_rate, seed=args.seed + offset, error_factory=error_factory)
+    return FakeAzureServices(latencies)
+
+def queue_documents(args: argparse.Namespace, services: FakeAzureServices, queue_manager: QueueManager, work_dir: str) -> int:
+    """Land and queue every synthetic document and return the number of queued messages."""
+    index_manager = SimpleNamespace(
+        get_lz_container=lambda: f"{BENCHMARK_INDEX}-lz",
+        get_reference_container=lambda: f"{BENCHMARK_INDEX}-reference",
+        get_ingestion_container=lambda: f"{BENCHMARK_INDEX}-ingestion"
+    )
+    lz_container = services.blob.get_container_client(index_manager.get_lz_container())
+    for document in range(args.documents):
+        filename = f"synthetic-{document + 1}.pdf"
+        pdf_path = generate_synthetic_pdf(
+            os.path.join(work_dir, filename), args.pages, lines_per_page=args.lines,
+            tables_per_page=args.tables, figures_per_page=args.figures, seed=args.seed * 1000 + document
+        )
+        with open(pdf_path, 'rb') as pdf_file:
+            blob_url = lz_container.upload_blob(filename, pdf_file, overwrite=True).url
+        queue_manager.queue_file_for_processing(
+            index_manager=index_manager, filename=filename, user_id="benchmark", index_name=BENCHMARK_INDEX,
+            is_restricted=False, num_pages=args.pages, blob_url=blob_url, is_multimodal=not args.text_only
+        )
+    return sum(len(queue.messages) for queue in services.queues.values())
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Return the peak resident memory of this process and of its largest finished child, in MB."""
+    # ru_maxrss is reported in kilobytes on Linux.
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    services = create_services(args)
+    with tempfile.TemporaryDirectory() as work_dir, fake_azure_services(services):
+        queue_manager = QueueManager()
+        # Landing and queueing are not part of the measured work.
+        setup_calls = services.stats()
+        messages = queue_documents(args, services, queue_manager, work_dir)
+        reset_stage_stats()
+        start = time.perf_counter()
+        queue_manager.process_queue_messages(max_messages=messages)
+        elapsed = time.perf_counter() - start
+
+    completed_messages = sum(queue.deleted for queue in services.queues.values())
+    pages = sum(1 for container, blob in services.blob.blobs if container == f"{BENCHMARK_INDEX}-ingestion" and blob.endswith(".md"))
+    service_calls = {
+        service: {key: stats[key] - setup_calls[service][key] for key in stats}
+        for service, stats in services.stats().items()
+    }
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "max_regression", "verbose")},
+        "settings": {
+            "MESSAGE_CONCURRENCY": UploadQueueSettings.MESSAGE_CONCURRENCY,
+            "PAGE_CONCURRENCY": UploadQueueSettings.PAGE_CONCURRENCY,
+            "ARTIFACT_UPLOAD_CONCURRENCY": UploadQueueSettings.ARTIFACT_UPLOAD_CONCURRENCY,
+            "DOCUMENT_ANALYSIS_MODE": UploadQueueSettings.DOCUMENT_ANALYSIS_MODE,
+            "PAGE_ARTIFACTS_ON_DISK": UploadQueueSettings.PAGE_ARTIFACTS_ON_DISK
+        },
+        "seconds": elapsed,
+        "messages": messages,
+        "completed_messages": completed_messages,
+        "pages": pages,
+        "pages_per_second": pages / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": get_stage_stats(),
+        "service_calls": service_calls
+    }
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"Processed {results['pages']} pages from {results['completed_messages']}/{results['messages']} messages in {results['seconds']:.2f}s")
+    print(f"Throughput: {results['pages_per_second']:.2f} pages/s")
+    print(f"Peak RSS: {results['peak_rss_mb']['self']:.0f} MB (largest child process {results['peak_rss_mb']['children']:.0f} MB)")
+    # Stages overlap across threads, so their totals can add up to more than the wall time.
+    print(f"\n{'stage':<24} {'calls':>7} {'total (s)':>10} {'per call (ms)':>14}")
+    for name, stats in sorted(results['stages'].items(), key=lambda item: -item[1]['seconds']):
+        print(f"{name:<24} {stats['calls']:>7} {stats['seconds']:>10.2f} {1000 * stats['seconds'] / stats['calls']:>14.1f}")
+    print(f"\n{'service':<24} {'calls':>7} {'failures':>10}")
+    for service, stats in results['service_calls'].items():
+        print(f"{service:<24} {stats['calls']:>7} {stats['failures']:>10}")
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any]) -> float:
+    """Print the change against a baseline run and return the change in pages/s as a percentage."""
+    def change(current: float, previous: float) -> str:
+        return f"{100 * (current - previous) / previous:+.1f}%" if previous else "-"
+
+    if baseline.get("config") != results["config"] or baseline.get("settings") != results["settings"]:
+        print("\nWarning: the baseline was run with a different configuration")
+    throughput_change = 100 * (results['pages_per_second'] - baseline['pages_per_second']) / baseline['pages_per_second'] if baseline['pages_per_second'] else 0.0
+    print(f"\n{'metric':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    print(f"{'pages/s':<24} {baseline['pages_per_second']:>10.2f} {results['pages_per_second']:>10.2f} {change(results['pages_per_second'], baseline['pages_per_second']):>8}")
+    print(f"{'peak RSS (MB)':<24} {baseline['peak_rss_mb']['self']:>10.0f} {results['peak_rss_mb']['self']:>10.0f} {change(results['peak_rss_mb']['self'], baseline['peak_rss_mb']['self']):>8}")
+    for name in sorted(set(results['stages']) | set(baseline['stages'])):
+        previous = baseline['stages'].get(name, {}).get('seconds', 0.0)
+        current = results['stages'].get(name, {}).get('seconds', 0.0)
+        print(f"{name + ' (s)':<24} {previous:>10.2f} {current:>10.2f} {change(current, previous):>8}")
+    return throughput_change
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not shutil.which("pdftoppm"):
+        print("poppler is not installed: pdftoppm is needed to render pages (apt-get install poppler-utils)", file=sys.stderr)
+        return 2
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = run_benchmark(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            throughput_change = compare_results(results, json.load(baseline_file))
+        if args.max_regression is not None and throughput_change < -args.max_regression:
+            print(f"\nThroughput regressed by {-throughput_change:.1f}%, more than the allowed {args.max_regression:.1f}%", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Compare per-page re-parsing against single-parse page splitting.
+
+Usage: python -m benchmarks.bench_pdf_split [--pages 800] [--skip-legacy]
+"""
+import os
+import time
+import argparse
+import tempfile
+from PyPDF2 import PdfReader, PdfWriter
+
+from app.ingestion.pdf_processing import split_pdf_pages
+from benchmarks.synthetic_pdf import generate_synthetic_pdf
+
+def split_reopening_per_page(pdf_path: str, output_dir: str, prefix: str, num_pages: int) -> None:
+    """Legacy splitting: reopen and re-parse the source PDF for every page."""
+    for page_num in range(num_pages):
+        with open(pdf_path, 'rb') as file:
+            reader = PdfReader(file)
+            writer = PdfWriter()
+            writer.add_page(reader.pages[page_num])
+            with open(os.path.join(output_dir, f"{prefix}___Page{page_num+1}.pdf"), 'wb') as output_file:
+                writer.write(output_file)
+
+def split_once(pdf_path: str, output_dir: str, prefix: str, num_pages: int) -> None:
+    for _ in split_pdf_pages(pdf_path, output_dir, prefix, last_page=num_pages):
+        pass
+
+def time_split(split_func, pdf_path: str, num_pages: int) -> float:
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        split_func(pdf_path, output_dir, "bench.pdf", num_pages)
+        return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, nargs='+', default=[50, 200, 800])
+    parser.add_argument('--skip-legacy', action='store_true', help="Only time the single-parse splitter")
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'reopen per page (s)':>20} {'parse once (s)':>15} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_pages in args.pages:
+            pdf_path = generate_synthetic_pdf(os.path.join(work_dir, f"synthetic-{num_pages}.pdf"), num_pages)
+            once = time_split(split_once, pdf_path, num_pages)
+            if args.skip_legacy:
+                print(f"{num_pages:>6} {'-':>20} {once:>15.2f} {'-':>8}")
+                continue
+            legacy = time_split(split_reopening_per_page, pdf_path, num_pages)
+            print(f"{num_pages:>6} {legacy:>20.2f} {once:>15.2f} {legacy / once:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,496 @@
+"""In-process stand-ins for the Azure services used by the ingestion pipeline.
+
+Every fake answers the subset of the SDK surface the pipeline calls, after a simulated round
+trip, and fails a configurable share of its calls. Failures stand for errors that survive the
+SDK's own retries, so they surface in the pipeline exactly like the real ones would.
+"""
+import io
+import re
+import hashlib
+import json
+import time
+import uuid
+import random
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from unittest import mock
+
+import httpx
+from openai import APIConnectionError
+from PyPDF2 import PdfReader
+from azure.ai.documentintelligence.models import AnalyzeResult
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError
+
+BLOB_ACCOUNT_URL = "https://benchmark.blob.core.windows.net"
+OPENAI_ENDPOINT = "https://benchmark.openai.azure.com"
+# Points per inch; Document Intelligence reports the geometry of PDF pages in inches.
+POINTS_PER_INCH = 72
+IMAGE_PLACEMENT_PATTERN = re.compile(rb"q\s+([\d.]+)\s+0\s+0\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+cm\s+/\w+\s+Do\s+Q")
+PARTITION_FILTER_PATTERN = re.compile(r"PartitionKey eq '([^']*)'(?: and RowKey eq '([^']*)')?")
+
+def openai_error(message: str) -> APIConnectionError:
+    return APIConnectionError(message=message, request=httpx.Request("POST", OPENAI_ENDPOINT))
+
+class FakeLatency:
+    """Simulated round trip of one service: a delay per call and per unit of work, and a failure rate."""
+    def __init__(self, name: str, seconds: float = 0.0, per_unit: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None, error_factory=None):
+        self.name = name
+        self.seconds = seconds
+        self.per_unit = per_unit
+        self.error_rate = error_rate
+        self.error_factory = error_factory or (lambda message: HttpResponseError(message=message))
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, operation: str, units: float = 1) -> None:
+        """Wait out one call and raise an injected error for the failing share of calls."""
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.failures += 1
+        delay = self.seconds + self.per_unit * units
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise self.error_factory(f"Injected {self.name} failure in {operation}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "failures": self.failures}
+
+class FakeBlobDownloader:
+    def __init__(self, data: bytes):
+        self._data = data
+        # Stands in for the ETag of the blob version; unlike a real one it only changes with the content.
+        self.properties = SimpleNamespace(etag=f'"{hashlib.md5(data).hexdigest()}"')
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def readinto(self, stream) -> int:
+        stream.write(self._data)
+        return len(self._data)
+
+class FakeBlobClient:
+    def __init__(self, service: "FakeBlobServiceClient", container: str, blob: str):
+        self.service = service
+        self.container_name = container
+        self.blob_name = blob
+        self.url = f"{BLOB_ACCOUNT_URL}/{container}/{blob}"
+
+    def upload_blob(self, data, overwrite: bool = False, **kwargs) -> Dict[str, Any]:
+        if hasattr(data, "read"):
+            data = data.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.service.latency.call("upload_blob", len(data) / (1024 * 1024))
+        with self.service.lock:
+            if not overwrite and (self.container_name, self.blob_name) in self.service.blobs:
+                raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} already exists")
+            self.service.blobs[(self.container_name, self.blob_name)] = bytes(data)
+        return {}
+
+    def download_blob(self, **kwargs) -> FakeBlobDownloader:
+        data = self._get()
+        self.service.latency.call("download_blob", len(data) / (1024 * 1024))
+        return FakeBlobDownloader(data)
+
+    def delete_blob(self, **kwargs) -> None:
+        self.service.latency.call("delete_blob", 0)
+        with self.service.lock:
+            if self.service.blobs.pop((self.container_name, self.blob_name), None) is None:
+                raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found")
+
+    def start_copy_from_url(self, source_url: str, **kwargs) -> Dict[str, Any]:
+        self.service.latency.call("start_copy_from_url", 0)
+        source = self.service.get_blob_client_from_url(source_url)
+        with self.service.lock:
+            self.service.blobs[(self.container_name, self.blob_name)] = source._get()
+        return {"copy_status": "success"}
+
+    def get_blob_properties(self, **kwargs):
+        data = self._get()
+        return SimpleNamespace(size=len(data), copy=SimpleNamespace(status="success"))
+
+    def _get(self) -> bytes:
+        with self.service.lock:
+            data = self.service.blobs.get((self.container_name, self.blob_name))
+        if data is None:
+            raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found")
+        return data
+
+class FakeContainerClient:
+    def __init__(self, service: "FakeBlobServiceClient", container: str):
+        self.service = service
+        self.container_name = container
+
+    def get_blob_client(self, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self.service, self.container_name, blob)
+
+    def upload_blob(self, name: str, data, overwrite: bool = False, **kwargs) -> FakeBlobClient:
+        blob_client = self.get_blob_client(name)
+        blob_client.upload_blob(data, overwrite=overwrite)
+        return blob_client
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, **kwargs) -> List[Any]:
+        self.service.latency.call("list_blobs", 0)
+        with self.service.lock:
+            return [
+                SimpleNamespace(name=blob, size=len(data))
+                for (container, blob), data in sorted(self.service.blobs.items())
+                if container == self.container_name and (not name_starts_with or blob.startswith(name_starts_with))
+            ]
+
+    def exists(self) -> bool:
+        with self.service.lock:
+            return self.container_name in self.service.containers
+
+class FakeBlobServiceClient:
+    """Blob storage kept in a dictionary of (container, blob name) to content."""
+    def __init__(self, latency: FakeLatency = None):
+        self.latency = latency or FakeLatency("blob")
+        self.credential = None
+        self.url = BLOB_ACCOUNT_URL
+        self.blobs: Dict[Tuple[str, str], bytes] = {}
+        self.containers = set()
+        self.lock = threading.Lock()
+
+    def create_container(self, name: str, **kwargs) -> FakeContainerClient:
+        self.latency.call("create_container", 0)
+        with self.lock:
+            if name in self.containers:
+                raise ResourceExistsError(f"Container {name} already exists")
+            self.containers.add(name)
+        return FakeContainerClient(self, name)
+
+    def get_container_client(self, container: str) -> FakeContainerClient:
+        return FakeContainerClient(self, container)
+
+    def get_blob_client(self, container: str, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self, container, blob)
+
+    def get_blob_client_from_url(self, blob_url: str) -> FakeBlobClient:
+        container, _, blob = blob_url[len(BLOB_ACCOUNT_URL) + 1:].partition("/")
+        return FakeBlobClient(self, container, blob)
+
+    def download_blob_to_file(self, blob_url: str, local_file_path: str, blob_service_client=None) -> str:
+        """Stand-in for blob_service.download_blob_to_file, which builds its client from the blob URL."""
+        with open(local_file_path, "wb") as file:
+            downloader = self.get_blob_client_from_url(blob_url).download_blob()
+            downloader.readinto(file)
+        return downloader.properties.etag
+
+class FakeQueueClient:
+    """A queue with visibility timeouts and dequeue counts, but no persistence."""
+    def __init__(self, queue_name: str, latency: FakeLatency = None):
+        self.queue_name = queue_name
+        self.latency = latency or FakeLatency("queue")
+        self.created = False
+        self.messages: Dict[str, SimpleNamespace] = {}
+        self.deleted = 0
+        self._lock = threading.Lock()
+
+    def create_queue(self, **kwargs) -> None:
+        self.latency.call("create_queue", 0)
+        with self._lock:
+            if self.created:
+                raise ResourceExistsError(f"Queue {self.queue_name} already exists")
+            self.created = True
+
+    def send_message(self, content: str, **kwargs) -> SimpleNamespace:
+        self.latency.call("send_message", 0)
+        now = datetime.now(timezone.utc)
+        message = SimpleNamespace(
+            id=uuid.uuid4().hex, content=content, dequeue_count=0, pop_receipt=uuid.uuid4().hex,
+            inserted_on=now, next_visible_on=now
+        )
+        with self._lock:
+            self._check_exists()
+            self.messages[message.id] = message
+        return message
+
+    def receive_messages(self, max_messages: int = 1, visibility_timeout: int = 30, **kwargs) -> List[SimpleNamespace]:
+        self.latency.call("receive_messages", 0)
+        now = datetime.now(timezone.utc)
+        received = []
+        with self._lock:
+            self._check_exists()
+            for message in self.messages.values():
+                if len(received) >= max_messages:
+                    break
+                if message.next_visible_on <= now:
+                    message.dequeue_count += 1
+                    message.pop_receipt = uuid.uuid4().hex
+                    message.next_visible_on = now + timedelta(seconds=visibility_timeout)
+                    received.append(SimpleNamespace(**vars(message)))
+        return received
+
+    def update_message(self, message, pop_receipt: str = None, visibility_timeout: int = 30, **kwargs) -> SimpleNamespace:
+        self.latency.call("update_message", 0)
+        message_id = getattr(message, "id", message)
+        with self._lock:
+            stored = self._find(message_id, pop_receipt)
+            stored.pop_receipt = uuid.uuid4().hex
+            stored.next_visible_on = datetime.now(timezone.utc) + timedelta(seconds=visibility_timeout)
+            return SimpleNamespace(pop_receipt=stored.pop_receipt, next_visible_on=stored.next_visible_on)
+
+    def delete_message(self, message, pop_receipt: str = None, **kwargs) -> None:
+        self.latency.call("delete_message", 0)
+        with self._lock:
+            self._find(message.id, pop_receipt or message.pop_receipt)
+            del self.messages[message.id]
+            self.deleted += 1
+
+    def _check_exists(self):
+        if not self.created:
+            raise ResourceNotFoundError(f"Queue {self.queue_name} not found")
+
+    def _find(self, message_id: str, pop_receipt: Optional[str]) -> SimpleNamespace:
+        stored = self.messages.get(message_id)
+        if stored is None or (pop_receipt and stored.pop_receipt != pop_receipt):
+            raise ResourceNotFoundError(f"Message {message_id} not found or its pop receipt is outdated")
+        return stored
+
+class FakeTableClient:
+    """A table that understands the PartitionKey and RowKey equality filters used by the pipeline."""
+    def __init__(self, table_name: str, latency: FakeLatency = None):
+        self.table_name = table_name
+        self.latency = latency or FakeLatency("table")
+        self.entities: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def upsert_entity(self, entity: Dict[str, Any], **kwargs) -> None:
+        self.latency.call("upsert_entity", 1)
+        self._upsert(entity)
+
+    def update_entity(self, entity: Dict[str, Any], **kwargs) -> None:
+        self.latency.call("update_entity", 1)
+        self.get_entity(entity["PartitionKey"], entity["RowKey"])
+        self._upsert(entity)
+
+    def get_entity(self, partition_key: str, row_key: str, **kwargs) -> Dict[str, Any]:
+        self.latency.call("get_entity", 1)
+        with self._lock:
+            entity = self.entities.get((partition_key, row_key))
+        if entity is None:
+            raise ResourceNotFoundError(f"Entity {partition_key}/{row_key} not found in {self.table_name}")
+        return dict(entity)
+
+    def delete_entity(self, partition_key: str, row_key: str, **kwargs) -> None:
+        self.latency.call("delete_entity", 1)
+        with self._lock:
+            self.entities.pop((partition_key, row_key), None)
+
+    def query_entities(self, query_filter: str, select: Optional[List[str]] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+        match = PARTITION_FILTER_PATTERN.fullmatch(query_filter.strip())
+        if not match:
+            raise ValueError(f"Unsupported filter: {query_filter}")
+        partition_key, row_key = match.groups()
+        with self._lock:
+            entities = [
+                dict(entity) for (entity_partition, entity_row), entity in sorted(self.entities.items())
+                if entity_partition == partition_key and (row_key is None or entity_row == row_key)
+            ]
+        self.latency.call("query_entities", max(1, len(entities)))
+        for entity in entities:
+            yield {key: entity[key] for key in ["PartitionKey", "RowKey", *select] if key in entity} if select else entity
+
+    def submit_transaction(self, operations: List[Tuple[str, Dict[str, Any]]], **kwargs) -> None:
+        self.latency.call("submit_transaction", len(operations))
+        for operation, entity in operations:
+            if operation == "delete":
+                with self._lock:
+                    self.entities.pop((entity["PartitionKey"], entity["RowKey"]), None)
+            else:
+                self._upsert(entity)
+
+    def _upsert(self, entity: Dict[str, Any]):
+        with self._lock:
+            key = (entity["PartitionKey"], entity["RowKey"])
+            self.entities[key] = {**self.entities.get(key, {}), **entity}
+
+class FakeLayoutPoller:
+    def __init__(self, analyze, latency: FakeLatency, page_count: int):
+        self._analyze = analyze
+        self._latency = latency
+        self._page_count = page_count
+
+    def result(self) -> AnalyzeResult:
+        self._latency.call("analyze_document", self._page_count)
+        return self._analyze()
+
+class FakeDocumentIntelligenceClient:
+    """Builds a prebuilt-layout result from the text and image placements of the submitted PDF.
+
+    Lines containing " | " become markdown tables and every placed image becomes a figure,
+    which matches the pages written by benchmarks.synthetic_pdf.
+    """
+    def __init__(self, latency: FakeLatency = None):
+        self.latency = latency or FakeLatency("document_intelligence")
+
+    def begin_analyze_document(self, model_id: str, analyze_request=None, pages: Optional[str] = None, **kwargs) -> FakeLayoutPoller:
+        data = analyze_request.read() if hasattr(analyze_request, "read") else analyze_request
+        reader = PdfReader(io.BytesIO(data))
+        page_numbers = self._page_numbers(pages, len(reader.pages))
+        return FakeLayoutPoller(lambda: self._analyze(reader, page_numbers), self.latency, len(page_numbers))
+
+    @staticmethod
+    def _page_numbers(pages: Optional[str], page_count: int) -> List[int]:
+        if not pages:
+            return list(range(1, page_count + 1))
+        first, _, last = pages.partition("-")
+        return list(range(int(first), min(int(last or first), page_count) + 1))
+
+    def _analyze(self, reader: PdfReader, page_numbers: List[int]) -> AnalyzeResult:
+        content = ""
+        pages, figures, tables = [], [], []
+        for page_number in page_numbers:
+            page = reader.pages[page_number - 1]
+            width = float(page.mediabox.width) / POINTS_PER_INCH
+            height = float(page.mediabox.height) / POINTS_PER_INCH
+            if content:
+                content += "\n<!-- PageBreak -->\n\n"
+            offset = len(content)
+            blocks = self._text_blocks(page.extract_text() or "")
+            for block in blocks:
+                if block.startswith("|"):
+                    rows = block.split("\n")
+                    tables.append({
+                        "rowCount": len(rows) - 1,
+                        "columnCount": rows[0].count("|") - 1,
+                        "cells": [],
+                        "boundingRegions": [{"pageNumber": page_number, "polygon": [0, 0, width, 0, width, height, 0, height]}]
+                    })
+            for polygon in self._image_polygons(page, height):
+                blocks.append(f"<figure>\n\n![](figures/{len(figures)})\n\n</figure>")
+                figures.append({
+                    "id": f"{page_number}.{len(figures)}",
+                    "boundingRegions": [{"pageNumber": page_number, "polygon": polygon}]
+                })
+            content += "\n\n".join(blocks) + "\n"
+            pages.append({
+                "pageNumber": page_number, "width": width, "height": height, "unit": "inch", "angle": 0,
+                "spans": [{"offset": offset, "length": len(content) - offset}]
+            })
+        return AnalyzeResult({
+            "apiVersion": "2024-11-30",
+            "modelId": "prebuilt-layout",
+            "stringIndexType": "unicodeCodePoint",
+            "contentFormat": "markdown",
+            "content": content,
+            "pages": pages,
+            "figures": figures,
+            "tables": tables
+        })
+
+    @staticmethod
+    def _text_blocks(text: str) -> List[str]:
+        """Group extracted lines into paragraphs and markdown tables."""
+        blocks, paragraph, table = [], [], []
+        for line in [line.strip() for line in text.splitlines() if line.strip()] + [""]:
+            if " | " in line:
+                if paragraph:
+                    blocks.append(" ".join(paragraph))
+                    paragraph = []
+                table.append(f"| {line} |")
+                continue
+            if table:
+                blocks.append("\n".join(table[:1] + ["|" + " --- |" * table[0].count(" | ") + " --- |"] + table[1:]))
+                table = []
+            if line:
+                paragraph.append(line)
+        if paragraph:
+            blocks.append(" ".join(paragraph))
+        return blocks
+
+    @staticmethod
+    def _image_polygons(page, page_height: float) -> List[List[float]]:
+        """Return the bounding polygon in inches, from the top left corner, of every image placed on the page."""
+        contents = page.get_contents()
+        if contents is None:
+            return []
+        polygons = []
+        for match in IMAGE_PLACEMENT_PATTERN.finditer(contents.get_data()):
+            width, height, x, y = (float(value) / POINTS_PER_INCH for value in match.groups())
+            top = page_height - y - height
+            polygons.append([x, top, x + width, top, x + width, top + height, x, top + height])
+        return polygons
+
+class FakeOpenAI:
+    """Answers chat completions with canned figure captions and table enrichments."""
+    def __init__(self, latency: FakeLatency = None):
+        self.latency = latency or FakeLatency("openai", error_factory=openai_error)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def _create_completion(self, model: str, messages: List[Dict[str, Any]], max_tokens: int = None, **kwargs):
+        self.latency.call("chat.completions.create", 1)
+        prompt = messages[-1]["content"]
+        if not isinstance(prompt, str):
+            answer = "A bar chart comparing a handful of synthetic values; the bars vary in height and color."
+        elif "JSON object" in prompt:
+            answer = json.dumps({
+                "summary": "The table lists synthetic quarterly values per region.",
+                "qa_pairs": [{"question": "What does the table show?", "answer": "Quarterly values per region."}]
+            })
+        else:
+            answer = "The table lists synthetic quarterly values per region."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+
+class FakeAzureServices:
+    """One fake per service, with the latency and failure rate of each one."""
+    def __init__(self, latencies: Dict[str, FakeLatency] = None):
+        latencies = latencies or {}
+        self.blob = FakeBlobServiceClient(latencies.get("blob"))
+        self.document_intelligence = FakeDocumentIntelligenceClient(latencies.get("document_intelligence"))
+        self.openai = FakeOpenAI(latencies.get("openai"))
+        self._queue_latency = latencies.get("queue") or FakeLatency("queue")
+        self._table_latency = latencies.get("table") or FakeLatency("table")
+        self.queues: Dict[str, FakeQueueClient] = {}
+        self.tables: Dict[str, FakeTableClient] = {}
+        self._lock = threading.Lock()
+
+    def queue_client(self, queue_name: str) -> FakeQueueClient:
+        with self._lock:
+            return self.queues.setdefault(queue_name, FakeQueueClient(queue_name, self._queue_latency))
+
+    def table_client(self, table_name: str) -> FakeTableClient:
+        with self._lock:
+            return self.tables.setdefault(table_name, FakeTableClient(table_name, self._table_latency))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "blob": self.blob.latency.stats(),
+            "queue": self._queue_latency.stats(),
+            "table": self._table_latency.stats(),
+            "document_intelligence": self.document_intelligence.latency.stats(),
+            "openai": self.openai.latency.stats()
+        }
+
+@contextmanager
+def fake_azure_services(services: FakeAzureServices) -> Iterator[FakeAzureServices]:
+    """Route every Azure client the upload worker creates to the given fakes while the context is active."""
+    from app.ingestion.indexing_queue import AzureClientManager
+    from app.ingestion.upload_queue import QueueManager
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.dict("os.environ", {
+            "AZURE_OPENAI_DEPLOYMENT_NAME": "benchmark",
+            "AOAI_API_KEY": "benchmark",
+            "OPENAI_ENDPOINT": OPENAI_ENDPOINT
+        }))
+        stack.enter_context(mock.patch("app.ingestion.upload_queue.initialize_blob_service", return_value=services.blob))
+        stack.enter_context(mock.patch("app.ingestion.upload_queue.download_blob_to_file", services.blob.download_blob_to_file))
+        stack.enter_context(mock.patch("app.ingestion.enrichment_cache.initialize_blob_service", return_value=services.blob))
+        stack.enter_context(mock.patch.object(QueueManager, "_initialize_queue_client", lambda self, queue_name: services.queue_client(queue_name)))
+        stack.enter_context(mock.patch.object(AzureClientManager, "initialize_table_client", services.table_client))
+        stack.enter_context(mock.patch("app.ingestion.doc_intelligence.get_document_intelligence_client", return_value=services.document_intelligence))
+        stack.enter_context(mock.patch("app.ingestion.doc_intelligence.get_azure_openai_client", return_value=services.openai))
+        stack.enter_context(mock.patch("app.ingestion.table_postprocessor.get_azure_openai_client", return_value=services.openai))
+        yield services
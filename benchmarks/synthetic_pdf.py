@@ -0,0 +1,132 @@
+import io
+import random
+from typing import List
+from PIL import Image, ImageDraw
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+LINE_HEIGHT = 14
+TABLE_ROW_HEIGHT = 18
+TABLE_COLUMNS = ("Region", "Q1", "Q2", "Q3", "Q4")
+FIGURE_WIDTH = 240
+FIGURE_HEIGHT = 160
+
+def _text_ops(seed: int, page_num: int, lines: int, top: float) -> List[str]:
+    """Build the operators of a block of Helvetica text starting at top."""
+    ops = ["BT", "/F1 11 Tf", f"{LINE_HEIGHT} TL", f"{MARGIN} {top} Td"]
+    for line in range(lines):
+        ops.append(f"(Synthetic document {seed}, page {page_num + 1}, line {line + 1}: lorem ipsum dolor sit amet.) Tj T*")
+    ops.append("ET")
+    return ops
+
+def _table_ops(page_num: int, table_num: int, rows: int, top: float, rng: random.Random) -> List[str]:
+    """Build the operators of a ruled table whose rows are single text runs with " | " between cells."""
+    width = PAGE_WIDTH - 2 * MARGIN
+    height = (rows + 1) * TABLE_ROW_HEIGHT
+    ops = ["0.5 w"]
+    for row in range(rows + 2):
+        y = top - row * TABLE_ROW_HEIGHT
+        ops.append(f"{MARGIN} {y} m {MARGIN + width} {y} l S")
+    column_width = width / len(TABLE_COLUMNS)
+    for column in range(len(TABLE_COLUMNS) + 1):
+        x = MARGIN + column * column_width
+        ops.append(f"{x:.1f} {top} m {x:.1f} {top - height} l S")
+
+    cells = [list(TABLE_COLUMNS)] + [
+        [f"Region {page_num + 1}.{table_num + 1}.{row + 1}"] + [str(rng.randint(100, 999)) for _ in TABLE_COLUMNS[1:]]
+        for row in range(rows)
+    ]
+    ops += ["BT", "/F1 10 Tf", f"{TABLE_ROW_HEIGHT} TL", f"{MARGIN + 4} {top - TABLE_ROW_HEIGHT + 5} Td"]
+    for row in cells:
+        ops.append(f"({' | '.join(row)}) Tj T*")
+    ops.append("ET")
+    return ops
+
+def _figure_jpeg(rng: random.Random) -> bytes:
+    """Draw a small bar chart with random values so that no two figures share a caption cache entry."""
+    image = Image.new("RGB", (FIGURE_WIDTH * 2, FIGURE_HEIGHT * 2), "white")
+    draw = ImageDraw.Draw(image)
+    bars = rng.randint(3, 8)
+    bar_width = image.width // (bars * 2)
+    for bar in range(bars):
+        bar_height = rng.randint(20, image.height - 20)
+        x = bar_width // 2 + bar * bar_width * 2
+        color = tuple(rng.randint(0, 200) for _ in range(3))
+        draw.rectangle([x, image.height - bar_height, x + bar_width, image.height - 1], fill=color)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+def _image_xobject(jpeg: bytes) -> DecodedStreamObject:
+    image = DecodedStreamObject()
+    image.set_data(jpeg)
+    image.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(FIGURE_WIDTH * 2),
+        NameObject("/Height"): NumberObject(FIGURE_HEIGHT * 2),
+        NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/DCTDecode"),
+    })
+    return image
+
+def generate_synthetic_pdf(output_path: str, num_pages: int, lines_per_page: int = 40, tables_per_page: int = 0,
+                           table_rows: int = 5, figures_per_page: int = 0, seed: int = 0) -> str:
+    """Write a PDF with the given number of pages and return its path.
+
+    Every page starts with lines of text, followed by ruled tables and JPEG bar charts; blocks
+    that no longer fit on the page are left out. Documents generated with different seeds have
+    no page in common, so they do not hit each other's layout and enrichment cache entries.
+    """
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    font_ref = writer._add_object(font)
+
+    for page_num in range(num_pages):
+        top = PAGE_HEIGHT - MARGIN
+        lines = min(lines_per_page, int((top - MARGIN) // LINE_HEIGHT))
+        ops = _text_ops(seed, page_num, lines, top)
+        top -= lines * LINE_HEIGHT + LINE_HEIGHT
+
+        for table_num in range(tables_per_page):
+            height = (table_rows + 1) * TABLE_ROW_HEIGHT
+            if top - height < MARGIN:
+                break
+            ops += _table_ops(page_num, table_num, table_rows, top, rng)
+            top -= height + LINE_HEIGHT
+
+        images = DictionaryObject()
+        for figure_num in range(figures_per_page):
+            if top - FIGURE_HEIGHT < MARGIN:
+                break
+            name = f"/Im{figure_num}"
+            images[NameObject(name)] = writer._add_object(_image_xobject(_figure_jpeg(rng)))
+            ops.append(f"q {FIGURE_WIDTH} 0 0 {FIGURE_HEIGHT} {MARGIN} {top - FIGURE_HEIGHT} cm {name} Do Q")
+            top -= FIGURE_HEIGHT + LINE_HEIGHT
+
+        # Changes to the page returned by PdfWriter.add_blank_page are not written out, so the page is built first.
+        page = PageObject.create_blank_page(None, PAGE_WIDTH, PAGE_HEIGHT)
+        stream = DecodedStreamObject()
+        stream.set_data("\n".join(ops).encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        resources = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref}),
+            NameObject("/ProcSet"): ArrayObject([NameObject("/PDF"), NameObject("/Text"), NameObject("/ImageC")])
+        })
+        if images:
+            resources[NameObject("/XObject")] = images
+        page[NameObject("/Resources")] = resources
+        writer.add_page(page)
+
+    with open(output_path, "wb") as output_file:
+        writer.write(output_file)
+    return output_path
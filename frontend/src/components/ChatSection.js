@@ -227,6 +227,19 @@ const PDFEmbed = styled.embed`
   border: none;
 `;
 
+const PageImage = styled.img`
+  max-width: 100%;
+  max-height: 100%;
+  margin: 0 auto;
+  object-fit: contain;
+`;
+
+const PreviewActions = styled.div`
+  display: flex;
+  justify-content: flex-end;
+  gap: 10px;
+`;
+
 const CloseButton = styled.button`
   align-self: flex-end;
   background-color: ${props => props.theme.closeButtonBackground};
@@ -366,7 +379,8 @@ function ChatSection({ indexName, isRestricted, onStartResearch }) {
     }
 
     const pdfUrl = `${prefix}pdf/${indexName}/${encodeURIComponent(citation.filepath)}?is_restricted=${isRestricted}`;
-    setPDFPreview(pdfUrl);
+    const imageUrl = `${prefix}image/${indexName}/${encodeURIComponent(citation.filepath)}?is_restricted=${isRestricted}&variant=preview`;
+    setPDFPreview({ pdfUrl, imageUrl, showPdf: false });
   };
 
   const handleCopy = (content) => {
@@ -512,8 +526,21 @@ function ChatSection({ indexName, isRestricted, onStartResearch }) {
       {pdfPreview && (
         <PDFPreviewContainer>
           <PDFPreview>
-            <CloseButton onClick={() => setPDFPreview(null)}>Close</CloseButton>
-            <PDFEmbed src={pdfPreview} type="application/pdf" />
+            <PreviewActions>
+              {!pdfPreview.showPdf && (
+                <CloseButton onClick={() => setPDFPreview({ ...pdfPreview, showPdf: true })}>Open PDF</CloseButton>
+              )}
+              <CloseButton onClick={() => setPDFPreview(null)}>Close</CloseButton>
+            </PreviewActions>
+            {pdfPreview.showPdf ? (
+              <PDFEmbed src={pdfPreview.pdfUrl} type="application/pdf" />
+            ) : (
+              <PageImage
+                src={pdfPreview.imageUrl}
+                alt="Cited page"
+                onError={() => setPDFPreview({ ...pdfPreview, showPdf: true })}
+              />
+            )}
           </PDFPreview>
         </PDFPreviewContainer>
       )}
@@ -7,7 +7,8 @@ import {
   faExpand, 
   faCompress,
   faSpinner,
-  faExclamationTriangle
+  faExclamationTriangle,
+  faFilePdf
 } from '@fortawesome/free-solid-svg-icons';
 
 import {
@@ -52,6 +53,13 @@ const PDFContainer = styled.div`
   flex-direction: column;
 `;
 
+const PageImage = styled.img`
+  max-width: 100%;
+  max-height: 100%;
+  margin: auto;
+  object-fit: contain;
+`;
+
 const LoadingOverlay = styled.div`
   position: absolute;
   top: 0;
@@ -83,9 +91,12 @@ const PDFPreview = ({
   onClose, 
   title = 'Document Preview',
   allowDownload = true,
-  initialPage = 1
+  initialPage = 1,
+  imageUrl = null
 }) => {
   const [isLoading, setIsLoading] = useState(true);
+  // The lightweight page image is shown first; the PDF is only embedded on request.
+  const [showPdf, setShowPdf] = useState(!imageUrl);
   const [error, setError] = useState(null);
   const [isFullscreen, setIsFullscreen] = useState(false);
   const [currentPage, setCurrentPage] = useState(initialPage);
@@ -178,6 +189,19 @@ const PDFPreview = ({
       );
     }
 
+    if (!showPdf) {
+      return (
+        <PDFContainer>
+          <PageImage
+            src={imageUrl}
+            alt={title}
+            onLoad={handlePDFLoad}
+            onError={() => setShowPdf(true)}
+          />
+        </PDFContainer>
+      );
+    }
+
     return (
       <PDFContainer>
         <PDFEmbed
@@ -206,6 +230,18 @@ const PDFPreview = ({
         <PreviewHeader>
           <PreviewTitle>{title}</PreviewTitle>
           <ButtonGroup>
+            {!showPdf && (
+              <Button
+                onClick={() => {
+                  setIsLoading(true);
+                  setShowPdf(true);
+                }}
+                aria-label="View PDF"
+                title="View PDF"
+              >
+                <FontAwesomeIcon icon={faFilePdf} />
+              </Button>
+            )}
             {allowDownload && (
               <Button
                 onClick={handleDownload}
@@ -243,7 +279,8 @@ PDFPreview.propTypes = {
   onClose: PropTypes.func.isRequired,
   title: PropTypes.string,
   allowDownload: PropTypes.bool,
-  initialPage: PropTypes.number
+  initialPage: PropTypes.number,
+  imageUrl: PropTypes.string
 };
 
 export default React.memo(PDFPreview);
\ No newline at end of file
@@ -248,7 +248,8 @@ const ResearchSection = ({
                     : "/";
 
     const pdfUrl = `${prefix}pdf/${dataSource}/${encodeURIComponent(citation)}?is_restricted=${dataSource.isRestricted}`;
-    setState(prev => ({ ...prev, pdfPreview: pdfUrl }));
+    const imageUrl = `${prefix}image/${dataSource}/${encodeURIComponent(citation)}?is_restricted=${dataSource.isRestricted}&variant=preview`;
+    setState(prev => ({ ...prev, pdfPreview: { pdfUrl, imageUrl } }));
   }, []);
 
   return (
@@ -293,7 +294,8 @@ const ResearchSection = ({
       
       {state.pdfPreview && (
         <PDFPreview
-          pdfUrl={state.pdfPreview}
+          pdfUrl={state.pdfPreview.pdfUrl}
+          imageUrl={state.pdfPreview.imageUrl}
           onClose={() => setState(prev => ({ ...prev, pdfPreview: null }))}
         />
       )}
@@ -303,23 +303,30 @@ function UploadSection({ indexName, isRestricted, onFilesChange }) {
 
   const handleUpload = async (e) => {
     e.preventDefault();
-    const file = e.target.elements.file.files[0];
-    if (!file) return;
+    const selected = Array.from(e.target.elements.file.files);
+    if (selected.length === 0) return;
+    // Several files or a ZIP archive go to the batch endpoint in a single request.
+    const isBatch = selected.length > 1 || selected[0].name.toLowerCase().endsWith('.zip');
     const formData = new FormData();
-    formData.append('file', file);
+    selected.forEach((file) => formData.append(isBatch ? 'files' : 'file', file));
     formData.append('multimodal', isMultimodal);
+    const endpoint = isBatch ? 'upload/batch' : 'upload';
 
     try {
       setStatus('Uploading...');
       setUploadProgress(0);
       setIsUploading(true);
-      const response = await fetch(`/indexes/${indexName}/upload?is_restricted=${isRestricted}`, {
+      const response = await fetch(`/indexes/${indexName}/${endpoint}?is_restricted=${isRestricted}`, {
         method: 'POST',
         body: formData,
       });
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const data = await response.json();
-      setStatus(data.message);
+      // A rejected batch still returns the per-file manifest, so the body is read before the status.
+      const data = await response.json().catch(() => ({}));
+      if (!response.ok && !data.files) throw new Error(data.error || `HTTP error! status: ${response.status}`);
+      const rejected = (data.files || []).filter((file) => file.status !== 'queued');
+      setStatus(rejected.length > 0
+        ? `${data.message}. Not queued: ${rejected.map((file) => `${file.filename} (${file.error})`).join(', ')}`
+        : data.message);
       setSelectedFileName('');
       setUploadProgress(100);
       setTimeout(() => {
@@ -388,8 +395,12 @@ function UploadSection({ indexName, isRestricted, onFilesChange }) {
   };
 
   const handleFileChange = (e) => {
-    const file = e.target.files[0];
-    setSelectedFileName(file ? file.name : '');
+    const selected = e.target.files;
+    if (selected.length > 1) {
+      setSelectedFileName(`${selected.length} files selected`);
+    } else {
+      setSelectedFileName(selected[0] ? selected[0].name : '');
+    }
   };
 
   return (
@@ -398,8 +409,8 @@ function UploadSection({ indexName, isRestricted, onFilesChange }) {
         <UploadContainer>
           <FormContainer onSubmit={handleUpload}>
             <FileInputLabel>
-              {selectedFileName || 'Choose a file'}
-              <HiddenFileInput type="file" name="file" onChange={handleFileChange} />
+              {selectedFileName || 'Choose files or a ZIP archive'}
+              <HiddenFileInput type="file" name="file" multiple onChange={handleFileChange} />
             </FileInputLabel>
             <CheckboxContainer>
               <HiddenCheckbox
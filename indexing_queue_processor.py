@@ -3,11 +3,13 @@ import asyncio
 from dotenv import load_dotenv
 from app.ingestion.indexing_queue import process_indexing_queue
 from app.ingestion.ingestion_job import process_indexing_job
+from app.integration.telemetry import configure_telemetry
 
 load_dotenv()
 
 async def main():
     print("Starting indexing queue processor...")
+    configure_telemetry("indexing-worker")
     await process_indexing_queue(process_indexing_job)
 
 if __name__ == '__main__':
@@ -5,11 +5,15 @@ from flask_cors import CORS
 from pathlib import Path
 from dotenv import load_dotenv
 from app.api.routes import configure_routes
+from app.integration.telemetry import configure_telemetry
+from opentelemetry.instrumentation.flask import FlaskInstrumentor
 
 load_dotenv()
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app)
+configure_telemetry("api")
+FlaskInstrumentor().instrument_app(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
 
 UPLOAD_FOLDER = Path('/tmp/uploads')
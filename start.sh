@@ -1,6 +1,9 @@
 #!/bin/bash
 
 gunicorn --worker-class geventwebsocket.gunicorn.workers.GeventWebSocketWorker --workers 1 --bind 0.0.0.0:5000 main:app &
+# One upload worker process unless UPLOAD_WORKERS is set: nproc reports the host's cores, not the container's
+# quota. The supervisor sizes render threads and encoder processes from the cgroup CPU quota and recycles
+# workers above their share of the container's memory.
 python upload_queue_processor.py &
 python indexing_queue_processor.py &
 
@@ -1,4 +1,7 @@
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
 
 from app.integration import azure_openai
@@ -15,6 +18,43 @@ class TestAzureOpenAI(unittest.TestCase):
         result = azure_openai.analyze_image(mock_client, "base64_image_data")
         self.assertEqual(result, "Test analysis")
 
+    @patch('app.integration.azure_openai.AzureOpenAI')
+    def test_get_azure_openai_client_is_shared(self, mock_azure_openai):
+        mock_azure_openai.side_effect = lambda **kwargs: MagicMock()
+        first = azure_openai.get_azure_openai_client(api_key="shared-key", azure_endpoint="https://shared.example.com")
+        second = azure_openai.get_azure_openai_client(api_key="shared-key", azure_endpoint="https://shared.example.com")
+        other = azure_openai.get_azure_openai_client(api_key="other-key", azure_endpoint="https://shared.example.com")
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(mock_azure_openai.call_count, 2)
+
+    @patch('app.integration.azure_openai._completion_slots', threading.BoundedSemaphore(2))
+    def test_completions_in_flight_are_bounded_process_wide(self):
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+        def create(**kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            response = MagicMock()
+            response.choices[0].message.content = "done"
+            return response
+        client = MagicMock()
+        client.chat.completions.create.side_effect = create
+
+        def describe(_):
+            # Nested pools, as the table enrichment runs them.
+            with ThreadPoolExecutor(max_workers=4) as inner:
+                return list(inner.map(lambda _: azure_openai.generate_completion(client, [], "model"), range(4)))
+        with ThreadPoolExecutor(max_workers=4) as outer:
+            results = [result for batch in outer.map(describe, range(4)) for result in batch]
+
+        self.assertEqual(results, ["done"] * 16)
+        self.assertEqual(peak[0], 2)
+
     def test_create_payload(self):
         messages = [{"role": "user", "content": "Hello"}]
         payload = azure_openai.create_payload(messages)
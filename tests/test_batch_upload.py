@@ -0,0 +1,113 @@
+import unittest
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
+from PyPDF2 import PdfWriter
+from app.ingestion.batch_upload import BatchUploadSettings, ExtractionBudget, _member_opener, expand_uploads, upload_batch
+
+def _pdf(num_pages=1):
+    writer = PdfWriter()
+    for _ in range(num_pages):
+        writer.add_blank_page(width=612, height=792)
+    output = BytesIO()
+    writer.write(output)
+    output.seek(0)
+    return output
+
+def _zip(members):
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    output.seek(0)
+    return output
+
+class TestBatchUpload(unittest.TestCase):
+
+    def test_zip_members_are_expanded(self):
+        archive = _zip({'reports/a.pdf': _pdf().getvalue(), 'b.pdf': _pdf(2).getvalue(), '__MACOSX/._a.pdf': b'', 'reports/': b''})
+
+        entries = expand_uploads([('corpus.zip', archive), ('c.pdf', _pdf())])
+
+        self.assertEqual([entry.filename for entry in entries], ['a.pdf', 'b.pdf', 'c.pdf'])
+        stream, size = entries[1].open()
+        self.assertEqual(size, len(stream.read()))
+
+    def test_invalid_and_duplicate_names_are_rejected(self):
+        entries = expand_uploads([('a.pdf', _pdf()), ('a.pdf', _pdf()), ('x___Page1.pdf', _pdf()), ('broken.zip', BytesIO(b'not a zip'))])
+
+        self.assertEqual([entry.error for entry in entries][:3], [None, 'Duplicate file name in batch', 'Invalid file name'])
+        self.assertTrue(entries[3].error.startswith('Invalid ZIP archive'))
+
+    @patch.object(BatchUploadSettings, 'BATCH_UPLOAD_MAX_FILES', 1)
+    def test_files_over_the_limit_are_rejected(self):
+        entries = expand_uploads([('a.pdf', _pdf()), ('b.pdf', _pdf())])
+        self.assertEqual(entries[1].error, 'Batch exceeds 1 files')
+
+    @patch.object(BatchUploadSettings, 'BATCH_UPLOAD_MAX_ARCHIVE_MEMBERS', 2)
+    def test_archive_with_too_many_members_is_rejected(self):
+        archive = _zip({'a.pdf': b'a', 'b.pdf': b'b', 'c.pdf': b'c'})
+
+        entries = expand_uploads([('corpus.zip', archive)])
+
+        self.assertEqual([(entry.filename, entry.error) for entry in entries], [('corpus.zip', 'Archive has more than 2 members')])
+
+    @patch.object(BatchUploadSettings, 'BATCH_UPLOAD_MAX_UNCOMPRESSED_BYTES', 1000)
+    def test_archive_with_large_declared_size_is_rejected(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as output:
+            output.writestr('bomb.pdf', b'\0' * 5000)
+        archive.seek(0)
+
+        entries = expand_uploads([('bomb.zip', archive)])
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].error, 'Archive expands to more than 1000 bytes')
+
+    def test_extraction_stops_at_the_declared_size(self):
+        archive = zipfile.ZipFile(_zip({'a.pdf': b'a' * 300}))
+        member = archive.infolist()[0]
+        # A member whose header understates its size.
+        with patch.object(archive, 'open', return_value=BytesIO(b'a' * 600)):
+            with self.assertRaisesRegex(ValueError, 'larger than its declared size'):
+                _member_opener(archive, member, ExtractionBudget(10000))()
+
+    def test_extraction_stops_when_the_archive_budget_is_spent(self):
+        archive = zipfile.ZipFile(_zip({'a.pdf': b'a' * 600, 'b.pdf': b'b' * 600}))
+        budget = ExtractionBudget(1000)
+
+        stream, size = _member_opener(archive, archive.infolist()[0], budget)()
+        stream.close()
+        with self.assertRaisesRegex(ValueError, 'beyond the allowed uncompressed size'):
+            _member_opener(archive, archive.infolist()[1], budget)()
+        self.assertEqual(size, 600)
+
+    @patch('app.ingestion.batch_upload.queue_files_for_processing', return_value={})
+    @patch('app.ingestion.batch_upload.upload_stream_to_container', side_effect=lambda client, name, stream, size: f"https://lz/{name}")
+    @patch('app.ingestion.batch_upload.get_lz_container_client')
+    def test_upload_batch_lands_and_queues_documents_together(self, mock_container, mock_upload, mock_queue):
+        archive = _zip({'a.pdf': _pdf(3).getvalue(), 'notes.txt': b'plain text'})
+
+        manifest = upload_batch([('corpus.zip', archive), ('b.pdf', _pdf())], 'u', 'i', False, True)
+
+        mock_container.assert_called_once()
+        self.assertEqual(manifest, [
+            {'filename': 'a.pdf', 'status': 'queued', 'num_pages': 3},
+            {'filename': 'notes.txt', 'status': 'failed', 'error': manifest[1]['error']},
+            {'filename': 'b.pdf', 'status': 'queued', 'num_pages': 1}
+        ])
+        self.assertTrue(manifest[1]['error'].startswith('Not a readable PDF'))
+        queued = mock_queue.call_args.args[0]
+        self.assertEqual(sorted(file['filename'] for file in queued), ['a.pdf', 'b.pdf'])
+        self.assertEqual(mock_queue.call_args.args[1:], ('u', 'i', False, True))
+        self.assertTrue(all(len(file['content_sha256']) == 64 for file in queued))
+
+    @patch('app.ingestion.batch_upload.queue_files_for_processing', return_value={'a.pdf': 'queue unavailable'})
+    @patch('app.ingestion.batch_upload.upload_stream_to_container', return_value="https://lz/a.pdf")
+    @patch('app.ingestion.batch_upload.get_lz_container_client')
+    def test_queue_failures_are_reported_per_file(self, mock_container, mock_upload, mock_queue):
+        manifest = upload_batch([('a.pdf', _pdf())], 'u', 'i', False, False)
+        self.assertEqual(manifest, [{'filename': 'a.pdf', 'status': 'failed', 'num_pages': 1, 'error': 'queue unavailable'}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,42 @@
 import unittest
 from unittest.mock import Mock, patch
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.core.pipeline.transport import HttpResponse, HttpTransport
+from azure.storage.blob import BlobServiceClient
 from app.integration import blob_service
 from app.integration.index_manager import IndexManager, create_index_manager
+from app.ingestion.pdf_processing import new_page_buffer
+
+class _CreatedResponse(HttpResponse):
+    def __init__(self, request):
+        super().__init__(request, None)
+        self.status_code = 201
+        self.reason = "Created"
+        self.headers = {"ETag": '"0x1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT", "Content-Length": "0"}
+
+    def body(self):
+        return b""
+
+class _RecordingTransport(HttpTransport):
+    """Answers every request with 201 Created and keeps the request bodies."""
+    def __init__(self):
+        self.bodies = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        self.bodies.append(request.data)
+        return _CreatedResponse(request)
 
 class TestBlobService(unittest.TestCase):
 
@@ -40,6 +74,54 @@ class TestBlobService(unittest.TestCase):
         blob_service.upload_file_to_blob("test-container", "file1.txt", "local/path/file1.txt", self.mock_blob_service_client)
         self.mock_blob_service_client.get_blob_client.assert_called_once()
 
+    def test_upload_file_to_lz_streams_in_parallel_blocks(self):
+        mock_container_client = Mock()
+        self.mock_blob_service_client.get_container_client.return_value = mock_container_client
+        stream = Mock()
+        blob_service.upload_file_to_lz(stream, "doc.pdf", "user1", "index1", True, self.mock_blob_service_client, length=1024)
+        self.mock_blob_service_client.get_container_client.assert_called_once_with("user1-index1-lz")
+        mock_container_client.get_blob_client.return_value.upload_blob.assert_called_once_with(
+            stream, length=1024, overwrite=True, max_concurrency=blob_service.BLOB_TRANSFER_CONCURRENCY
+        )
+
+    def test_upload_stream_to_blob_keeps_page_buffers_in_memory(self):
+        transport = _RecordingTransport()
+        client = BlobServiceClient("https://account.blob.core.windows.net", credential="a2V5", transport=transport)
+        page = new_page_buffer(b"x" * 1000)
+
+        blob_service.upload_stream_to_blob("test-container", "doc.pdf___Page1.pdf", page, client)
+
+        self.assertFalse(page._rolled)
+        self.assertEqual(len(transport.bodies), 1)
+
+    @patch('app.integration.blob_service.BLOB_COPY_POLL_INTERVAL', 0)
+    def test_copy_blob_waits_for_pending_copy(self):
+        target_client = Mock()
+        target_client.start_copy_from_url.return_value = {'copy_status': 'pending'}
+        target_client.get_blob_properties.side_effect = [Mock(copy=Mock(status='pending')), Mock(copy=Mock(status='success'))]
+        source_client = Mock(url="https://example.com/a-reference/a.pdf___Page1.png")
+        self.mock_blob_service_client.get_blob_client.side_effect = [source_client, target_client]
+
+        url = blob_service.copy_blob("a-reference", "a.pdf___Page1.png", "b-reference", "b.pdf___Page1.png", self.mock_blob_service_client)
+
+        target_client.start_copy_from_url.assert_called_once_with(source_client.url)
+        self.assertEqual(target_client.get_blob_properties.call_count, 2)
+        self.assertEqual(url, target_client.url)
+
+    def test_copy_blob_raises_when_copy_fails(self):
+        self.mock_blob_service_client.get_blob_client.return_value.start_copy_from_url.return_value = {'copy_status': 'failed'}
+        with self.assertRaises(RuntimeError):
+            blob_service.copy_blob("a", "x", "b", "y", self.mock_blob_service_client)
+
+    @patch('app.integration.blob_service.BlobClient')
+    @patch('app.integration.blob_service.open')
+    def test_download_blob_to_file_streams_into_file(self, mock_open, mock_blob_client_class):
+        mock_downloader = mock_blob_client_class.from_blob_url.return_value.download_blob.return_value
+        etag = blob_service.download_blob_to_file("https://example.com/lz/doc.pdf", "/tmp/doc.pdf", self.mock_blob_service_client)
+        mock_downloader.readinto.assert_called_once_with(mock_open.return_value.__enter__.return_value)
+        self.assertIs(etag, mock_downloader.properties.etag)
+        mock_downloader.readall.assert_not_called()
+
     def test_list_files_in_container(self):
         mock_container_client = Mock()
         self.mock_blob_service_client.get_container_client.return_value = mock_container_client
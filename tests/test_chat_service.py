@@ -1,5 +1,6 @@
 import unittest
 from unittest.mock import patch, Mock
+from azure.core.exceptions import ResourceNotFoundError
 from flask import Flask
 from app.query.chat_service import chat_with_data, refine_message, create_refine_messages, process_citation
 from app.integration.index_manager import IndexManager, IndexConfig, ContainerNameTooLongError
@@ -123,7 +124,21 @@ class TestChatService(unittest.TestCase):
         self.assertEqual(len(result['content']), 2)
         self.assertEqual(result['content'][0]['type'], 'text')
         self.assertEqual(result['content'][1]['type'], 'image_url')
+        self.assertIn('data:image/jpeg;base64,', result['content'][1]['image_url']['url'])
+        mock_container_client.get_blob_client.assert_called_once_with('test_file___Page1.preview.jpg')
+
+    def test_process_citation_falls_back_to_full_png(self):
+        mock_container_client = Mock()
+        full_blob_client = Mock()
+        full_blob_client.download_blob.return_value.readall.return_value = b'test_image_data'
+        missing_blob_client = Mock()
+        missing_blob_client.download_blob.side_effect = ResourceNotFoundError("missing")
+        mock_container_client.get_blob_client.side_effect = [missing_blob_client, full_blob_client]
+
+        result = process_citation({'filepath': 'test_file___Page3.pdf'}, mock_container_client)
+
         self.assertIn('data:image/png;base64,', result['content'][1]['image_url']['url'])
+        self.assertEqual(mock_container_client.get_blob_client.call_args_list[-1][0][0], 'test_file___Page3.png')
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
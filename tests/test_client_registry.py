@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from app.integration import client_registry
+
+class TestClientRegistry(unittest.TestCase):
+
+    def setUp(self):
+        client_registry.clear_shared_clients()
+
+    def tearDown(self):
+        client_registry.clear_shared_clients()
+
+    def test_get_shared_client_creates_once(self):
+        factory = MagicMock(side_effect=lambda: object())
+        first = client_registry.get_shared_client("key", factory)
+        second = client_registry.get_shared_client("key", factory)
+        self.assertIs(first, second)
+        factory.assert_called_once()
+
+    def test_get_shared_client_separates_keys(self):
+        first = client_registry.get_shared_client("a", object)
+        second = client_registry.get_shared_client("b", object)
+        self.assertIsNot(first, second)
+
+    def test_get_shared_client_resets_after_fork(self):
+        first = client_registry.get_shared_client("key", object)
+        with patch('app.integration.client_registry.os.getpid', return_value=-1):
+            second = client_registry.get_shared_client("key", object)
+        self.assertIsNot(first, second)
+
+    def test_create_azure_transport_pool_size(self):
+        transport = client_registry.create_azure_transport()
+        adapter = transport.session.get_adapter("https://example.com")
+        self.assertEqual(adapter._pool_maxsize, client_registry.CLIENT_POOL_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from azure.ai.documentintelligence.models import (
+    AnalyzeResult, BoundingRegion, DocumentFigure, DocumentPage, DocumentSpan, DocumentTable, DocumentWord
+)
+from app.ingestion.doc_intelligence import (
+    split_layout_by_page, convert_pdf_page_to_markdown, get_page_layout, refine_figures, LayoutNotCachedError
+)
+from app.ingestion.enrichment_cache import EnrichmentCache
+from app.ingestion.pdf_processing import new_page_buffer
+from app.ingestion.page_classifier import PageClassification
+
+def _figure(page_number, polygon=None):
+    polygon = polygon or [0, 0, 1, 0, 1, 1, 0, 1]
+    return DocumentFigure(bounding_regions=[BoundingRegion(page_number=page_number, polygon=polygon)])
+
+def _table(page_number, row_count):
+    return DocumentTable(
+        row_count=row_count, column_count=2, cells=[],
+        bounding_regions=[BoundingRegion(page_number=page_number, polygon=[0, 0, 1, 0, 1, 1, 0, 1])]
+    )
+
+class TestDocIntelligence(unittest.TestCase):
+
+    def setUp(self):
+        page1 = "# Intro\n![](figures/0)\n"
+        page2 = "Text ![](figures/1) and ![](figures/2)\n"
+        self.content = page1 + "<!-- PageBreak -->\n" + page2
+        self.result = AnalyzeResult(
+            model_id="prebuilt-layout",
+            content=self.content,
+            pages=[
+                DocumentPage(page_number=3, width=8.5, height=11, spans=[DocumentSpan(offset=0, length=len(page1))]),
+                DocumentPage(page_number=4, width=8.5, height=11, spans=[DocumentSpan(offset=len(self.content) - len(page2), length=len(page2))])
+            ],
+            figures=[_figure(3), _figure(4), _figure(4, [2, 2, 4, 2, 4, 4, 2, 4])],
+            tables=[_table(4, 2), _table(4, 3)]
+        )
+        self.caption_cache = EnrichmentCache("captions")
+        cache_patcher = patch('app.ingestion.doc_intelligence.get_enrichment_cache', return_value=self.caption_cache)
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    def _page_image(self, temp_dir):
+        png_path = os.path.join(temp_dir, "page.png")
+        image = Image.new("RGB", (850, 1100), "white")
+        image.paste((255, 0, 0), (250, 250, 350, 350))
+        image.save(png_path)
+        return png_path
+
+    def _page_pdf(self, temp_dir, content=b"%PDF-1.4 page"):
+        pdf_path = os.path.join(temp_dir, "page.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(content)
+        return pdf_path
+
+    def test_split_layout_by_page(self):
+        pages = split_layout_by_page(self.result)
+
+        self.assertEqual(sorted(pages), [2, 3])
+        self.assertEqual(pages[2].content, "# Intro\n![](figures/0)\n")
+        self.assertEqual(pages[3].content, "Text ![](figures/0) and ![](figures/1)\n")
+        self.assertEqual(len(pages[2].figures), 1)
+        self.assertEqual(len(pages[3].figures), 2)
+        self.assertEqual(pages[2].tables, [])
+        self.assertEqual([table.row_count for table in pages[3].tables], [2, 3])
+        self.assertEqual(pages[3].pages[0].page_number, 4)
+
+    @patch('app.ingestion.doc_intelligence.analyze_layout')
+    def test_convert_pdf_page_to_markdown_uses_precomputed_layout(self, mock_analyze):
+        layout = split_layout_by_page(self.result)[2]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            markdown = convert_pdf_page_to_markdown(self._page_pdf(temp_dir), self._page_image(temp_dir), layout=layout)
+
+        self.assertEqual(markdown, layout.content)
+        mock_analyze.assert_not_called()
+
+    @patch('app.ingestion.doc_intelligence.get_azure_openai_client')
+    @patch('app.ingestion.doc_intelligence.analyze_image')
+    def test_refine_figures_captions_every_figure(self, mock_analyze_image, mock_get_client):
+        mock_analyze_image.side_effect = lambda client, b64_img: f"caption-{len(b64_img)}"
+        page = split_layout_by_page(self.result)[3]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            content = refine_figures(page, self._page_image(temp_dir))
+
+        self.assertEqual(mock_analyze_image.call_count, 2)
+        self.assertNotIn("![](figures/", content)
+        self.assertRegex(content, r"^Text !\[caption-\d+\]\(figures/0\) and !\[caption-\d+\]\(figures/1\)")
+
+    @patch('app.ingestion.doc_intelligence.get_azure_openai_client')
+    @patch('app.ingestion.doc_intelligence.analyze_image')
+    def test_refine_figures_reuses_cached_captions(self, mock_analyze_image, mock_get_client):
+        mock_analyze_image.return_value = "A logo"
+        page = AnalyzeResult(
+            content="![](figures/0) ![](figures/1)",
+            pages=[DocumentPage(page_number=1, width=8.5, height=11)],
+            figures=[_figure(1), _figure(1)]
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            png_path = self._page_image(temp_dir)
+            first = refine_figures(page, png_path)
+            second = refine_figures(page, png_path)
+
+        self.assertEqual(first, "![A logo](figures/0) ![A logo](figures/1)")
+        self.assertEqual(second, first)
+        mock_analyze_image.assert_called_once()
+        self.assertEqual(self.caption_cache.stats()["hits"], 1)
+
+    @patch('app.ingestion.doc_intelligence.FIGURE_MIN_PIXEL_AREA', 20000)
+    @patch('app.ingestion.doc_intelligence.analyze_image')
+    def test_refine_figures_skips_small_crops(self, mock_analyze_image):
+        page = AnalyzeResult(
+            content="![](figures/0)",
+            pages=[DocumentPage(page_number=1, width=8.5, height=11)],
+            figures=[_figure(1)]
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            content = refine_figures(page, self._page_image(temp_dir))
+
+        self.assertEqual(content, "![](figures/0)")
+        mock_analyze_image.assert_not_called()
+        self.assertEqual(self.caption_cache.stats()["skipped"], 1)
+
+    @patch('app.ingestion.doc_intelligence.analyze_layout')
+    def test_page_layout_is_cached_by_page_content(self, mock_analyze):
+        mock_analyze.return_value = AnalyzeResult(
+            content="# Cached",
+            pages=[DocumentPage(page_number=1, width=8.5, height=11, spans=[DocumentSpan(offset=0, length=8)],
+                                words=[DocumentWord(content="Cached", span=DocumentSpan(offset=2, length=6), confidence=0.9)])]
+        )
+        page_buffer = io.BytesIO(b"%PDF-1.4 page")
+        first = convert_pdf_page_to_markdown(page_buffer, None)
+        second = convert_pdf_page_to_markdown(io.BytesIO(b"%PDF-1.4 page"), None, allow_analysis=False)
+
+        self.assertEqual(first, "# Cached")
+        self.assertEqual(second, "# Cached")
+        mock_analyze.assert_called_once()
+        cached = get_page_layout(io.BytesIO(b"%PDF-1.4 page"), allow_analysis=False)
+        self.assertEqual(cached.pages[0].width, 8.5)
+        self.assertNotIn("words", cached.pages[0])
+        with self.assertRaises(LayoutNotCachedError):
+            convert_pdf_page_to_markdown(io.BytesIO(b"%PDF-1.4 other page"), None, allow_analysis=False)
+
+    @patch('app.ingestion.doc_intelligence.get_document_intelligence_client')
+    def test_page_buffers_are_analyzed_as_bytes(self, mock_get_client):
+        mock_get_client.return_value.begin_analyze_document.return_value.result.return_value = AnalyzeResult(content="# Page")
+        page = new_page_buffer(b"%PDF-1.4 buffered page")
+
+        layout = get_page_layout(page)
+
+        self.assertEqual(layout.content, "# Page")
+        analyze_request = mock_get_client.return_value.begin_analyze_document.call_args.kwargs['analyze_request']
+        self.assertEqual(analyze_request, b"%PDF-1.4 buffered page")
+        self.assertFalse(page._rolled)
+
+    @patch('app.ingestion.doc_intelligence.PageClassifierSettings.LOCAL_TEXT_EXTRACTION_ENABLED', True)
+    @patch('app.ingestion.doc_intelligence.classify_page')
+    @patch('app.ingestion.doc_intelligence.analyze_layout')
+    def test_plain_text_pages_skip_layout_analysis(self, mock_analyze, mock_classify):
+        mock_classify.return_value = PageClassification(False, "text", "Clause 1\n\n\nThe parties  agree.")
+
+        markdown = convert_pdf_page_to_markdown(io.BytesIO(b"%PDF-1.4 text page"), None, refine_markdown=True)
+
+        self.assertEqual(markdown, "Clause 1\n\nThe parties agree.\n")
+        mock_analyze.assert_not_called()
+        self.assertEqual(self.caption_cache.stats()["local_pages"], 1)
+
+    @patch('app.ingestion.doc_intelligence.PageClassifierSettings.LOCAL_TEXT_EXTRACTION_ENABLED', True)
+    @patch('app.ingestion.doc_intelligence.classify_page')
+    @patch('app.ingestion.doc_intelligence.analyze_layout')
+    def test_complex_pages_are_analyzed(self, mock_analyze, mock_classify):
+        mock_classify.return_value = PageClassification(True, "ruling lines")
+        mock_analyze.return_value = AnalyzeResult(content="| a | b |", pages=[DocumentPage(page_number=1, width=8.5, height=11)])
+
+        self.assertEqual(convert_pdf_page_to_markdown(io.BytesIO(b"%PDF-1.4 table page"), None), "| a | b |")
+        mock_analyze.assert_called_once()
+        self.assertEqual(self.caption_cache.stats()["analyzed_pages_ruling_lines"], 1)
+
+    def test_refine_figures_without_figures(self):
+        page = AnalyzeResult(content="No figures here", pages=[DocumentPage(page_number=1, width=8.5, height=11)], figures=[])
+        self.assertEqual(refine_figures(page, "missing.png"), "No figures here")
+
+if __name__ == '__main__':
+    unittest.main()
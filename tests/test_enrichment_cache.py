@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from azure.core.exceptions import ResourceNotFoundError
+from app.ingestion.enrichment_cache import EnrichmentCache, content_hash
+
+class TestEnrichmentCache(unittest.TestCase):
+
+    def test_memory_hit_and_miss(self):
+        cache = EnrichmentCache("captions")
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", "caption")
+        self.assertEqual(cache.get("a"), "caption")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_lru_eviction(self):
+        cache = EnrichmentCache("captions", max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+
+    def test_local_disk_tier_survives_new_instance(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            key = content_hash(b"table")
+            EnrichmentCache("tables", local_dir=temp_dir).set(key, "summary")
+
+            cache = EnrichmentCache("tables", local_dir=temp_dir)
+            self.assertEqual(cache.get(key), "summary")
+            self.assertEqual(cache.stats()["persistent_hits"], 1)
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, "tables", key[:2], key)))
+
+    def test_blob_tier(self):
+        blob_service = MagicMock()
+        blob_client = blob_service.get_blob_client.return_value
+        blob_client.download_blob.side_effect = ResourceNotFoundError("missing")
+        cache = EnrichmentCache("captions", blob_container="cache", blob_service_client=blob_service)
+
+        self.assertIsNone(cache.get("abc"))
+        cache.set("abc", "caption")
+
+        blob_service.get_blob_client.assert_called_with(container="cache", blob="captions/abc")
+        blob_client.upload_blob.assert_called_once_with(b"caption", overwrite=True)
+        blob_service.create_container.assert_called_once_with("cache")
+
+    def test_increment(self):
+        cache = EnrichmentCache("captions")
+        cache.increment("skipped")
+        cache.increment("skipped", 2)
+        self.assertEqual(cache.stats()["skipped"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
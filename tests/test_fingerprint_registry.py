@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import MagicMock
+from azure.core.exceptions import ResourceNotFoundError
+from app.ingestion.fingerprint_registry import FingerprintRegistry
+
+class TestFingerprintRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.entities = {}
+        self.table_client = MagicMock()
+        self.table_client.upsert_entity.side_effect = lambda entity: self.entities.__setitem__((entity["PartitionKey"], entity["RowKey"]), entity)
+        self.table_client.query_entities.side_effect = lambda query: [
+            entity for (partition, _), entity in self.entities.items() if query == f"PartitionKey eq '{partition}'"
+        ]
+        self.table_client.get_entity.side_effect = self._get_entity
+        self.table_client.delete_entity.side_effect = lambda partition, row: self.entities.pop((partition, row), None)
+        self.registry = FingerprintRegistry(self.table_client)
+
+    def _get_entity(self, partition, row):
+        if (partition, row) not in self.entities:
+            raise ResourceNotFoundError("not found")
+        return self.entities[(partition, row)]
+
+    def test_find_returns_copy_with_same_enrichment(self):
+        self.registry.register("abc", "a.pdf", "u1-i1-reference", "u1-i1-ingestion", 10, False)
+        self.registry.register("abc", "b.pdf", "u2-i2-reference", "u2-i2-ingestion", 10, True)
+
+        copy = self.registry.find("abc", True)
+        self.assertEqual(copy["filename"], "b.pdf")
+        self.assertEqual(copy["PartitionKey"], "abc")
+        self.assertIsNone(self.registry.find("other", False))
+
+    def test_find_skips_the_uploaded_document_itself(self):
+        self.registry.register("abc", "a.pdf", "u1-i1-reference", "u1-i1-ingestion", 10, False)
+
+        self.assertIsNone(self.registry.find("abc", False, exclude_reference_container="u1-i1-reference", exclude_filename="a.pdf"))
+        self.assertIsNotNone(self.registry.find("abc", False, exclude_reference_container="u1-i1-reference", exclude_filename="renamed.pdf"))
+
+    def test_replacing_a_file_forgets_its_previous_content(self):
+        self.registry.register("old", "a.pdf", "u1-i1-reference", "u1-i1-ingestion", 10, False)
+        self.registry.register("old", "b.pdf", "u1-i1-reference", "u1-i1-ingestion", 10, False)
+        self.registry.register("new", "a.pdf", "u1-i1-reference", "u1-i1-ingestion", 3, False)
+
+        self.assertEqual(self.registry.find("old", False)["filename"], "b.pdf")
+        self.assertIsNone(self.registry.find("old", False, exclude_reference_container="u1-i1-reference", exclude_filename="b.pdf"))
+        self.assertEqual(self.registry.find("new", False)["num_pages"], 3)
+
+    def test_forget_replaced_keeps_the_same_content(self):
+        self.registry.register("abc", "a.pdf", "u1-i1-reference", "u1-i1-ingestion", 10, False)
+
+        self.registry.forget_replaced("u1-i1-reference", "a.pdf", "abc")
+        self.assertIsNotNone(self.registry.find("abc", False))
+        self.registry.forget_replaced("u1-i1-reference", "a.pdf", "other")
+        self.assertIsNone(self.registry.find("abc", False))
+        self.registry.forget_replaced("u1-i1-reference", "never-registered.pdf", "abc")
+
+    def test_remove(self):
+        self.registry.register("abc", "a.pdf", "u1-i1-reference", "u1-i1-ingestion", 10, False)
+        entity = self.registry.find("abc", False)
+        self.registry.remove(entity)
+        self.table_client.delete_entity.assert_called_once_with("abc", entity["RowKey"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import unittest
+from unittest.mock import patch
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from app.ingestion.page_classifier import classify_page, text_to_markdown
+
+SENTENCE = "The parties agree that this contract is governed by the laws of the State."
+
+def _page_pdf(content: bytes, with_image: bool = False) -> io.BytesIO:
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    page = PageObject.create_blank_page(None, 612, 792)
+    stream = DecodedStreamObject()
+    stream.set_data(content)
+    page[NameObject("/Contents")] = writer._add_object(stream)
+    resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    if with_image:
+        image = DecodedStreamObject()
+        image.set_data(b"\x00\x00\x00")
+        image.update({NameObject("/Subtype"): NameObject("/Image")})
+        resources[NameObject("/XObject")] = DictionaryObject({NameObject("/Im1"): writer._add_object(image)})
+    page[NameObject("/Resources")] = resources
+    writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    return buffer
+
+def _text_content(lines, extra: bytes = b"") -> bytes:
+    operations = [b"BT /F1 11 Tf 14 TL 72 720 Td"]
+    operations += [f"({line}) Tj T*".encode("latin-1") for line in lines]
+    return b"\n".join(operations + [b"ET", extra])
+
+class TestPageClassifier(unittest.TestCase):
+
+    def test_plain_text_page_does_not_need_layout(self):
+        classification = classify_page(_page_pdf(_text_content([SENTENCE] * 5)))
+
+        self.assertFalse(classification.needs_layout)
+        self.assertIn("governed by the laws", classification.text)
+
+    def test_sparse_text_needs_layout(self):
+        self.assertEqual(classify_page(_page_pdf(_text_content(["Scanned?"]))).reason, "sparse text")
+
+    def test_images_need_layout(self):
+        self.assertEqual(classify_page(_page_pdf(_text_content([SENTENCE] * 5), with_image=True)).reason, "images")
+
+    def test_ruling_lines_need_layout(self):
+        grid = b"\n".join(f"72 {700 - row * 20} 400 20 re S".encode() for row in range(6))
+        self.assertEqual(classify_page(_page_pdf(_text_content([SENTENCE] * 5, grid))).reason, "ruling lines")
+
+    def test_columnar_text_needs_layout(self):
+        rows = [f"Item {i}      {i * 10} EUR      {i * 3} units" for i in range(12)]
+        self.assertEqual(classify_page(_page_pdf(_text_content(rows))).reason, "columnar text")
+
+    def test_unreadable_page_needs_layout(self):
+        self.assertEqual(classify_page(io.BytesIO(b"not a pdf")).reason, "unreadable")
+
+    @patch('app.ingestion.page_classifier.PageClassifierSettings.MIN_TEXT_CHARS', 10)
+    def test_stream_position_is_restored(self):
+        pdf_page = _page_pdf(_text_content([SENTENCE]))
+        classify_page(pdf_page)
+        self.assertEqual(pdf_page.tell(), 0)
+
+    def test_text_to_markdown(self):
+        self.assertEqual(text_to_markdown("  Title \n\n\n\nFirst   line\nsecond line\n"), "Title\n\nFirst line\nsecond line\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import hashlib
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from app.ingestion.page_manifest import PageManifest, document_key, file_sha256, missing_page_ranges
+
+class TestPageManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.entities = {}
+        self.table_client = MagicMock()
+        self.table_client.upsert_entity.side_effect = lambda entity: self.entities.__setitem__((entity["PartitionKey"], entity["RowKey"]), entity)
+        self.table_client.query_entities.side_effect = lambda query: [
+            entity for (partition, _), entity in self.entities.items() if query == f"PartitionKey eq '{partition}'"
+        ]
+        self.table_client.submit_transaction.side_effect = lambda operations: [
+            self.entities.pop((entity["PartitionKey"], entity["RowKey"])) for _, entity in operations
+        ]
+
+    def test_missing_page_ranges(self):
+        self.assertEqual(missing_page_ranges(0, 6, []), [(0, 6)])
+        self.assertEqual(missing_page_ranges(0, 6, [0, 2, 3]), [(1, 2), (4, 6)])
+        self.assertEqual(missing_page_ranges(10, 12, [10, 11, 40]), [])
+
+    def test_document_key_depends_on_container_filename_content_enrichment_and_upload(self):
+        key = document_key("ref", "doc.pdf", "a" * 64, False, '"0x1"')
+        self.assertEqual(key, document_key("ref", "doc.pdf", "a" * 64, False, '"0x1"'))
+        self.assertNotEqual(key, document_key("ref", "doc.pdf", "b" * 64, False, '"0x1"'))
+        self.assertNotEqual(key, document_key("other", "doc.pdf", "a" * 64, False, '"0x1"'))
+        self.assertNotEqual(key, document_key("ref", "doc.pdf", "a" * 64, True, '"0x1"'))
+        self.assertNotEqual(key, document_key("ref", "doc.pdf", "a" * 64, False, '"0x2"'))
+
+    def test_file_sha256(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "page.md")
+            with open(path, "wb") as f:
+                f.write(b"page content")
+            self.assertEqual(file_sha256(path, chunk_size=4), hashlib.sha256(b"page content").hexdigest())
+
+    def test_record_and_forget_pages(self):
+        manifest = PageManifest("doc", self.table_client)
+        manifest.record_page(0, {"pdf_sha256": "p0", "md_sha256": "m0"})
+        manifest.record_page(12, {"pdf_sha256": "p12", "md_sha256": "m12"})
+
+        self.assertEqual(manifest.completed_pages(), {0: {"pdf_sha256": "p0", "md_sha256": "m0"}, 12: {"pdf_sha256": "p12", "md_sha256": "m12"}})
+
+        manifest.forget(range(0, 10))
+        self.assertEqual(list(manifest.completed_pages()), [12])
+        self.table_client.submit_transaction.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,26 +1,135 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
-from app.ingestion.pdf_processing import convert_pdf_page_to_png
+from unittest.mock import MagicMock, patch
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from io import BytesIO
+from app.ingestion.pdf_processing import (
+    split_pdf_pages, render_pdf_pages_to_png, create_page_image_variants, page_image_blob_name
+)
 
 class TestPdfProcessing(unittest.TestCase):
 
+    def test_split_pdf_pages(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_path = os.path.join(temp_dir, "source.pdf")
+            writer = PdfWriter()
+            for width in (100, 200, 300):
+                writer.add_blank_page(width, 100)
+            with open(pdf_path, "wb") as f:
+                writer.write(f)
+
+            pages = list(split_pdf_pages(pdf_path, temp_dir, "doc.pdf", first_page=1))
+
+            self.assertEqual([page_num for page_num, _ in pages], [1, 2])
+            self.assertEqual(os.path.basename(pages[0][1]), "doc.pdf___Page2.pdf")
+            for (page_num, path), width in zip(pages, (200, 300)):
+                reader = PdfReader(path)
+                self.assertEqual(len(reader.pages), 1)
+                self.assertEqual(float(reader.pages[0].mediabox.width), width)
+
+    def test_split_pdf_pages_in_memory(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_path = os.path.join(temp_dir, "source.pdf")
+            writer = PdfWriter()
+            for width in (100, 200):
+                writer.add_blank_page(width, 100)
+            with open(pdf_path, "wb") as f:
+                writer.write(f)
+
+            pages = list(split_pdf_pages(pdf_path, temp_dir, "doc.pdf", in_memory=True))
+
+            self.assertEqual(sorted(os.listdir(temp_dir)), ["source.pdf"])
+            self.assertEqual(float(PdfReader(pages[1][1]).pages[0].mediabox.width), 200)
+
+    @staticmethod
+    def _rasterize(pdf_path, first_page, last_page, output_folder, **kwargs):
+        paths = []
+        for page in range(first_page, last_page + 1):
+            path = os.path.join(output_folder, f"raster-{page:03d}.ppm")
+            Image.new("RGB", (10, 10)).save(path)
+            paths.append(path)
+        return paths
+
+    @patch('app.ingestion.pdf_processing._get_encode_pool')
+    @patch('app.ingestion.pdf_processing.convert_from_path')
+    def test_render_pdf_pages_to_png_in_memory(self, mock_convert, mock_get_pool):
+        mock_convert.side_effect = self._rasterize
+
+        with tempfile.TemporaryDirectory() as temp_dir, ThreadPoolExecutor() as pool:
+            mock_get_pool.return_value = pool
+            pdf_path = os.path.join(temp_dir, "doc.pdf")
+            open(pdf_path, "wb").close()
+
+            pages = list(render_pdf_pages_to_png(pdf_path, temp_dir, "doc.pdf", 0, 2, in_memory=True))
+
+            self.assertEqual(sorted(os.listdir(temp_dir)), ["doc.pdf"])
+            for _, buffer, variants in pages:
+                with Image.open(buffer) as image:
+                    self.assertEqual(image.format, "PNG")
+                with Image.open(BytesIO(variants["thumb"])) as thumb:
+                    self.assertEqual(thumb.format, "WEBP")
+                self.assertIn("preview", variants)
+
+    @patch('app.ingestion.pdf_processing._get_encode_pool')
     @patch('app.ingestion.pdf_processing.convert_from_path')
-    @patch('app.ingestion.pdf_processing.os.path.exists')
-    def test_convert_pdf_page_to_png(self, mock_exists, mock_convert):
-        mock_exists.return_value = True
-        mock_image = MagicMock()
-        mock_convert.return_value = [mock_image]
-
-        result = convert_pdf_page_to_png("test.pdf", 0, "/output", "test")
-        self.assertIsNotNone(result)
-        mock_image.save.assert_called_once()
-
-    @patch('app.ingestion.pdf_processing.os.path.exists')
-    def test_convert_pdf_page_to_png_file_not_exists(self, mock_exists):
-        mock_exists.return_value = False
-
-        with self.assertRaises(ValueError):
-            convert_pdf_page_to_png("nonexistent.pdf", 0, "/output", "test")
+    def test_render_pdf_pages_to_png_batches(self, mock_convert, mock_get_pool):
+        mock_convert.side_effect = self._rasterize
+
+        with tempfile.TemporaryDirectory() as temp_dir, ThreadPoolExecutor() as pool:
+            mock_get_pool.return_value = pool
+            pdf_path = os.path.join(temp_dir, "doc.pdf")
+            open(pdf_path, "wb").close()
+
+            pages = list(render_pdf_pages_to_png(pdf_path, temp_dir, "doc.pdf", 0, 5, batch_size=2))
+
+            self.assertEqual([page_num for page_num, _, _ in pages], [0, 1, 2, 3, 4])
+            self.assertEqual(mock_convert.call_count, 3)
+            self.assertEqual(mock_convert.call_args_list[2].kwargs['first_page'], 5)
+            for page_num, png_path, _ in pages:
+                self.assertEqual(os.path.basename(png_path), f"doc.pdf___Page{page_num + 1}.png")
+                with Image.open(png_path) as image:
+                    self.assertEqual(image.format, "PNG")
+
+    @patch('app.ingestion.pdf_processing._encode_pool', None)
+    @patch('app.ingestion.pdf_processing.ProcessPoolExecutor')
+    @patch('app.ingestion.pdf_processing.convert_from_path')
+    def test_render_pdf_pages_to_png_replaces_a_broken_pool(self, mock_convert, mock_pool_class):
+        mock_convert.side_effect = self._rasterize
+        broken = Future()
+        broken.set_exception(BrokenProcessPool("An encoder process terminated abruptly"))
+        broken_pool = MagicMock()
+        broken_pool.submit.return_value = broken
+
+        with tempfile.TemporaryDirectory() as temp_dir, ThreadPoolExecutor() as pool:
+            mock_pool_class.side_effect = [broken_pool, pool]
+            pdf_path = os.path.join(temp_dir, "doc.pdf")
+            open(pdf_path, "wb").close()
+
+            pages = list(render_pdf_pages_to_png(pdf_path, temp_dir, "doc.pdf", 0, 4, batch_size=2, in_memory=True))
+
+        self.assertEqual([page_num for page_num, _, _ in pages], [0, 1, 2, 3])
+        broken_pool.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        self.assertEqual(mock_pool_class.call_count, 2)
+        # Only the batch that hit the broken pool is rendered again.
+        self.assertEqual([call.kwargs['first_page'] for call in mock_convert.call_args_list], [1, 1, 3])
+
+    @patch('app.ingestion.pdf_processing.RENDER_DPI', 200)
+    def test_create_page_image_variants(self):
+        variants = create_page_image_variants(Image.new("RGB", (1700, 2200), "white"))
+
+        with Image.open(BytesIO(variants["thumb"])) as thumb:
+            self.assertEqual((thumb.format, thumb.size), ("WEBP", (306, 396)))
+        with Image.open(BytesIO(variants["preview"])) as preview:
+            self.assertEqual((preview.format, preview.size), ("JPEG", (850, 1100)))
+
+    def test_page_image_blob_name(self):
+        self.assertEqual(page_image_blob_name("doc.pdf", 3), "doc.pdf___Page3.png")
+        self.assertEqual(page_image_blob_name("doc.pdf", 3, "thumb"), "doc.pdf___Page3.thumb.webp")
+        self.assertEqual(page_image_blob_name("doc.pdf", 3, "preview"), "doc.pdf___Page3.preview.jpg")
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
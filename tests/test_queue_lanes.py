@@ -0,0 +1,46 @@
+import unittest
+from collections import Counter
+from unittest.mock import patch
+from app.ingestion.queue_lanes import LaneScheduler, lane_for_pages, lane_queue_name
+
+class TestQueueLanes(unittest.TestCase):
+
+    @patch('app.ingestion.queue_lanes.QueueLaneSettings.SMALL_LANE_MAX_PAGES', 10)
+    @patch('app.ingestion.queue_lanes.QueueLaneSettings.MEDIUM_LANE_MAX_PAGES', 100)
+    def test_lane_for_pages(self):
+        self.assertEqual(lane_for_pages(2), "small")
+        self.assertEqual(lane_for_pages(10), "small")
+        self.assertEqual(lane_for_pages(11), "medium")
+        self.assertEqual(lane_for_pages(900), "large")
+        self.assertEqual(lane_for_pages(None), "large")
+
+    def test_large_lane_keeps_base_queue_name(self):
+        self.assertEqual(lane_queue_name("ingestion", "small"), "ingestion-small")
+        self.assertEqual(lane_queue_name("ingestion", "large"), "ingestion")
+
+    def test_lanes_are_picked_in_proportion_to_weights(self):
+        scheduler = LaneScheduler({"small": 6, "medium": 3, "large": 1})
+        picks = [scheduler.order()[0] for _ in range(20)]
+
+        self.assertEqual(Counter(picks), {"small": 12, "medium": 6, "large": 2})
+        # Every window of sum(weights) picks already honours the weights.
+        self.assertEqual(Counter(picks[:10]), {"small": 6, "medium": 3, "large": 1})
+
+    def test_order_falls_through_to_every_lane(self):
+        scheduler = LaneScheduler({"small": 6, "medium": 3, "large": 0})
+        for _ in range(5):
+            order = scheduler.order()
+            self.assertEqual(sorted(order), ["large", "medium", "small"])
+            self.assertNotEqual(order[0], "large")
+
+    def test_wait_stats(self):
+        scheduler = LaneScheduler({"small": 1, "large": 1})
+        scheduler.record_wait("small", 2.0)
+        scheduler.record_wait("small", 4.0)
+
+        stats = scheduler.wait_stats()
+        self.assertEqual(stats["small"], {"messages": 2, "average_wait": 3.0, "max_wait": 4.0})
+        self.assertEqual(stats["large"]["messages"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from unittest.mock import patch
+from app.ingestion.queue_polling import PollingBackoff
+
+class TestPollingBackoff(unittest.TestCase):
+
+    def setUp(self):
+        self.backoff = PollingBackoff(min_interval=1, max_interval=8)
+
+    def test_full_batch_polls_immediately(self):
+        self.assertEqual(self.backoff.next_delay(32, 32), 0)
+
+    def test_partial_batch_waits_minimum_interval(self):
+        self.assertEqual(self.backoff.next_delay(3, 32), 1)
+
+    @patch('app.ingestion.queue_polling.random.uniform', side_effect=lambda low, high: high)
+    def test_empty_polls_back_off_exponentially_up_to_maximum(self, mock_uniform):
+        delays = [self.backoff.next_delay(0, 32) for _ in range(5)]
+        self.assertEqual(delays, [2, 4, 8, 8, 8])
+
+    @patch('app.ingestion.queue_polling.random.uniform', side_effect=lambda low, high: high)
+    def test_received_messages_reset_backoff(self, mock_uniform):
+        for _ in range(3):
+            self.backoff.next_delay(0, 32)
+        self.backoff.next_delay(1, 32)
+        self.assertEqual(self.backoff.next_delay(0, 32), 2)
+
+    def test_jitter_stays_within_bounds(self):
+        for _ in range(4):
+            delay = self.backoff.next_delay(0, 32)
+            self.assertGreaterEqual(delay, 1)
+            self.assertLessEqual(delay, 8)
+
+if __name__ == '__main__':
+    unittest.main()
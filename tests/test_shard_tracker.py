@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import MagicMock
+from app.ingestion.shard_tracker import ShardTracker, plan_shards
+
+class TestShardTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.entities = {}
+        self.table_client = MagicMock()
+        self.table_client.upsert_entity.side_effect = self._upsert
+        self.table_client.query_entities.side_effect = lambda query, select: [
+            {**entity, "RowKey": row_key} for (partition, row_key), entity in self.entities.items() if query == f"PartitionKey eq '{partition}'"
+        ]
+        self.tracker = ShardTracker(self.table_client)
+
+    def _upsert(self, entity):
+        key = (entity["PartitionKey"], entity["RowKey"])
+        self.entities[key] = {**self.entities.get(key, {}), **entity}
+
+    def test_plan_shards(self):
+        self.assertEqual(plan_shards(120, 50), [(0, 50), (50, 100), (100, 120)])
+        self.assertEqual(plan_shards(50, 50), [(0, 50)])
+
+    def test_complete_reports_when_every_shard_is_done(self):
+        self.tracker.register("doc1", "big.pdf", plan_shards(120, 50))
+
+        self.assertFalse(self.tracker.complete("doc1", 2))
+        self.assertFalse(self.tracker.complete("doc1", 0))
+        self.assertTrue(self.tracker.complete("doc1", 1))
+        self.assertEqual(self.entities[("doc1", "2")]["first_page"], 100)
+
+    def test_forget_deletes_every_shard(self):
+        self.tracker.register("doc1", "big.pdf", plan_shards(100, 50))
+        self.tracker.forget("doc1")
+
+        deleted = sorted(call.args for call in self.table_client.delete_entity.call_args_list)
+        self.assertEqual(deleted, [("doc1", "0"), ("doc1", "1")])
+
+if __name__ == '__main__':
+    unittest.main()
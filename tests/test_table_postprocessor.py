@@ -1,9 +1,20 @@
+import re
+import json
 import unittest
+import httpx
+import openai
 from unittest.mock import patch
 from unittest import mock 
 from app.ingestion.table_postprocessor import *
+from app.ingestion.enrichment_cache import EnrichmentCache
 
 class TestTablePostprocessor(unittest.TestCase):
+    def setUp(self):
+        self.table_cache = EnrichmentCache("tables")
+        cache_patcher = patch('app.ingestion.table_postprocessor.get_enrichment_cache', return_value=self.table_cache)
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
     def test_basic_extraction(self):
         markdown_content = "| ID | Name |\n|----|----- |\n| 1  | John |\n\nSome text here.\n| A | B |\n|---|---|\n| 2 | 3 |\n\n"
         expected_output = ["| ID | Name |\n|----|----- |\n| 1  | John |\n\n", "| A | B |\n|---|---|\n| 2 | 3 |\n\n"]
@@ -29,6 +40,122 @@ class TestTablePostprocessor(unittest.TestCase):
         expected_output = ["| Outer | Table |\n|-------|-------|\n| A     | B     |\n\n", "| Inner | Table |\n|-------|-------|\n| C     | D     |\n\n"]
         self.assertEqual(extract_tables(markdown_content), expected_output)
 
+    def test_locate_tables_positions(self):
+        markdown_content = "Intro\n| A | B |\n|---|---|\n| 1 | 2 |\n\nText\n| C |\n|---|\n"
+        spans = locate_tables(markdown_content)
+        self.assertEqual([span.table for span in spans], extract_tables(markdown_content))
+        self.assertEqual(markdown_content[spans[0].start:spans[0].end], "| A | B |\n|---|---|\n| 1 | 2 |\n\n")
+        self.assertEqual(markdown_content[spans[1].start:spans[1].end], "| C |\n|---|\n")
+
+    @patch('app.ingestion.table_postprocessor.enhance_table')
+    def test_enhance_markdown_single_pass(self, mock_enhance_table):
+        mock_enhance_table.side_effect = lambda table: table + "<!-- enhanced -->\n"
+        table = "| A | B |\n|---|---|\n| 1 | 2 |"
+        markdown_content = f"Intro\n{table}\n\nMiddle\n{table}\n\nEnd\n{table}\n"
+
+        result = enhance_markdown(markdown_content)
+
+        enhanced = f"{table}\n\n<!-- enhanced -->\n"
+        self.assertEqual(result, f"Intro\n{enhanced}Middle\n{enhanced}End\n{enhanced}")
+        mock_enhance_table.assert_called_once()
+
+    def test_batch_rows_respects_token_budget(self):
+        rows = [(i, f"| {i} | {'x' * 40} |") for i in range(10)]
+        batches = batch_rows("| ID | Value |", rows, max_tokens=45)
+        self.assertEqual([index for batch in batches for index, _ in batch], list(range(10)))
+        self.assertTrue(all(len(batch) == 3 for batch in batches[:-1]))
+
+    def test_batch_rows_caps_requested_output_tokens(self):
+        rows = [(i, f"| {i} |") for i in range(600)]
+        batches = batch_rows("| ID |", rows, max_tokens=100000)
+        self.assertEqual([index for batch in batches for index, _ in batch], list(range(600)))
+        for batch in batches:
+            self.assertLessEqual(
+                ROW_DESCRIPTION_TOKENS_PER_ROW * len(batch) + ROW_DESCRIPTION_RESPONSE_OVERHEAD_TOKENS,
+                ROW_DESCRIPTION_MAX_OUTPUT_TOKENS
+            )
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_generate_row_descriptions_many_short_rows(self, mock_llm):
+        def describe(prompt, max_tokens):
+            self.assertLessEqual(max_tokens, ROW_DESCRIPTION_MAX_OUTPUT_TOKENS)
+            rows = re.findall(r"^(\d+): ", prompt, re.MULTILINE)
+            return json.dumps({"descriptions": [{"row": int(row), "description": f"Row {row}."} for row in rows]})
+        mock_llm.side_effect = describe
+        table_content = "| ID |\n|----|\n" + "\n".join(f"| {i} |" for i in range(600))
+
+        result = generate_row_descriptions(table_content)
+
+        self.assertGreater(mock_llm.call_count, 1)
+        self.assertEqual(result.count("<!-- Row Description:"), 600)
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_generate_row_descriptions_keeps_table_on_api_error(self, mock_llm):
+        mock_llm.side_effect = openai.BadRequestError(
+            "max_tokens is too large", response=httpx.Response(400, request=httpx.Request("POST", "https://example.com")), body=None
+        )
+        table_content = "| ID | Name |\n|----|------|\n| 1  | John |"
+
+        self.assertEqual(generate_row_descriptions(table_content), table_content)
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_generate_row_descriptions_batched(self, mock_llm):
+        mock_llm.return_value = '{"descriptions": [{"row": 2, "description": "Alice is 25."}, {"row": 0, "description": "John is 30."}]}'
+        table_content = "| ID | Name | Age |\n|----|------|-----|\n| 1  | John | 30  |\n\n| 2  | Alice | 25  |"
+
+        result = generate_row_descriptions(table_content)
+
+        mock_llm.assert_called_once()
+        self.assertEqual(result, "| ID | Name | Age |\n|----|------|-----|\n| 1  | John | 30  |\n<!-- Row Description: John is 30. -->\n\n| 2  | Alice | 25  |\n<!-- Row Description: Alice is 25. -->")
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_generate_row_descriptions_falls_back_per_row(self, mock_llm):
+        mock_llm.side_effect = ["not json", "John is 30."]
+        table_content = "| ID | Name | Age |\n|----|------|-----|\n| 1  | John | 30  |"
+
+        result = generate_row_descriptions(table_content)
+
+        self.assertEqual(mock_llm.call_count, 2)
+        self.assertTrue(result.endswith("<!-- Row Description: John is 30. -->"))
+
+    def test_normalize_table(self):
+        first = "| ID | Name |\n|----|----- |\n| 1  | John   Smith |"
+        second = "|ID|Name|\n|:--|--:|\n|1|John Smith|\n"
+        self.assertEqual(normalize_table(first), normalize_table(second))
+        self.assertNotEqual(normalize_table(first), normalize_table("|ID|Name|\n|---|---|\n|2|John Smith|"))
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_enhance_table_single_structured_call(self, mock_llm):
+        mock_llm.return_value = '```json\n{"summary": "People and IDs.", "qa_pairs": [{"question": "Who has ID 1?", "answer": "John"}]}\n```'
+        table_content = "| ID | Name |\n|----|----- |\n| 1  | John |\n\n"
+
+        result = enhance_table(table_content)
+
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(result, table_content + "\n\n<!-- Table Summary: People and IDs. -->\n" + "\n\n<!-- Q&A Pairs:\nQ1: Who has ID 1?\nA1: John\n-->\n")
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_enhance_table_uses_cache_for_equivalent_tables(self, mock_llm):
+        mock_llm.return_value = '{"summary": "People.", "qa_pairs": []}'
+        first = enhance_table("| ID | Name |\n|----|----- |\n| 1  | John |\n\n")
+        second = enhance_table("|ID|Name|\n|---|---|\n|1|John|\n\n")
+
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertIn("<!-- Table Summary: People. -->", second)
+        stats = get_table_enrichment_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["llm_calls"], 1)
+        self.assertEqual(stats["calls_saved"], 3)
+
+    @patch('app.ingestion.table_postprocessor.llm')
+    def test_enhance_table_falls_back_on_invalid_response(self, mock_llm):
+        mock_llm.side_effect = ["not json", "A summary.", "Q1: Q?\nA1: A."]
+        result = enhance_table("| A | B |\n|---|---|\n| 1 | 2 |\n\n")
+
+        self.assertEqual(mock_llm.call_count, 3)
+        self.assertIn("<!-- Table Summary: A summary. -->", result)
+        self.assertIn("<!-- Q&A Pairs:\nQ1: Q?\nA1: A.\n-->", result)
+
     @patch('app.ingestion.table_postprocessor.llm')
     def test_generate_table_summary(self, mock_llm):
         # Test 1: Basic table summary
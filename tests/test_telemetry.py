@@ -0,0 +1,52 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from app.integration import telemetry
+from app.integration.telemetry import bind_context, get_stage_stats, page_count_bucket, reset_stage_stats, stage
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        reset_stage_stats()
+
+    def test_page_count_bucket(self):
+        self.assertEqual([page_count_bucket(count) for count in (None, 1, 2, 10, 11, 900)], [None, "1", "2-10", "2-10", "11-100", "101-1000"])
+
+    @patch.object(telemetry, '_stage_pages')
+    @patch.object(telemetry, '_stage_duration')
+    def test_stage_records_duration_and_pages(self, mock_duration, mock_pages):
+        with stage("render", index_name="idx", page_count=16):
+            pass
+
+        labels = mock_duration.record.call_args.args[1]
+        self.assertEqual(labels, {"stage": "render", "index": "idx", "page_count": "11-100", "status": "ok"})
+        mock_pages.add.assert_called_once_with(16, {"stage": "render", "index": "idx", "page_count": "11-100"})
+        self.assertEqual(get_stage_stats()["render"]["pages"], 16)
+
+    @patch.object(telemetry, '_stage_pages')
+    @patch.object(telemetry, '_stage_duration')
+    def test_failed_stage_is_labelled_and_reraised(self, mock_duration, mock_pages):
+        with self.assertRaises(ValueError):
+            with stage("split", page_count=1):
+                raise ValueError("corrupt page")
+
+        self.assertEqual(mock_duration.record.call_args.args[1]["status"], "error")
+        mock_pages.add.assert_not_called()
+        self.assertEqual(get_stage_stats()["split"], {"calls": 1, "seconds": get_stage_stats()["split"]["seconds"], "pages": 0})
+
+    @patch.object(telemetry, '_stage_duration')
+    def test_nested_stages_inherit_index_across_threads(self, mock_duration):
+        def upload():
+            with stage("blob_upload", page_count=1):
+                pass
+
+        with stage("document", index_name="idx"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(bind_context(upload)) for _ in range(2)]
+                [future.result() for future in futures]
+
+        indexes = [call.args[1].get("index") for call in mock_duration.record.call_args_list if call.args[1]["stage"] == "blob_upload"]
+        self.assertEqual(indexes, ["idx", "idx"])
+
+if __name__ == '__main__':
+    unittest.main()
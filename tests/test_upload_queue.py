@@ -0,0 +1,531 @@
+import json
+from datetime import datetime, timedelta, timezone
+import threading
+import unittest
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from app.ingestion.doc_intelligence import LayoutNotCachedError
+from app.ingestion.page_manifest import document_key
+from app.ingestion.queue_lanes import LANES
+from app.integration.client_registry import clear_shared_clients
+from app.ingestion.upload_queue import BlobManager, MessageLease, PageProcessingError, QueueManager, UploadQueueSettings
+
+class TestBlobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.file_info = {
+            'filename': 'doc.pdf',
+            'num_pages': 3,
+            'blob_url': 'https://example.com/lz/doc.pdf',
+            'reference_container': 'user1-index1-reference',
+            'ingestion_container': 'user1-index1-ingestion',
+            'lz_container': 'user1-index1-lz'
+        }
+        manifest_patcher = patch('app.ingestion.upload_queue.PageManifest')
+        self.mock_manifest_class = manifest_patcher.start()
+        self.mock_manifest = self.mock_manifest_class.return_value
+        self.mock_manifest.completed_pages.return_value = {}
+        self.addCleanup(manifest_patcher.stop)
+        for hash_function in ('file_sha256', 'artifact_sha256'):
+            hash_patcher = patch(f'app.ingestion.upload_queue.{hash_function}', return_value='0' * 64)
+            hash_patcher.start()
+            self.addCleanup(hash_patcher.stop)
+        registry_patcher = patch('app.ingestion.upload_queue.FingerprintRegistry')
+        self.mock_registry = registry_patcher.start().return_value
+        self.addCleanup(registry_patcher.stop)
+
+    def _split_pages(self, pdf_path, output_dir, prefix, first_page=0, last_page=None, in_memory=False):
+        for page_number in range(first_page, last_page):
+            yield page_number, f"{output_dir}/{prefix}___Page{page_number + 1}.pdf"
+
+    def _render_pages(self, pdf_path, output_dir, prefix, first_page, last_page, in_memory=False):
+        for page_number in range(first_page, last_page):
+            yield page_number, f"{output_dir}/{prefix}___Page{page_number + 1}.png", {'thumb': f"thumb{page_number + 1}".encode()}
+
+    @patch('app.ingestion.upload_queue.render_pdf_pages_to_png')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch.object(BlobManager, '_process_pdf_page')
+    def test_process_pdf_pages_processes_every_page(self, mock_process_page, mock_init_blob, mock_download, mock_render):
+        mock_render.side_effect = self._render_pages
+        mock_blob_service = MagicMock()
+        mock_init_blob.return_value = mock_blob_service
+
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages):
+            BlobManager.process_pdf_pages(self.file_info)
+
+        processed = sorted(call.args[2] for call in mock_process_page.call_args_list)
+        self.assertEqual(processed, [0, 1, 2])
+        first_call = mock_process_page.call_args_list[0]
+        self.assertTrue(first_call.args[0].endswith('___Page1.pdf'))
+        self.assertTrue(first_call.args[1].endswith('___Page1.png'))
+        self.assertEqual(first_call.args[10], {'thumb': b'thumb1'})
+        mock_blob_service.get_blob_client.return_value.delete_blob.assert_called_once()
+
+    @patch('app.ingestion.upload_queue.render_pdf_pages_to_png')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch.object(BlobManager, '_process_pdf_page')
+    def test_process_pdf_pages_reports_failed_pages(self, mock_process_page, mock_init_blob, mock_download, mock_render):
+        mock_render.side_effect = self._render_pages
+        mock_blob_service = MagicMock()
+        mock_init_blob.return_value = mock_blob_service
+
+        def process_page(output_pdf, png_path, page_number, *args):
+            if page_number == 1:
+                raise RuntimeError("Document Intelligence unavailable")
+        mock_process_page.side_effect = process_page
+
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages):
+            with self.assertRaises(PageProcessingError) as context:
+                BlobManager.process_pdf_pages(self.file_info)
+
+        self.assertEqual(mock_process_page.call_count, 3)
+        self.assertEqual(list(context.exception.failed_pages), [1])
+        mock_blob_service.get_blob_client.return_value.delete_blob.assert_not_called()
+
+    @patch.object(UploadQueueSettings, 'DOCUMENT_ANALYSIS_BATCH_PAGES', 2)
+    @patch.object(UploadQueueSettings, 'DOCUMENT_ANALYSIS_MODE', 'document')
+    @patch('app.ingestion.upload_queue.convert_pdf_page_to_markdown')
+    @patch('app.ingestion.upload_queue.analyze_pdf_pages')
+    @patch('app.ingestion.upload_queue.render_pdf_pages_to_png')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch.object(BlobManager, '_upload_pdf_page_files')
+    def test_process_pdf_pages_document_analysis_mode(self, mock_upload, mock_init_blob, mock_download, mock_render, mock_analyze, mock_convert_md):
+        mock_render.side_effect = self._render_pages
+        mock_convert_md.return_value = "# Page"
+        mock_analyze.side_effect = lambda pdf_path, first_page, last_page: {
+            page_number: f"layout-{page_number}" for page_number in range(first_page, last_page)
+        }
+
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages):
+            BlobManager.process_pdf_pages(self.file_info)
+
+        analyzed_ranges = sorted(call.args[1:] for call in mock_analyze.call_args_list)
+        self.assertEqual(analyzed_ranges, [(0, 2), (2, 3)])
+        layouts = sorted(call.args[3] for call in mock_convert_md.call_args_list)
+        self.assertEqual(layouts, ["layout-0", "layout-1", "layout-2"])
+
+    @patch('app.ingestion.upload_queue.ShardTracker')
+    @patch('app.ingestion.upload_queue.render_pdf_pages_to_png')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch.object(BlobManager, '_process_pdf_page')
+    def test_process_pdf_pages_processes_only_its_shard(self, mock_process_page, mock_init_blob, mock_download, mock_render, mock_tracker):
+        mock_render.side_effect = self._render_pages
+        mock_blob_service = MagicMock()
+        mock_init_blob.return_value = mock_blob_service
+        mock_tracker.return_value.complete.return_value = False
+        shard_info = {**self.file_info, 'num_pages': 120, 'document_id': 'doc1', 'shard_index': 1, 'shard_count': 3, 'first_page': 50, 'last_page': 100}
+
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages):
+            BlobManager.process_pdf_pages(shard_info)
+
+        processed = sorted(call.args[2] for call in mock_process_page.call_args_list)
+        self.assertEqual(processed, list(range(50, 100)))
+        mock_tracker.return_value.complete.assert_called_once_with('doc1', 1)
+        mock_blob_service.get_blob_client.return_value.delete_blob.assert_not_called()
+
+        mock_tracker.return_value.complete.return_value = True
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages):
+            BlobManager.process_pdf_pages(shard_info)
+
+        mock_tracker.return_value.forget.assert_called_once_with('doc1')
+        mock_blob_service.get_blob_client.return_value.delete_blob.assert_called_once()
+
+    @patch('app.ingestion.upload_queue.render_pdf_pages_to_png')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch.object(BlobManager, '_process_pdf_page')
+    def test_process_pdf_pages_skips_checkpointed_pages(self, mock_process_page, mock_init_blob, mock_download, mock_render):
+        mock_render.side_effect = self._render_pages
+        self.mock_manifest.completed_pages.return_value = {1: {'md_sha256': 'abc'}}
+        file_info = {**self.file_info, 'num_pages': 5}
+
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages) as mock_split:
+            BlobManager.process_pdf_pages(file_info)
+
+        processed = sorted(call.args[2] for call in mock_process_page.call_args_list)
+        self.assertEqual(processed, [0, 2, 3, 4])
+        self.assertEqual([call.args[3:] for call in mock_split.call_args_list], [(0, 1), (2, 5)])
+        self.assertEqual(list(self.mock_manifest.forget.call_args.args[0]), [0, 1, 2, 3, 4])
+
+    @patch('app.ingestion.upload_queue.render_pdf_pages_to_png')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x2"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch.object(BlobManager, '_process_pdf_page')
+    def test_process_pdf_pages_checkpoints_per_upload_and_enrichment(self, mock_process_page, mock_init_blob, mock_download, mock_render):
+        mock_render.side_effect = self._render_pages
+        with patch('app.ingestion.upload_queue.split_pdf_pages', side_effect=self._split_pages):
+            BlobManager.process_pdf_pages({**self.file_info, 'is_multimodal': True})
+
+        self.mock_manifest_class.assert_called_once_with(document_key('user1-index1-reference', 'doc.pdf', '0' * 64, True, '"0x2"'))
+
+    @patch('app.ingestion.upload_queue.artifact_sha256', side_effect=lambda artifact: f"sha-{getattr(artifact, 'name', artifact)}")
+    @patch('app.ingestion.upload_queue.convert_pdf_page_to_markdown', return_value='# Page 2')
+    @patch.object(BlobManager, '_upload_pdf_page_files')
+    def test_process_pdf_page_records_checkpoint(self, mock_upload, mock_convert_md, mock_sha):
+        BlobManager._process_pdf_page('p.pdf', 'p.png', 1, 'doc.pdf', MagicMock(), 'ref', 'ing', False, None, self.mock_manifest)
+
+        self.assertEqual(mock_upload.call_args.args[5], b'# Page 2')
+        recorded_page, hashes = self.mock_manifest.record_page.call_args.args
+        self.assertEqual(recorded_page, 1)
+        self.assertEqual((hashes['pdf_sha256'], hashes['png_sha256']), ('sha-p.pdf', 'sha-p.png'))
+
+    @patch('app.ingestion.upload_queue.upload_stream_to_blob')
+    @patch('app.ingestion.upload_queue.upload_file_to_blob')
+    def test_page_buffers_are_uploaded_and_closed(self, mock_upload_file, mock_upload_stream):
+        pdf_buffer, png_buffer = BytesIO(b'%PDF'), BytesIO(b'PNG')
+        uploaded = {}
+        mock_upload_stream.side_effect = lambda container, blob_name, data, blob_service: uploaded.__setitem__(blob_name, data.read())
+
+        with patch('app.ingestion.upload_queue.convert_pdf_page_to_markdown', return_value='# Page 1'):
+            BlobManager._process_pdf_page(
+                pdf_buffer, png_buffer, 0, 'doc.pdf', MagicMock(), 'ref', 'ing', False,
+                image_variants={'thumb': b'WEBP', 'preview': b'JPEG'}
+            )
+
+        self.assertEqual(uploaded, {
+            'doc.pdf___Page1.pdf': b'%PDF', 'doc.pdf___Page1.png': b'PNG', 'doc.pdf___Page1.md': b'# Page 1',
+            'doc.pdf___Page1.thumb.webp': b'WEBP', 'doc.pdf___Page1.preview.jpg': b'JPEG'
+        })
+        mock_upload_file.assert_not_called()
+        self.assertTrue(pdf_buffer.closed and png_buffer.closed)
+
+    @patch('app.ingestion.upload_queue.copy_blob')
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    def test_duplicate_document_copies_processed_artifacts(self, mock_init_blob, mock_download, mock_copy):
+        mock_blob_service = MagicMock()
+        mock_init_blob.return_value = mock_blob_service
+        duplicate_of = {'PartitionKey': 'f' * 64, 'RowKey': 'r', 'filename': 'original.pdf', 'num_pages': 2,
+                        'reference_container': 'user2-index2-reference', 'ingestion_container': 'user2-index2-ingestion'}
+
+        BlobManager.process_pdf_pages({**self.file_info, 'duplicate_of': duplicate_of})
+
+        copies = sorted(call.args[:4] for call in mock_copy.call_args_list)
+        self.assertEqual(len(copies), 10)
+        self.assertIn(('user2-index2-reference', 'original.pdf___Page2.thumb.webp', 'user1-index1-reference', 'doc.pdf___Page2.thumb.webp'), copies)
+        self.assertIn(('user2-index2-ingestion', 'original.pdf___Page2.md', 'user1-index1-ingestion', 'doc.pdf___Page2.md'), copies)
+        self.assertIn(('user2-index2-reference', 'original.pdf___Page1.png', 'user1-index1-reference', 'doc.pdf___Page1.png'), copies)
+        mock_download.assert_not_called()
+        mock_blob_service.get_blob_client.return_value.delete_blob.assert_called_once()
+        self.mock_registry.register.assert_called_once_with('f' * 64, 'doc.pdf', 'user1-index1-reference', 'user1-index1-ingestion', 2, False)
+
+    @patch('app.ingestion.upload_queue.copy_blob', side_effect=RuntimeError("source deleted"))
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch('app.ingestion.upload_queue.QueueManager')
+    def test_duplicate_document_falls_back_to_queueing(self, mock_queue_manager, mock_init_blob, mock_download, mock_copy):
+        duplicate_of = {'PartitionKey': 'f' * 64, 'RowKey': 'r', 'filename': 'original.pdf', 'num_pages': 3,
+                        'reference_container': 'gone-reference', 'ingestion_container': 'gone-ingestion'}
+
+        BlobManager.process_pdf_pages({**self.file_info, 'duplicate_of': duplicate_of})
+
+        self.mock_registry.remove.assert_called_once_with(duplicate_of)
+        mock_queue_manager.return_value.queue_for_processing.assert_called_once_with(self.file_info)
+        mock_download.assert_not_called()
+        mock_init_blob.return_value.get_blob_client.return_value.delete_blob.assert_not_called()
+        self.mock_registry.register.assert_not_called()
+
+    @patch('app.ingestion.upload_queue.copy_blob', side_effect=RuntimeError("source deleted"))
+    @patch('app.ingestion.upload_queue.download_blob_to_file', return_value='"0x1"')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch('app.ingestion.upload_queue.ShardTracker')
+    def test_large_duplicate_with_missing_original_is_queued_as_shards(self, mock_tracker, mock_init_blob, mock_download, mock_copy):
+        lane_clients = {name: MagicMock() for name in ("ingestion-small", "ingestion-medium", "ingestion")}
+        duplicate_of = {'PartitionKey': 'f' * 64, 'RowKey': 'r', 'filename': 'original.pdf', 'num_pages': 300,
+                        'reference_container': 'gone-reference', 'ingestion_container': 'gone-ingestion'}
+
+        with patch.object(QueueManager, '_initialize_queue_client', side_effect=lambda name: lane_clients[name]), \
+                patch('app.ingestion.shard_tracker.ShardTrackerSettings.SHARD_PAGES', 100):
+            BlobManager.process_pdf_pages({**self.file_info, 'num_pages': 300, 'duplicate_of': duplicate_of})
+
+        lane_clients["ingestion-small"].send_message.assert_not_called()
+        messages = [json.loads(call.args[0]) for call in lane_clients["ingestion"].send_message.call_args_list]
+        self.assertEqual([(m['first_page'], m['last_page']) for m in messages], [(0, 100), (100, 200), (200, 300)])
+        self.assertTrue(all('duplicate_of' not in m for m in messages))
+        mock_download.assert_not_called()
+
+    @patch('app.ingestion.upload_queue.upload_stream_to_blob')
+    @patch('app.ingestion.upload_queue.convert_pdf_page_to_markdown')
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    def test_reenrich_rebuilds_markdown_from_cached_layouts(self, mock_init_blob, mock_convert_md, mock_upload_stream):
+        def convert(pdf_page, png_page, refine_markdown, allow_analysis):
+            self.assertFalse(allow_analysis)
+            if pdf_page.read() == b'page-2':
+                raise LayoutNotCachedError("no layout")
+            return "# Rebuilt"
+        mock_convert_md.side_effect = convert
+        mock_init_blob.return_value.get_blob_client.side_effect = lambda container, blob: MagicMock(**{
+            'download_blob.return_value.readinto.side_effect': lambda buffer: buffer.write(f"page-{blob.split('Page')[1][0]}".encode())
+        })
+
+        BlobManager.reenrich_pdf_pages({**self.file_info, 'action': 'reenrich', 'is_multimodal': True})
+
+        uploaded = sorted(call.args[1] for call in mock_upload_stream.call_args_list)
+        self.assertEqual(uploaded, ['doc.pdf___Page1.md', 'doc.pdf___Page3.md'])
+        self.assertEqual(mock_upload_stream.call_args.args[0], 'user1-index1-ingestion')
+
+    @patch('app.ingestion.upload_queue.convert_pdf_page_to_markdown', side_effect=RuntimeError("vision unavailable"))
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    def test_reenrich_reports_failed_pages(self, mock_init_blob, mock_convert_md):
+        with self.assertRaises(PageProcessingError) as context:
+            BlobManager.reenrich_pdf_pages(self.file_info)
+        self.assertEqual(sorted(context.exception.failed_pages), [0, 1, 2])
+
+def _message(message_id, filename, dequeue_count=1):
+    return SimpleNamespace(
+        id=message_id, pop_receipt=f"receipt-{message_id}", next_visible_on=None,
+        dequeue_count=dequeue_count, content=json.dumps({'filename': filename})
+    )
+
+@patch.object(UploadQueueSettings, 'MIN_POLL_INTERVAL', 0.01)
+@patch.object(UploadQueueSettings, 'MAX_POLL_INTERVAL', 0.01)
+@patch.object(QueueManager, '_install_signal_handlers')
+class TestQueueManager(unittest.TestCase):
+
+    def setUp(self):
+        self.lane_clients = {}
+        for lane in ("small", "medium", "large"):
+            client = MagicMock()
+            client.receive_messages.return_value = []
+            client.update_message.side_effect = lambda message_id, pop_receipt, visibility_timeout: SimpleNamespace(
+                pop_receipt=f"{pop_receipt}-renewed", next_visible_on="later"
+            )
+            self.lane_clients[lane] = client
+        self.queue_client = self.lane_clients["small"]
+        queue_names = {"ingestion-small": "small", "ingestion-medium": "medium", "ingestion": "large"}
+        with patch.object(QueueManager, '_initialize_queue_client', side_effect=lambda name: self.lane_clients[queue_names[name]]):
+            self.manager = QueueManager()
+
+    def test_lease_renewal_replaces_pop_receipt(self, mock_signals):
+        message = _message("1", "doc.pdf")
+        MessageLease(self.queue_client, message).renew()
+
+        self.queue_client.update_message.assert_called_once_with(
+            "1", pop_receipt="receipt-1", visibility_timeout=UploadQueueSettings.VISIBILITY_TIMEOUT
+        )
+        self.assertEqual(message.pop_receipt, "receipt-1-renewed")
+
+    @patch.object(UploadQueueSettings, 'MESSAGE_CONCURRENCY', 2)
+    @patch('app.ingestion.upload_queue.BlobManager.process_pdf_pages')
+    def test_messages_are_processed_concurrently_and_drained_on_stop(self, mock_process, mock_signals):
+        self.queue_client.receive_messages.side_effect = [[_message("1", "a.pdf"), _message("2", "b.pdf")], []]
+        both_started = threading.Barrier(2, timeout=5)
+
+        def process(file_info):
+            both_started.wait()
+            self.manager.stop()
+        mock_process.side_effect = process
+
+        self.manager.process_queue_messages()
+
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertEqual(self.queue_client.delete_message.call_count, 2)
+        self.assertEqual(self.queue_client.receive_messages.call_args_list[0].kwargs['max_messages'], 2)
+
+    @patch.object(UploadQueueSettings, 'MESSAGE_CONCURRENCY', 4)
+    @patch('app.ingestion.upload_queue.BlobManager.process_pdf_pages')
+    def test_processor_stops_after_max_messages(self, mock_process, mock_signals):
+        self.queue_client.receive_messages.side_effect = [
+            [_message("1", "a.pdf"), _message("2", "b.pdf")], [_message("3", "c.pdf")]
+        ]
+
+        self.manager.process_queue_messages(max_messages=3)
+
+        self.assertEqual(mock_process.call_count, 3)
+        self.assertEqual([call.kwargs['max_messages'] for call in self.queue_client.receive_messages.call_args_list], [3, 1])
+        self.assertTrue(self.manager.stop_event.is_set())
+
+    @patch.object(UploadQueueSettings, 'LEASE_RENEWAL_INTERVAL', 0.01)
+    @patch('app.ingestion.upload_queue.BlobManager.process_pdf_pages')
+    def test_in_flight_messages_are_renewed_until_done(self, mock_process, mock_signals):
+        message = _message("1", "big.pdf")
+        self.queue_client.receive_messages.side_effect = [[message], []]
+        renewed = threading.Event()
+        self.queue_client.update_message.side_effect = lambda message_id, pop_receipt, visibility_timeout: (
+            renewed.set() or SimpleNamespace(pop_receipt="renewed", next_visible_on="later")
+        )
+
+        def process(file_info):
+            self.manager.stop()
+            self.assertTrue(renewed.wait(timeout=5))
+        mock_process.side_effect = process
+
+        self.manager.process_queue_messages()
+
+        deleted_message = self.queue_client.delete_message.call_args.args[0]
+        self.assertEqual(deleted_message.pop_receipt, "renewed")
+
+    def test_message_over_retry_limit_is_deleted(self, mock_signals):
+        lease = MessageLease(self.queue_client, _message("1", "doc.pdf", dequeue_count=UploadQueueSettings.MAX_DEQUEUE_COUNT + 1))
+        with patch('app.ingestion.upload_queue.BlobManager.process_pdf_pages') as mock_process:
+            self.manager._process_message(lease)
+
+        mock_process.assert_not_called()
+        self.queue_client.delete_message.assert_called_once_with(lease.message)
+
+    @patch('app.ingestion.upload_queue.ShardTracker')
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_large_documents_are_queued_as_shards(self, mock_index_manager, mock_tracker, mock_signals):
+        mock_index_manager.return_value.get_lz_container.return_value = 'u-i-lz'
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+        with patch('app.ingestion.shard_tracker.ShardTrackerSettings.SHARD_PAGES', 50):
+            self.manager.queue_file_for_processing(filename='big.pdf', user_id='u', index_name='i', is_restricted=False, num_pages=120)
+
+        self.queue_client.send_message.assert_not_called()
+        messages = [json.loads(call.args[0]) for call in self.lane_clients["large"].send_message.call_args_list]
+        self.assertEqual([(m['first_page'], m['last_page']) for m in messages], [(0, 50), (50, 100), (100, 120)])
+        self.assertEqual({m['document_id'] for m in messages}, {mock_tracker.return_value.register.call_args.args[0]})
+        self.assertEqual(mock_tracker.return_value.register.call_args.args[2], [(0, 50), (50, 100), (100, 120)])
+
+    @patch('app.ingestion.upload_queue.ShardTracker')
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_small_documents_are_queued_as_one_message(self, mock_index_manager, mock_tracker, mock_signals):
+        mock_index_manager.return_value.get_lz_container.return_value = 'u-i-lz'
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+        self.manager.queue_file_for_processing(filename='doc.pdf', user_id='u', index_name='i', is_restricted=False, num_pages=3)
+
+        message = json.loads(self.queue_client.send_message.call_args.args[0])
+        self.assertNotIn('document_id', message)
+        mock_tracker.assert_not_called()
+
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_documents_are_routed_to_lanes_by_page_count(self, mock_index_manager, mock_signals):
+        mock_index_manager.return_value.get_lz_container.return_value = 'u-i-lz'
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+        self.manager.queue_file_for_processing(filename='memo.pdf', user_id='u', index_name='i', is_restricted=False, num_pages=2)
+        self.manager.queue_file_for_processing(filename='report.pdf', user_id='u', index_name='i', is_restricted=False, num_pages=40)
+
+        self.assertEqual(json.loads(self.lane_clients["small"].send_message.call_args.args[0])['filename'], 'memo.pdf')
+        self.assertEqual(json.loads(self.lane_clients["medium"].send_message.call_args.args[0])['filename'], 'report.pdf')
+        self.lane_clients["small"].create_queue.assert_called_once()
+
+    @patch('app.ingestion.upload_queue.BlobManager.process_pdf_pages')
+    def test_empty_lane_falls_through_and_wait_is_recorded(self, mock_process, mock_signals):
+        message = _message("1", "manual.pdf")
+        message.inserted_on = datetime.now(timezone.utc) - timedelta(seconds=30)
+        self.lane_clients["large"].receive_messages.return_value = [message]
+
+        lane, messages = self.manager._receive_messages(2)
+        lease = MessageLease(self.lane_clients[lane], messages[0], lane)
+        self.manager._record_wait(lease)
+        self.manager._process_message(lease)
+
+        self.assertEqual(lane, "large")
+        self.lane_clients["large"].delete_message.assert_called_once_with(message)
+        stats = self.manager.scheduler.wait_stats()["large"]
+        self.assertEqual(stats["messages"], 1)
+        self.assertGreaterEqual(stats["max_wait"], 30)
+
+    def test_idle_worker_polls_one_lane_per_receive(self, mock_signals):
+        self.assertEqual(self.manager._receive_messages(2), (None, []))
+        self.assertEqual(sum(client.receive_messages.call_count for client in self.lane_clients.values()), 3)
+
+        for _ in range(3):
+            self.manager._receive_messages(2)
+        self.assertEqual([client.receive_messages.call_count for client in self.lane_clients.values()], [2, 2, 2])
+
+        self.lane_clients["medium"].receive_messages.return_value = [_message("1", "report.pdf")]
+        lane, messages = self.manager._receive_messages(2)
+        self.assertEqual((lane, len(messages)), ("medium", 1))
+        # Messages turned up again, so the next receive falls through every lane.
+        self.lane_clients["medium"].receive_messages.return_value = []
+        self.manager._receive_messages(2)
+        self.assertEqual([client.receive_messages.call_count for client in self.lane_clients.values()], [3, 4, 3])
+
+    @patch.object(UploadQueueSettings, 'STORAGE_ACCOUNT_KEY', 'a2V5')
+    @patch.object(UploadQueueSettings, 'STORAGE_ACCOUNT_NAME', 'account')
+    def test_queue_clients_are_shared_between_managers(self, mock_signals):
+        self.addCleanup(clear_shared_clients)
+
+        first, second = QueueManager(), QueueManager()
+
+        self.assertEqual(set(first.lane_clients), set(LANES))
+        for lane in LANES:
+            self.assertIs(first.lane_clients[lane], second.lane_clients[lane])
+        self.assertEqual(second.lane_clients["small"].queue_name, "ingestion-small")
+
+    @patch('app.ingestion.upload_queue.FingerprintRegistry')
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_duplicate_documents_are_queued_for_copying(self, mock_index_manager, mock_registry, mock_signals):
+        mock_index_manager.return_value.get_lz_container.return_value = 'u-i-lz'
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+        mock_registry.return_value.find.return_value = {'filename': 'original.pdf', 'reference_container': 'o-reference'}
+
+        self.manager.queue_file_for_processing(filename='doc.pdf', user_id='u', index_name='i', is_restricted=False,
+                                               num_pages=300, is_multimodal=True, content_sha256='f' * 64)
+
+        mock_registry.return_value.find.assert_called_once_with('f' * 64, True, exclude_reference_container='u-i-reference', exclude_filename='doc.pdf')
+        self.queue_client.send_message.assert_called_once()
+        message = json.loads(self.queue_client.send_message.call_args.args[0])
+        self.assertEqual(message['duplicate_of']['filename'], 'original.pdf')
+
+    @patch('app.ingestion.upload_queue.FingerprintRegistry')
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_batches_share_one_fingerprint_registry(self, mock_index_manager, mock_registry, mock_signals):
+        mock_index_manager.return_value.get_lz_container.return_value = 'u-i-lz'
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+        mock_registry.return_value.find.return_value = None
+        files = [{'filename': f'{name}.pdf', 'num_pages': 2, 'blob_url': f'https://lz/{name}.pdf', 'content_sha256': name * 64} for name in 'abcd']
+
+        errors = self.manager.queue_files_for_processing(files, 'u', 'i', False, False)
+
+        self.assertEqual(errors, {})
+        mock_registry.assert_called_once_with()
+        self.assertEqual(mock_registry.return_value.find.call_count, 4)
+        self.assertEqual(self.queue_client.send_message.call_count, 4)
+
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_batches_share_one_index_lookup_and_report_failures(self, mock_index_manager, mock_signals):
+        mock_index_manager.return_value.get_lz_container.return_value = 'u-i-lz'
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+        def send_message(content):
+            if 'b.pdf' in content:
+                raise RuntimeError("queue unavailable")
+        self.queue_client.send_message.side_effect = send_message
+        files = [{'filename': name, 'num_pages': 2, 'blob_url': f'https://lz/{name}', 'content_sha256': None} for name in ('a.pdf', 'b.pdf', 'c.pdf')]
+
+        errors = self.manager.queue_files_for_processing(files, 'u', 'i', False, True)
+
+        mock_index_manager.assert_called_once_with('u', 'i', False)
+        self.assertEqual(errors, {'b.pdf': 'queue unavailable'})
+        self.assertEqual(self.queue_client.send_message.call_count, 3)
+        self.assertTrue(json.loads(self.queue_client.send_message.call_args.args[0])['is_multimodal'])
+
+    @patch('app.ingestion.upload_queue.BlobManager.reenrich_pdf_pages')
+    @patch('app.ingestion.upload_queue.BlobManager.process_pdf_pages')
+    def test_reenrich_messages_are_dispatched(self, mock_process, mock_reenrich, mock_signals):
+        message = _message("1", "doc.pdf")
+        message.content = json.dumps({'action': 'reenrich', 'filename': 'doc.pdf'})
+        self.manager._process_message(MessageLease(self.queue_client, message))
+
+        mock_reenrich.assert_called_once()
+        mock_process.assert_not_called()
+        self.queue_client.delete_message.assert_called_once()
+
+    @patch('app.ingestion.upload_queue.initialize_blob_service')
+    @patch('app.ingestion.upload_queue.list_files_in_container', return_value=[{'filename': 'a.pdf', 'total_pages': 4}, {'filename': 'b.pdf', 'total_pages': 1}])
+    @patch('app.ingestion.upload_queue.create_index_manager')
+    def test_queue_reenrichment(self, mock_index_manager, mock_list_files, mock_init_blob, mock_signals):
+        mock_index_manager.return_value.get_ingestion_container.return_value = 'u-i-ingestion'
+        mock_index_manager.return_value.get_reference_container.return_value = 'u-i-reference'
+
+        filenames = self.manager.queue_reenrichment('u', 'i', False, True)
+
+        self.assertEqual(filenames, ['a.pdf', 'b.pdf'])
+        messages = [json.loads(call.args[0]) for call in self.queue_client.send_message.call_args_list]
+        self.assertEqual(messages[0], {'action': 'reenrich', 'filename': 'a.pdf', 'num_pages': 4, 'is_multimodal': True,
+                                       'reference_container': 'u-i-reference', 'ingestion_container': 'u-i-ingestion'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import subprocess
+import unittest
+from unittest.mock import patch
+from app.ingestion.upload_supervisor import (
+    UploadWorkerSupervisor, UploadSupervisorSettings, available_cpus, child_pids, container_memory_bytes, default_max_rss_mb,
+    process_rss_bytes, process_tree_rss_bytes, worker_environment
+)
+
+class FakeProcess:
+    started = []
+
+    def __init__(self, target, args, name, daemon):
+        self.target = target
+        self.args = args
+        self.name = name
+        self.pid = 1000 + len(FakeProcess.started)
+        self.exitcode = None
+        self.alive = False
+        self.terminated = False
+
+    def start(self):
+        self.alive = True
+        FakeProcess.started.append(self)
+
+    def is_alive(self):
+        return self.alive
+
+    def exit(self, code):
+        self.alive = False
+        self.exitcode = code
+
+    def terminate(self):
+        self.terminated = True
+        self.exit(0)
+
+    def join(self, timeout=None):
+        pass
+
+    def kill(self):
+        self.exit(-9)
+
+class FakeContext:
+    Process = FakeProcess
+
+@patch.object(UploadWorkerSupervisor, '_install_signal_handlers')
+class TestUploadWorkerSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        FakeProcess.started = []
+        self.supervisor = UploadWorkerSupervisor(workers=2, max_messages=10, max_rss_mb=100, context=FakeContext())
+
+    def _check_workers(self):
+        for slot in range(self.supervisor.workers):
+            self.supervisor._check_worker(slot)
+
+    def test_starts_configured_number_of_workers(self, mock_signals):
+        self._check_workers()
+
+        self.assertEqual(len(FakeProcess.started), 2)
+        self.assertEqual([process.args[0] for process in FakeProcess.started], [10, 10])
+
+    def test_recycled_worker_is_replaced_immediately(self, mock_signals):
+        self._check_workers()
+        FakeProcess.started[0].exit(0)
+
+        self._check_workers()
+
+        self.assertEqual(len(FakeProcess.started), 3)
+        self.assertIs(self.supervisor._processes[0], FakeProcess.started[2])
+
+    def test_crashed_worker_is_restarted_after_delay(self, mock_signals):
+        self._check_workers()
+        FakeProcess.started[0].exit(1)
+
+        with patch('app.ingestion.upload_supervisor.time.monotonic', return_value=100.0):
+            self._check_workers()
+            self._check_workers()
+        self.assertEqual(len(FakeProcess.started), 2)
+
+        with patch('app.ingestion.upload_supervisor.time.monotonic', return_value=102.0):
+            self._check_workers()
+        self.assertEqual(len(FakeProcess.started), 3)
+
+    def test_worker_above_memory_limit_is_terminated(self, mock_signals):
+        self._check_workers()
+        with patch('app.ingestion.upload_supervisor.process_tree_rss_bytes', side_effect=[200 * 1024 * 1024, 50 * 1024 * 1024]):
+            self._check_workers()
+
+        self.assertTrue(FakeProcess.started[0].terminated)
+        self.assertFalse(FakeProcess.started[1].terminated)
+
+    @patch.object(UploadSupervisorSettings, 'UPLOAD_WORKER_CHECK_INTERVAL', 0)
+    def test_stop_terminates_every_worker(self, mock_signals):
+        def check_and_stop(slot):
+            UploadWorkerSupervisor._check_worker(self.supervisor, slot)
+            self.supervisor.stop()
+
+        with patch.object(self.supervisor, '_check_worker', side_effect=check_and_stop):
+            self.supervisor.run()
+
+        self.assertTrue(all(process.terminated for process in FakeProcess.started))
+        self.assertEqual(self.supervisor._processes, {})
+
+    def test_process_rss_bytes_reads_current_process(self, mock_signals):
+        rss = process_rss_bytes(os.getpid())
+        if rss is None:
+            self.skipTest("/proc is not available")
+        self.assertGreater(rss, 0)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_worker_environment_divides_cpus_between_workers(self, mock_signals):
+        with patch('app.ingestion.upload_supervisor.available_cpus', return_value=8):
+            self.assertEqual(worker_environment(4), {"RENDER_THREAD_COUNT": "2", "PNG_ENCODE_WORKERS": "2"})
+            self.assertEqual(worker_environment(16), {"RENDER_THREAD_COUNT": "1", "PNG_ENCODE_WORKERS": "1"})
+
+    @patch.dict(os.environ, {"RENDER_THREAD_COUNT": "6"}, clear=True)
+    def test_worker_environment_keeps_configured_values(self, mock_signals):
+        with patch('app.ingestion.upload_supervisor.available_cpus', return_value=8):
+            self.assertEqual(worker_environment(4), {"PNG_ENCODE_WORKERS": "2"})
+
+    def _cgroup(self, files):
+        cgroup_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cgroup_root)
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(cgroup_root, path)), exist_ok=True)
+            with open(os.path.join(cgroup_root, path), "w") as cgroup_file:
+                cgroup_file.write(content)
+        return patch('app.ingestion.upload_supervisor.CGROUP_ROOT', cgroup_root)
+
+    @patch('app.ingestion.upload_supervisor.os.sched_getaffinity', return_value=set(range(64)))
+    def test_available_cpus_follows_the_cgroup_quota(self, mock_affinity, mock_signals):
+        with self._cgroup({"cpu.max": "150000 100000\n"}):
+            self.assertEqual(available_cpus(), 2)
+        with self._cgroup({"cpu/cpu.cfs_quota_us": "50000\n", "cpu/cpu.cfs_period_us": "100000\n"}):
+            self.assertEqual(available_cpus(), 1)
+        with self._cgroup({"cpu.max": "max 100000\n"}):
+            self.assertEqual(available_cpus(), 64)
+
+    def test_memory_limit_defaults_to_a_share_of_the_container(self, mock_signals):
+        with self._cgroup({"memory.max": str(4 * 1024 ** 3)}):
+            self.assertEqual(container_memory_bytes(), 4 * 1024 ** 3)
+            self.assertEqual(default_max_rss_mb(1), 3072)
+            self.assertEqual(default_max_rss_mb(2), 1536)
+        with self._cgroup({"memory.max": "max"}):
+            self.assertIsNone(container_memory_bytes())
+            self.assertEqual(default_max_rss_mb(2), 3072)
+        with self._cgroup({"memory/memory.limit_in_bytes": str(2 ** 63 - 4096)}):
+            self.assertIsNone(container_memory_bytes())
+
+    def test_workers_receive_their_share_of_cpus(self, mock_signals):
+        with patch('app.ingestion.upload_supervisor.worker_environment', return_value={"PNG_ENCODE_WORKERS": "4"}) as mock_environment:
+            self._check_workers()
+
+        mock_environment.assert_called_with(2)
+        self.assertEqual(FakeProcess.started[0].args, (10, {"PNG_ENCODE_WORKERS": "4"}))
+
+    def test_process_tree_rss_includes_children(self, mock_signals):
+        with patch('app.ingestion.upload_supervisor.child_pids', return_value=[11, 12]), \
+                patch('app.ingestion.upload_supervisor.process_rss_bytes', side_effect=[100, 30, None]):
+            self.assertEqual(process_tree_rss_bytes(10), 130)
+
+    def test_child_pids_finds_spawned_process(self, mock_signals):
+        if not os.path.isdir("/proc"):
+            self.skipTest("/proc is not available")
+        child = subprocess.Popen(["sleep", "5"])
+        try:
+            self.assertIn(child.pid, child_pids(os.getpid()))
+        finally:
+            child.kill()
+            child.wait()
+
+if __name__ == '__main__':
+    unittest.main()
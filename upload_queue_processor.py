@@ -1,12 +1,12 @@
 import os
 from dotenv import load_dotenv
-from app.ingestion.upload_queue import process_queue_messages
+from app.ingestion.upload_supervisor import run_upload_workers
 
 load_dotenv()
 
 def main():
     print("Starting upload queue processor...")
-    process_queue_messages()
+    run_upload_workers()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file